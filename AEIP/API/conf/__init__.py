@@ -1,15 +1,22 @@
 from os.path import dirname, realpath, join, abspath
 import os
+import re
+import threading
+import time
+from hashlib import md5
 import psycopg2
-from psycopg2 import extras
+from psycopg2 import errors, extras
 import yaml
 
+from .db_pool import ConnectionPool
+
 
 APP_DIR = dirname(dirname(realpath(__file__)))
 TEMPLATES_DIR = join(dirname(dirname(abspath(__file__))), 'view', 'templates')
 STATIC_DIR = join(dirname(dirname(abspath(__file__))), 'view', 'static')
 
 LOGFILE = APP_DIR + '/flask.log'
+CACHE_DIR = APP_DIR + '/cache'  # disk caches shared by the worker processes, e.g. vector tiles
 DEBUG = True
 
 # get db conn settings from yaml file
@@ -22,24 +29,188 @@ if DB_CON_DICT is None:
     exit()
 
 
-def db_select(q):
+# connection pool settings, may be overridden by an optional db_pool section in secrets.yml
+DB_POOL_SETTINGS = {
+    'min_size': 1,
+    'max_size': 10,
+    'timeout': 10.0,
+    'check_after': 30.0,
+    'max_idle': 600.0,
+}
+DB_POOL_SETTINGS.update(DB_CON_DICT.get('db_pool') or {})
+
+# streamed downloads (/dump, /export), each on a connection of its own outside the pool so that they cannot use up
+# the connections of the pages, may be overridden by an optional db_stream section in secrets.yml
+DB_STREAM_SETTINGS = {
+    'max_streams': 4,
+}
+DB_STREAM_SETTINGS.update(DB_CON_DICT.get('db_stream') or {})
+
+# a table swap waits this long for the locks of the readers of the old table, while new readers queue behind it,
+# then gives up and tries again a while later
+SWAP_LOCK_TIMEOUT = 2.0  # seconds
+SWAP_ATTEMPTS = 30
+SWAP_RETRY_WAIT = 10.0  # seconds
+
+# worker processes for the DGGS conversions made while serving requests, may be overridden by an optional
+# dggs_pool section in secrets.yml
+DGGS_POOL_SETTINGS = {
+    'workers': 2,
+    'max_pending': 8,
+    'timeout': 30.0,
+    'start_method': 'spawn',
+    'python': None,
+}
+DGGS_POOL_SETTINGS.update(DB_CON_DICT.get('dggs_pool') or {})
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+_stream_slots = threading.BoundedSemaphore(DB_STREAM_SETTINGS['max_streams'])
+_streams_running = [0]
+_streams_lock = threading.Lock()
+
+
+class DBStreamsBusy(Exception):
+    pass
+
+
+def get_db_pool():
+    # the pool is created on first use so the app can still start while the database is offline
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = ConnectionPool(DB_CON_DICT['db_con'], **DB_POOL_SETTINGS)
+    return _db_pool
+
+
+def db_pool_stats():
+    if _db_pool is None:
+        return {}
+    return _db_pool.stats()
+
+
+def db_stream_stats():
+    return {'running': _streams_running[0], 'max_streams': DB_STREAM_SETTINGS['max_streams']}
+
+
+def acquire_stream_slot():
+    # one of max_streams slots for a streamed download, raises DBStreamsBusy when they are all taken. The caller
+    # gives it back with release_stream_slot once the download has ended, e.g. with Response.call_on_close
+    if not _stream_slots.acquire(blocking=False):
+        raise DBStreamsBusy('Too many downloads, {} are already running'.format(DB_STREAM_SETTINGS['max_streams']))
+    with _streams_lock:
+        _streams_running[0] += 1
+
+
+def release_stream_slot():
+    with _streams_lock:
+        _streams_running[0] -= 1
+    _stream_slots.release()
+
+
+def _prepared_statement(q):
+    # name the statement after its text and swap psycopg2's %s placeholders for positional $n ones
+    counter = iter(range(1, 1000))
+    positional = re.sub(r'%%|%s', lambda m: '%' if m.group() == '%%' else '${}'.format(next(counter)), q)
+    return 'q_{}'.format(md5(q.encode('utf-8')).hexdigest()[:16]), positional
+
+
+def db_select(q, params=None, prepare=False):
+    # with prepare=True the query runs as a server-side prepared statement, so its plan is reused
+    # by every later call on the same pooled connection
     try:
-        conn = psycopg2.connect(**DB_CON_DICT['db_con'])
-
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute(q)
-        # import pdb
-        # pdb.set_trace()
-        # # names = [description[0] for description in cur.description]
-        # colnames = cur.description
-        # for row in colnames:
-        #     print (row[0])
-
-        return cur.fetchall()
+        pool = get_db_pool()
+        with pool.connection() as conn:
+            cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+            try:
+                if prepare:
+                    name, positional = _prepared_statement(q)
+                    prepared = pool.prepared_statements(conn)
+                    if name not in prepared:
+                        cur.execute('PREPARE {} AS {}'.format(name, positional))
+                        prepared.add(name)
+                    if params:
+                        cur.execute('EXECUTE {} ({})'.format(name, ', '.join(['%s'] * len(params))), params)
+                    else:
+                        cur.execute('EXECUTE {}'.format(name))
+                else:
+                    cur.execute(q, params)
+                return cur.fetchall()
+            finally:
+                cur.close()
     except Exception as e:
         print(e)
 
 
+def db_execute(q, params=None):
+    # for maintenance statements (DDL, bulk loads); unlike db_select errors are raised to the caller
+    with get_db_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(q, params)
+            return cur.rowcount
+        finally:
+            cur.close()
+
+
+def db_transaction(statements):
+    # runs (q, params) pairs as one transaction, so that other connections see all of them or none, errors are raised
+    with get_db_pool().connection() as conn:
+        conn.autocommit = False
+        cur = conn.cursor()
+        try:
+            for q, params in statements:
+                cur.execute(q, params)
+            conn.commit()
+        finally:
+            cur.close()
+
+
+def db_swap_table(staging, table, lock_timeout=SWAP_LOCK_TIMEOUT, attempts=SWAP_ATTEMPTS, retry_wait=SWAP_RETRY_WAIT):
+    # replaces table by staging, fully built, with its indexes renamed to match, in one transaction, so readers
+    # never see table missing or half loaded. A long read of the old table, e.g. a download, holds a lock the swap
+    # has to wait for while new readers queue behind it, so it waits at most lock_timeout seconds at a time
+    rows = db_select('SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s',
+                     [staging])
+    if rows is None:
+        raise IOError('Could not read the indexes of {}'.format(staging))
+    statements = [('SET LOCAL lock_timeout = %s', ['{}ms'.format(int(lock_timeout * 1000))]),
+                  ('DROP TABLE IF EXISTS "{}"'.format(table), None),
+                  ('ALTER TABLE "{}" RENAME TO "{}"'.format(staging, table), None)]
+    for (index,) in rows:
+        if index.startswith(staging):
+            statements.append(('ALTER INDEX "{}" RENAME TO "{}"'.format(index, table + index[len(staging):]), None))
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(retry_wait)
+        try:
+            db_transaction(statements)
+            return
+        except errors.LockNotAvailable:
+            print('{} is in use, could not swap in {} (attempt {} of {})'.format(table, staging, attempt + 1, attempts))
+    raise IOError('{} stayed in use, {} is built but not swapped in, run the build again'.format(table, staging))
+
+
+def db_stream(q, params=None, itersize=2000):
+    # yields the rows of a query from a server-side cursor, itersize rows at a time, so that a whole table can be read
+    # in constant memory. It runs on a connection of its own rather than one of the pool, held until the generator is
+    # exhausted or closed, errors are raised
+    conn = psycopg2.connect(**DB_CON_DICT['db_con'])
+    try:
+        # a named cursor only lives as long as its transaction, which autocommit would end at once
+        cur = conn.cursor(name='db_stream', cursor_factory=psycopg2.extras.DictCursor)
+        cur.itersize = itersize
+        try:
+            cur.execute(q, params)
+            for row in cur:
+                yield row
+        finally:
+            cur.close()
+    finally:
+        conn.close()
+
+
 # get the home page list of linked data
 path = os.path.join(directory, 'home_page_settings.yml')
 yaml_data = yaml.safe_load(open(path))
@@ -0,0 +1,227 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    '''
+    Raised when no database connection could be checked out of the pool before the timeout expired
+    '''
+    pass
+
+
+class ConnectionPool(object):
+    '''
+    A bounded, thread-safe pool of psycopg2 connections
+
+    Connections are opened lazily up to max_size and kept open (at least min_size of them) between requests.
+    A connection that has been idle for longer than check_after seconds is pinged before it is handed out again,
+    broken connections are discarded and replaced, and every checkout is returned to the pool even when the
+    query raises.
+    '''
+
+    def __init__(self, conn_kwargs, min_size=1, max_size=10, timeout=10.0, check_after=30.0, max_idle=600.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size: min_size={}, max_size={}'.format(min_size, max_size))
+        self._conn_kwargs = conn_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_idle = max_idle
+
+        self._cond = threading.Condition()
+        self._idle = []  # stack of (connection, time it was returned) - LIFO keeps the hot connections hot
+        self._size = 0  # connections open or being opened, idle + in use
+        self._closed = False
+        self._prepared = weakref.WeakKeyDictionary()  # connection -> names of the statements prepared on it
+        self._stats = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'connections_failed': 0,
+            'checkouts': 0,
+            'checkout_waits': 0,
+            'checkout_timeouts': 0,
+            'checkout_wait_seconds': 0.0,
+            'liveness_checks': 0,
+            'liveness_failures': 0,
+            'discarded': 0,
+        }
+
+        for i in range(min_size):
+            conn = self._connect()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(**self._conn_kwargs)
+        except Exception:
+            with self._cond:
+                self._stats['connections_failed'] += 1
+            raise
+        # the API only reads, so skip the BEGIN/ROLLBACK round trips around every query
+        conn.autocommit = True
+        with self._cond:
+            self._stats['connections_opened'] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats['connections_closed'] += 1
+
+    def _is_alive(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_after:
+            return True
+        with self._cond:
+            self._stats['liveness_checks'] += 1
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats['liveness_failures'] += 1
+            return False
+
+    def getconn(self, timeout=None):
+        '''
+        Check a connection out of the pool, waiting up to timeout seconds for one to become free
+        '''
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise PoolTimeout('The connection pool is closed')
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # reserve the slot, the connection is opened outside the lock
+                    conn, returned_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['checkout_timeouts'] += 1
+                    raise PoolTimeout('No database connection available after {}s ({} in use)'
+                                      .format(timeout, self._size))
+                if not waited:
+                    self._stats['checkout_waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            self._stats['checkout_wait_seconds'] += time.monotonic() - started
+
+        try:
+            if conn is not None and not self._is_alive(conn, returned_at):
+                self._close(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats['checkouts'] += 1
+        return conn
+
+    def putconn(self, conn, discard=False):
+        '''
+        Return a connection to the pool. Broken connections, or ones the caller asks to discard, are closed.
+        '''
+        if not discard:
+            if conn.closed:
+                discard = True
+            else:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        discard = True
+                if not discard and not conn.autocommit:
+                    conn.autocommit = True
+
+        with self._cond:
+            now = time.monotonic()
+            if not discard and not self._closed:
+                self._idle.append((conn, now))
+                conn = None
+            else:
+                self._size -= 1
+                if discard:
+                    self._stats['discarded'] += 1
+            # shrink back towards min_size, oldest idle connections first
+            stale = []
+            while self._size > self.min_size and self._idle and now - self._idle[0][1] > self.max_idle:
+                stale.append(self._idle.pop(0)[0])
+                self._size -= 1
+            self._cond.notify()
+
+        if conn is not None:
+            self._close(conn)
+        for stale_conn in stale:
+            self._close(stale_conn)
+
+    def prepared_statements(self, conn):
+        '''
+        The set of server-side prepared statement names already created on conn
+        '''
+        with self._cond:
+            return self._prepared.setdefault(conn, set())
+
+    @contextmanager
+    def connection(self, timeout=None):
+        '''
+        Context manager that checks out a connection and always gives it back, discarding it if it broke
+        '''
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.putconn(conn, discard=True)
+            raise
+        except BaseException:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, returned_at in self._idle]
+            self._size -= len(idle)
+            self._idle = []
+            self._cond.notify_all()
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['min_size'] = self.min_size
+            stats['max_size'] = self.max_size
+        return stats
@@ -1,6 +1,22 @@
-from flask import Blueprint, request, Response, render_template
+from flask import Blueprint, request, Response, render_template, jsonify, stream_with_context
 from model.sa1_aeip import TABLE_NAME, NAME_FIELD, SA1_LOC_INFO, SA1_BULD_EXPO, SA1_SEIFA, SA1_DEMO, SA1_ECON, \
-                           SA1_INST, SA1_TRANSPORT, SA1_UTILITY, SA1_BUSINESS, SA1_AGRI, SA1_ENVI
+                           SA1_INST, SA1_TRANSPORT, SA1_UTILITY, SA1_BUSINESS, SA1_AGRI, SA1_ENVI, dggs_providers
+from model.sa1_register import get_register_count, get_register_page
+from model.sa1_record import get_sa1_record
+from model.dataset import dataset_version
+from model.geom_lod import get_lod_geometry
+from model.sa1_tiles import get_tile, parse_attrs, TileError
+from model.sa1_cells import get_sa1_cover, DEFAULT_RESOLUTION
+from model.dggs_stream import stream_ndjson
+from model.cell_set import MAX_RESOLUTION
+from model.dggs_pool import dggs_pool, DGGSPoolBusy, DGGSJobTimeout
+from model.dggs_cache import dggs_cache_stats
+from model.cell_index import find_sa1s, CellIndexError, DEFAULT_LIMIT
+from model.exposure_pyramid import cell_exposure, ExposurePyramidError
+from model.sa1_dump import iter_rdf, gzip_chunks, FORMATS
+from model.sa1_export import iter_export, FORMATS as EXPORT_FORMATS
+from model.sa1_themes import parse_themes
+from model.cache import LRUCache, cache_stats
 from pyldapi import ContainerRenderer
 import conf
 import ast
@@ -12,6 +28,9 @@ routes = Blueprint('controller', __name__)
 
 DEFAULT_ITEMS_PER_PAGE=50
 
+# rendered folium pages for /map/<sa1_id>, bounded by their total size in characters
+_sa1_maps = LRUCache('sa1_maps', maxsize=1024, ttl=3600, weigh=len, max_weight=64 * 1024 * 1024)
+
 # @routes.route('/fsdf_home', strict_slashes=True)
 # def fsdf_home():
 #     return render_template('fsdf_home.html')
@@ -22,6 +41,18 @@ def home():
     return render_template('home.html', home_page_settings=conf.home_page_boxes_dict)
 
 
+@routes.route('/stats')
+def stats():
+    return jsonify({
+        'db_pool': conf.db_pool_stats(),
+        'db_streams': conf.db_stream_stats(),
+        'caches': cache_stats(),
+        'dggs_providers': dggs_providers.stats(),
+        'dggs_pool': dggs_pool.stats(),
+        'dggs_cache': dggs_cache_stats()
+    })
+
+
 @routes.route('/loc_info/')
 def sa1s_loc_info():
     return get_register_items()
@@ -31,6 +62,39 @@ def sa1_loc_info_element(loc_info_id):
     sa1_aeip = SA1_LOC_INFO(request, request.base_url)
     return sa1_aeip.render()
 
+@routes.route('/loc_info/<string:loc_info_id>/cells')
+def sa1_loc_info_cells(loc_info_id):
+    '''
+    The AusPIX DGGS cells covering the area of an SA1 as JSON, compacted to mixed resolutions, or with ?expand=true
+    all at the finest resolution. With ?encoding=ranges sibling cells are grouped under their parent, e.g.
+    R78523450[1-35], see cell_set.encode_ranges.
+    '''
+    expand = request.values.get('expand', 'false').lower() == 'true'
+    ranges = request.values.get('encoding') == 'ranges'
+    try:
+        cells = get_sa1_cover(loc_info_id)
+    except DGGSPoolBusy as e:
+        return Response(str(e), mimetype='text/plain', status=503, headers={'Retry-After': '5'})
+    except DGGSJobTimeout as e:
+        return Response(str(e), mimetype='text/plain', status=504)
+    except Exception as e:
+        print(e)
+        return Response('The database is offline', mimetype='text/plain', status=500)
+    if cells is None:
+        return Response('No SA1 with id {}'.format(loc_info_id), mimetype='text/plain', status=404)
+    if expand:
+        cells = cells.expand(DEFAULT_RESOLUTION)
+    return jsonify({
+        'meta': {
+            'cells_count': len(cells),
+            'resolution': DEFAULT_RESOLUTION,
+            'compact': not expand,
+            'encoding': 'ranges' if ranges else 'ids'
+        },
+        'dggs_cells': cells.ranges() if ranges else cells.ids()
+    })
+
+
 @routes.route('/building_exposure/')
 def sa1s_buld_expo():
     return get_register_items()
@@ -131,6 +195,208 @@ def sa1_environment_element(envi_id):
 
 
 
+@routes.route('/dggs/cells', methods=['POST'])
+def dggs_cells():
+    '''
+    The DGGS cells of every feature of the GeoJSON posted in the request body, streamed back as newline delimited
+    JSON while the features are read. ?resolution= sets the resolution, ?fill=true gives the cells covering polygons
+    rather than their boundary and ?expand=true those all at the resolution.
+    '''
+    try:
+        resolution = int(request.values.get('resolution', DEFAULT_RESOLUTION))
+    except ValueError:
+        resolution = -1
+    if not 0 <= resolution <= MAX_RESOLUTION:
+        return Response('The resolution must be from 0 to {}'.format(MAX_RESOLUTION), mimetype='text/plain', status=400)
+    fill = request.values.get('fill', 'false').lower() == 'true'
+    expand = request.values.get('expand', 'false').lower() == 'true'
+    return Response(stream_with_context(stream_ndjson(request.stream, resolution, fill, not expand, dggs_pool)),
+                    mimetype='application/x-ndjson')
+
+
+@routes.route('/dggs/sa1s')
+def dggs_sa1s():
+    '''
+    The SA1s overlapping the DGGS cells given as ?cells=R7852345,R78523 (of any resolution) and their exposure
+    attributes as JSON, at most ?limit= of them
+    '''
+    cells = [cell.strip() for cell in request.values.get('cells', '').split(',') if cell.strip()]
+    try:
+        limit = max(min(int(request.values.get('limit', DEFAULT_LIMIT)), DEFAULT_LIMIT), 1)
+        sa1s, truncated = find_sa1s(cells, limit=limit)
+    except ValueError as e:
+        return Response(str(e), mimetype='text/plain', status=400)
+    except CellIndexError as e:
+        return Response(str(e), mimetype='text/plain', status=503)
+    except Exception as e:
+        print(e)
+        return Response('The database is offline', mimetype='text/plain', status=500)
+    return jsonify({
+        'meta': {
+            'cells': cells,
+            'sa1s_count': len(sa1s),
+            'truncated': truncated
+        },
+        'sa1s': sa1s
+    })
+
+
+@routes.route('/dggs/exposure/<string:cell_id>')
+def dggs_exposure(cell_id):
+    '''
+    The total SA1 exposure apportioned to a DGGS cell of resolution 3 or finer, as JSON
+    '''
+    try:
+        exposure = cell_exposure(cell_id)
+    except ValueError as e:
+        return Response(str(e), mimetype='text/plain', status=400)
+    except ExposurePyramidError as e:
+        return Response(str(e), mimetype='text/plain', status=503)
+    except Exception as e:
+        print(e)
+        return Response('The database is offline', mimetype='text/plain', status=500)
+    return jsonify({
+        'meta': {
+            'cell': cell_id,
+            'resolution': len(cell_id) - 1
+        },
+        'exposure': exposure
+    })
+
+
+def _stream_response(chunks, mimetype, file_name):
+    # a download streamed from the database, in one of the slots for them, given back when the response is closed
+    try:
+        conf.acquire_stream_slot()
+    except conf.DBStreamsBusy as e:
+        return Response(str(e), mimetype='text/plain', status=503, headers={'Retry-After': '30'})
+    response = Response(stream_with_context(chunks), mimetype=mimetype,
+                        headers={'Content-Disposition': 'attachment; filename={}'.format(file_name)})
+    response.call_on_close(conf.release_stream_slot)
+    return response
+
+
+@routes.route('/dump')
+def sa1_dump():
+    '''
+    The whole dataset as gzipped N-Triples, or N-Quads with ?format=nquads, streamed. ?themes=loc_info,SEIFA limits
+    it to some themes, and ?partition=0&partitions=8 to the SA1s whose id % 8 is 0, to download in parallel, up to
+    max_streams downloads at a time (see conf.DB_STREAM_SETTINGS). ?cells=ranges gives the DGGS cells as cell groups
+    rather than a list of URIs.
+    '''
+    rdf_format = request.values.get('format', 'ntriples')
+    if rdf_format not in FORMATS:
+        return Response('The format must be one of {}'.format(', '.join(sorted(FORMATS))), mimetype='text/plain',
+                        status=400)
+    try:
+        themes = parse_themes(request.values.get('themes'))
+        partitions = int(request.values.get('partitions', 1))
+        partition = int(request.values.get('partition', 0))
+        if not 0 <= partition < partitions:
+            raise ValueError('The partition must be from 0 to partitions - 1')
+    except ValueError as e:
+        return Response(str(e), mimetype='text/plain', status=400)
+    file_name = 'aeip-{:03d}-of-{:03d}{}'.format(partition, partitions, FORMATS[rdf_format][1])
+    cell_ranges = request.values.get('cells') == 'ranges'
+    return _stream_response(gzip_chunks(iter_rdf(request.url_root, themes, rdf_format, partition, partitions,
+                                                 cell_ranges)),
+                            'application/gzip', file_name)
+
+
+@routes.route('/export')
+def sa1_export():
+    '''
+    The exposure attributes of every SA1 as CSV, or as NDJSON with ?format=ndjson, streamed. ?themes=loc_info,SEIFA
+    limits it to the columns of some themes.
+    '''
+    export_format = request.values.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response('The format must be one of {}'.format(', '.join(sorted(EXPORT_FORMATS))),
+                        mimetype='text/plain', status=400)
+    try:
+        themes = parse_themes(request.values.get('themes'))
+    except ValueError as e:
+        return Response(str(e), mimetype='text/plain', status=400)
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    file_name = 'aeip-sa1{}{}'.format('-' + themes[0] if len(themes) == 1 else '', extension)
+    return _stream_response(iter_export(themes, export_format), mimetype, file_name)
+
+
+@routes.route('/tiles/<int:z>/<int:x>/<int:y>.mvt')
+def sa1_tile(z, x, y):
+    '''
+    Mapbox Vector Tile of the SA1 layer, ?attrs= selects the exposure columns the features carry
+    '''
+    try:
+        attrs = parse_attrs(request.values.get('attrs'))
+    except TileError as e:
+        return Response(str(e), mimetype='text/plain', status=400)
+    try:
+        tile = get_tile(z, x, y, attrs)
+    except TileError as e:
+        return Response(str(e), mimetype='text/plain', status=404)
+    except Exception as e:
+        print(e)
+        return Response('The database is offline', mimetype='text/plain', status=500)
+    return Response(tile, mimetype='application/vnd.mapbox-vector-tile',
+                    headers={'Cache-Control': 'public, max-age=3600', 'Access-Control-Allow-Origin': '*'})
+
+
+def zoom_for_extent(lon_diff, lat_diff):
+    '''
+    The folium zoom level that fits an area of the given width and height in degrees into the map iframe
+    '''
+    ave_diff = (lon_diff + lat_diff)/2
+    if ave_diff > 0.47:
+        return 8
+    elif ave_diff > 0.3:
+        return 9
+    elif ave_diff > 0.2:
+        return 10
+    elif ave_diff > 0.1:
+        return 11
+    elif ave_diff > 0.02:
+        return 12
+    elif ave_diff > 0.01:
+        return 13
+    elif ave_diff > 0.007:
+        return 14
+    else:
+        return 15
+
+
+def render_sa1_map(record):
+    xmin, ymin, xmax, ymax = record['bbox']
+    name = str(record[NAME_FIELD])
+    zoom = zoom_for_extent(xmax - xmin, ymax - ymin)
+    folium_map = folium.Map(location=[(ymin + ymax) / 2, (xmin + xmax) / 2], zoom_start=zoom)
+    tooltip = 'Click for more information'
+    # the coarsest simplified geometry that still looks the same at this zoom
+    geom = get_lod_geometry(record['id'], zoom) or record['geom']
+    polygons = geom['coordinates'] if geom['type'] == 'MultiPolygon' else [geom['coordinates']]
+    for polygon in polygons:
+        for ring in polygon:
+            points = [(coords[1], coords[0]) for coords in ring]  # swap x & y for mapping
+            folium.Polygon(points, color="red", weight=2.5, opacity=1, popup=name, tooltip=tooltip).add_to(folium_map)
+    return folium_map.get_root().render()
+
+
+@routes.route('/map/<string:sa1_id>')
+def show_sa1_map(sa1_id):
+    '''
+    Function to render a map of an SA1, the geometry is loaded server-side rather than posted by the browser
+    '''
+    key = (dataset_version(), sa1_id)
+    html = _sa1_maps.get(key)
+    if html is None:
+        record = get_sa1_record(sa1_id)
+        if record is None or record['geom'] is None:
+            return Response('No SA1 with id {}'.format(sa1_id), mimetype='text/plain', status=404)
+        html = render_sa1_map(record)
+        _sa1_maps.set(key, html)
+    return Response(html, mimetype='text/html')
+
+
 @routes.route('/map', methods = ['POST', 'GET'])
 def show_map():
     '''
@@ -163,23 +429,7 @@ def show_map():
 
         lon_diff = max(p[1] for p in total_points) - min(p[1] for p in total_points)
         lat_diff = max(p[0] for p in total_points) - min(p[0] for p in total_points)
-        ave_diff = (lon_diff + lat_diff)/2
-        if ave_diff > 0.47:
-            zoom_start_level = 8
-        elif ave_diff > 0.3:
-            zoom_start_level = 9
-        elif ave_diff > 0.2:
-            zoom_start_level = 10
-        elif ave_diff > 0.1:
-            zoom_start_level = 11
-        elif ave_diff > 0.02:
-            zoom_start_level = 12
-        elif ave_diff > 0.01:
-            zoom_start_level = 13
-        elif ave_diff > 0.007:
-            zoom_start_level = 14
-        else:
-            zoom_start_level = 15
+        zoom_start_level = zoom_for_extent(lon_diff, lat_diff)
 
 
         # create a new map object
@@ -245,32 +495,16 @@ def get_register_items():
     search_string = request.values.get('search')
     try:
         # get the register length from the online DB
-        # sql = 'SELECT COUNT(*) FROM "AEIP_SA1join84"'
-        sql = 'SELECT COUNT(*) FROM "{table}"'.format(table=TABLE_NAME)
-        if search_string:
-            sql += '''WHERE UPPER(cast("id" as text)) LIKE '%{search_string}%' OR UPPER("{name}") LIKE '%{search_string}%';
-                   '''.format(name=NAME_FIELD, search_string=search_string.strip().upper())
-
-        no_of_items = conf.db_select(sql)[0][0]
+        no_of_items = get_register_count(search_string)
 
         page = int(request.values.get('page')) if request.values.get('page') is not None else 1
         per_page = int(request.values.get('per_page')) \
                    if request.values.get('per_page') is not None else DEFAULT_ITEMS_PER_PAGE
-        offset = (page - 1) * per_page
-
-        # get the id and name for each record in the database
-        sql = '''SELECT "id", "{name}" FROM "{table}"'''.format(name=NAME_FIELD, table=TABLE_NAME)
-        if search_string:
-            sql += '''WHERE UPPER(cast("id" as text)) LIKE '%{search_string}%' OR UPPER("{name}") LIKE '%{search_string}%'
-                   '''.format(name=NAME_FIELD, search_string=search_string.strip().upper())
-        sql += '''ORDER BY "{name}"
-                OFFSET {offset} LIMIT {per_page}'''.format(name=NAME_FIELD, offset=offset, per_page=per_page)
-
-        items = []
-        for item in conf.db_select(sql):
-            items.append(
-                (item[0], item[1])
-            )
+        # clients walking the whole register can pass the last SA1 code they saw instead of a page number
+        after = request.values.get('after')
+
+        # get the id and name for each record on this page, seeking rather than using OFFSET
+        items = get_register_page(search_string, page, per_page, after)
     except Exception as e:
         print(e)
         return Response('The database is offline', mimetype='text/plain', status=500)
@@ -0,0 +1,224 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+# every named cache registers itself here so its statistics can be reported at /stats
+CACHES = {}
+
+
+class LRUCache(object):
+    '''
+    A thread-safe, size-bounded LRU cache with an optional time-to-live and hit/miss counters
+
+    Entries are bounded by count (maxsize) and, if a weigh function is given, by their total weight (max_weight),
+    e.g. the number of bytes of geometry they hold.
+    '''
+
+    def __init__(self, name, maxsize=128, ttl=None, weigh=None, max_weight=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigh = weigh
+        self.max_weight = max_weight
+        self._data = OrderedDict()  # key -> (value, expiry time or None, weight)
+        self._weight = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        CACHES[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires, weight = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._data[key]
+                self._weight -= weight
+                self._expirations += 1
+            self._misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        weight = self.weigh(value) if self.weigh else 0
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._weight -= previous[2]
+            self._data[key] = (value, expires, weight)
+            self._weight += weight
+            while len(self._data) > self.maxsize or \
+                    (self.max_weight is not None and self._weight > self.max_weight and len(self._data) > 1):
+                evicted = self._data.popitem(last=False)[1]
+                self._weight -= evicted[2]
+                self._evictions += 1
+
+    def get_or_load(self, key, loader):
+        '''
+        Return the cached value for key, calling loader() and caching its result on a miss.
+        None results are not cached so that failed loads are retried.
+        '''
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._weight -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'weight': self._weight,
+                'max_weight': self.max_weight,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': float(self._hits) / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+            }
+
+
+class DiskCache(object):
+    '''
+    A size-bounded cache of bytes values stored as files in a directory
+
+    Files are written atomically, so several worker processes can share the directory. Every read refreshes a
+    file's modification time, and when the directory grows past max_bytes the least recently used files are removed
+    until it is back under low_water of that size.
+    '''
+
+    def __init__(self, name, directory, max_bytes=1024 * 1024 * 1024, low_water=0.9):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+        self._bytes = None  # this process's running estimate of the directory size, scanned on first write
+        CACHES[name] = self
+
+    def _path(self, key):
+        digest = sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path, None)
+        except (IOError, OSError):
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except (IOError, OSError) as e:
+            print(e)
+            return
+        with self._lock:
+            self._writes += 1
+            if self._bytes is None:
+                self._bytes = self._scan_size()
+            else:
+                self._bytes += len(value)
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _files(self):
+        for root, dirs, files in os.walk(self.directory):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # removed by another process
+                yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for mtime, size, path in self._files())
+
+    def evict(self):
+        files = sorted(self._files())
+        total = sum(size for mtime, size, path in files)
+        target = self.max_bytes * self.low_water
+        evicted = 0
+        for mtime, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._bytes = total
+            self._evictions += evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'directory': self.directory,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': float(self._hits) / lookups if lookups else 0.0,
+                'writes': self._writes,
+                'evictions': self._evictions,
+            }
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+'''
+The inverse of the precomputed SA1 covers: from AusPIX DGGS cells to the SA1s they overlap
+
+Every cell of every SA1's compact cover (see sa1_cells) is stored as its packed int64 code (see cell_set) next to the
+SA1 id, in a table indexed on the code. The descendants of a cell are exactly the codes from descendant_floor(code)
+to the code itself, so the SA1s under a cell of any resolution are found with one index range scan, and those whose
+cover holds a coarser cell around it with a lookup of each of its ancestors, without reading the rest of the table.
+Build it after the covers, once per dataset load, with
+
+    python -m model.sa1_cells build --cover --resolution 9
+    python -m model.cell_index build --resolution 9
+'''
+
+import time
+
+import numpy as np
+
+import conf
+from .cache import LRUCache
+from .cell_set import encode, ancestors, descendant_floor, resolutions
+from .sa1_cells import cells_table, cells_are_current, cells_stamp, DEFAULT_RESOLUTION
+from .sa1_themes import TABLE_NAME, NAME_FIELD, ALL_COLUMNS
+
+BATCH_SIZE = 1000  # SA1 covers read from the database and written to the index at a time
+MAX_QUERY_CELLS = 1000  # cells in one query
+DEFAULT_LIMIT = 1000  # SA1s returned by a query
+
+_index_versions = LRUCache('cell_index_version', maxsize=16, ttl=60)
+
+
+class CellIndexError(Exception):
+    pass
+
+
+def index_table(resolution=DEFAULT_RESOLUTION):
+    return '{}_cell_index_r{}'.format(TABLE_NAME, resolution)
+
+
+def _built_from_version(resolution):
+    rows = conf.db_select('SELECT obj_description(to_regclass(%s), %s)',
+                          ['"{}"'.format(index_table(resolution)), 'pg_class'])
+    return rows[0][0] if rows else None
+
+
+def index_is_current(resolution=DEFAULT_RESOLUTION):
+    built_from = _index_versions.get_or_load(resolution, lambda: _built_from_version(resolution) or '')
+    return bool(built_from) and built_from == cells_stamp()
+
+
+def _store_codes(table, sa1_ids, codes):
+    conf.db_execute('INSERT INTO "{}" (code, "id") SELECT * FROM unnest(%s::bigint[], %s::integer[])'.format(table),
+                    [codes, sa1_ids])
+
+
+def build_index(resolution=DEFAULT_RESOLUTION):
+    '''
+    Rebuilds the index of the given resolution from the current covers of that resolution
+    '''
+    if not cells_are_current(resolution, cover=True):
+        raise IOError('The resolution {} covers are missing or out of date, build them first with '
+                      'python -m model.sa1_cells build --cover --resolution {}'.format(resolution, resolution))
+    # built aside and swapped in once complete, as other processes keep using the index while it is built
+    table = index_table(resolution) + '_staging'
+    # loaded without the index, which is faster to create afterwards than to keep up to date
+    conf.db_execute('DROP TABLE IF EXISTS "{}"'.format(table))
+    conf.db_execute('CREATE TABLE "{}" (code bigint NOT NULL, "id" integer NOT NULL)'.format(table))
+
+    done = 0
+    total = 0
+    after = -1
+    started = time.monotonic()
+    while True:
+        rows = conf.db_select('SELECT "id", cells FROM "{}" WHERE "id" > %s ORDER BY "id" LIMIT %s'
+                              .format(cells_table(resolution, cover=True)), [after, BATCH_SIZE])
+        if rows is None:
+            raise IOError('Could not read the SA1 covers')
+        if not rows:
+            break
+        after = rows[-1][0]
+        sa1_ids = [sa1_id for sa1_id, cells in rows for cell in cells]
+        codes = encode([cell for sa1_id, cells in rows for cell in cells])
+        _store_codes(table, sa1_ids, codes.tolist())
+        done += len(rows)
+        total += len(codes)
+        print('{} SA1s, {} cells, {:.1f} SA1s/s'.format(done, total, done / (time.monotonic() - started)))
+
+    # code first, with the id in the index too, so a query never has to visit the table
+    conf.db_execute('CREATE INDEX "{table}_code_idx" ON "{table}" (code, "id")'.format(table=table))
+    conf.db_execute('ANALYZE "{}"'.format(table))
+    conf.db_execute('COMMENT ON TABLE "{}" IS %s'.format(table), [cells_stamp()])
+    conf.db_swap_table(table, index_table(resolution))
+    _index_versions.clear()
+
+
+def cell_ranges(cells):
+    '''
+    The (low, high) code ranges holding every cell of the index that overlaps one of the given cell ids: its own
+    descendants and itself, and each of its ancestors
+    '''
+    codes = np.unique(encode(cells))
+    low, high = [descendant_floor(codes)], [codes]
+    cell_resolutions = resolutions(codes)
+    for r in range(int(cell_resolutions.max()) if len(codes) else 0):
+        coarser = ancestors(codes[cell_resolutions > r], r)
+        low.append(coarser)
+        high.append(coarser)
+    ranges = np.unique(np.column_stack([np.concatenate(low), np.concatenate(high)]), axis=0)
+    return ranges[:, 0].tolist(), ranges[:, 1].tolist()
+
+
+def find_sa1s(cells, resolution=DEFAULT_RESOLUTION, limit=DEFAULT_LIMIT):
+    '''
+    The SA1s overlapping any of the given cell ids, of any resolution, as a list of dicts of their id, code and
+    exposure attributes ordered by id, and whether there were more than limit of them
+
+    Raises ValueError for an invalid cell id and CellIndexError if the index is not built for the current dataset.
+    '''
+    if len(cells) > MAX_QUERY_CELLS:
+        raise ValueError('At most {} cells can be queried at once'.format(MAX_QUERY_CELLS))
+    low, high = cell_ranges(cells)
+    if not low:
+        return [], False
+    if not index_is_current(resolution):
+        raise CellIndexError('The DGGS cell index is not built for the current dataset')
+    rows = conf.db_select('''
+        SELECT t."id", t."{name}", {columns}
+        FROM "{table}" t
+        WHERE t."id" IN (SELECT i."id"
+                         FROM "{index}" i
+                         JOIN unnest(%s::bigint[], %s::bigint[]) AS r(low, high) ON i.code BETWEEN r.low AND r.high)
+        ORDER BY t."id"
+        LIMIT %s'''.format(name=NAME_FIELD, table=TABLE_NAME, index=index_table(resolution),
+                           columns=', '.join('t."{}"'.format(column) for column in ALL_COLUMNS)),
+        [low, high, limit + 1])
+    if rows is None:
+        raise IOError('Could not query the DGGS cell index')
+    return [dict(row) for row in rows[:limit]], len(rows) > limit
+
+
+def index_summary(resolution=DEFAULT_RESOLUTION):
+    table = index_table(resolution)
+    return conf.db_select('SELECT count(*), count(DISTINCT "id"), obj_description(to_regclass(%s), %s) FROM "{}"'
+                          .format(table), ['"{}"'.format(table), 'pg_class'])
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Builds the index from AusPIX DGGS cells to the SA1s they overlap')
+    parser.add_argument('task', choices=['build', 'summary'])
+    parser.add_argument('--resolution', type=int, default=DEFAULT_RESOLUTION)
+    args = parser.parse_args()
+    if args.task == 'build':
+        build_index(args.resolution)
+    for count, sa1s, built_from in index_summary(args.resolution) or []:
+        print('resolution {}: {} cells of {} SA1s, built from {}'.format(args.resolution, count, sa1s, built_from))
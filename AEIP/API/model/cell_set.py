@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+'''
+Sets of rHEALPix (AusPIX) DGGS cells packed into sorted 64-bit integers
+
+A cell id such as R7852340 is a face letter followed by one digit (0-8) per resolution. It is packed as
+
+    bits 60-62   the face, N=0 O=1 P=2 Q=3 R=4 S=5
+    bits 56-59   the resolution 1 digit
+    ...
+    bits 0-3     the resolution 15 digit
+
+with the digits below the cell's resolution set to 0xF. Sorting the codes sorts the ids the way sorting the
+strings does, except that a cell sorts after its descendants, and the descendants of a cell at any resolution are
+exactly the codes between descendant_floor(code) and the code itself. Sets are sorted, unique numpy int64 arrays, so
+union, intersection and difference are O(n log n) merges and membership a binary search. Cells are turned back into
+their str(cell) ids only when they leave the set, with ids().
+'''
+
+import re
+from itertools import groupby
+
+import numpy as np
+
+FACES = 'NOPQRS'
+MAX_RESOLUTION = 15  # that of the default RHEALPixDGGS, 1 square metre cells
+N_SIDE = 3
+DIGIT_BITS = 4
+EMPTY_DIGIT = 0xF
+FACE_SHIFT = MAX_RESOLUTION * DIGIT_BITS
+
+_DIGIT_SHIFTS = np.array([(MAX_RESOLUTION - 1 - i) * DIGIT_BITS for i in range(MAX_RESOLUTION)], dtype=np.int64)
+_FACE_CODES = np.full(128, -1, dtype=np.int64)
+for _i, _face in enumerate(FACES):
+    _FACE_CODES[ord(_face)] = _i
+
+
+def _tail_mask(resolution):
+    # the bits of the digits below the given resolution
+    return (1 << (DIGIT_BITS * (MAX_RESOLUTION - resolution))) - 1
+
+
+def encode(ids):
+    '''
+    Packs an iterable (or numpy string array) of cell ids into an int64 array, in the same order
+    '''
+    ids = np.asarray(list(ids) if not isinstance(ids, np.ndarray) else ids, dtype=str)
+    if ids.size == 0:
+        return np.empty(0, dtype=np.int64)
+    # checked before the cast to MAX_RESOLUTION + 1 characters, which would cut a longer id to its ancestor's
+    too_long = np.char.str_len(ids) > MAX_RESOLUTION + 1
+    if too_long.any():
+        raise ValueError('Not an rHEALPix cell id in {}'.format(ids[too_long][:10].tolist()))
+    ids = ids.astype('<U{}'.format(MAX_RESOLUTION + 1))
+    chars = ids.reshape(-1, 1).view(np.uint32).astype(np.int64)
+    faces = _FACE_CODES[np.minimum(chars[:, 0], 127)]
+    digits = chars[:, 1:] - ord('0')
+    unused = chars[:, 1:] == 0  # numpy pads shorter strings with NUL
+    if (faces < 0).any() or ((digits < 0) | (digits >= N_SIDE * N_SIDE))[~unused].any() or \
+            (np.diff(unused.astype(np.int8), axis=1) < 0).any():
+        raise ValueError('Not an rHEALPix cell id in {}'.format(ids[:10].tolist()))
+    digits[unused] = EMPTY_DIGIT
+    return (faces << FACE_SHIFT) | np.bitwise_or.reduce(digits << _DIGIT_SHIFTS, axis=1)
+
+
+def resolutions(codes):
+    '''
+    The resolution of each code in an int64 array
+    '''
+    codes = np.asarray(codes, dtype=np.int64)
+    digits = (codes[:, None] >> _DIGIT_SHIFTS) & EMPTY_DIGIT
+    return (digits != EMPTY_DIGIT).sum(axis=1)
+
+
+def decode(codes):
+    '''
+    The cell ids of an int64 array of codes, as a list of strings
+    '''
+    codes = np.asarray(codes, dtype=np.int64)
+    if codes.size == 0:
+        return []
+    chars = np.zeros((codes.size, MAX_RESOLUTION + 1), dtype=np.uint32)
+    chars[:, 0] = np.frombuffer(FACES.encode('ascii'), dtype=np.uint8)[codes >> FACE_SHIFT]
+    digits = (codes[:, None] >> _DIGIT_SHIFTS) & EMPTY_DIGIT
+    chars[:, 1:] = np.where(digits == EMPTY_DIGIT, 0, digits + ord('0'))
+    return chars.view('<U{}'.format(MAX_RESOLUTION + 1)).ravel().tolist()
+
+
+def ancestors(codes, resolution):
+    '''
+    The resolution `resolution` ancestor of each code, codes coarser than that are returned unchanged
+    '''
+    return np.asarray(codes, dtype=np.int64) | _tail_mask(resolution)
+
+
+def descendant_floor(codes):
+    '''
+    The smallest code among the descendants of each cell, its descendants are the codes from here to the cell's own
+    '''
+    codes = np.asarray(codes, dtype=np.int64)
+    masks = (np.int64(1) << (DIGIT_BITS * (MAX_RESOLUTION - resolutions(codes)))) - 1
+    return codes & ~masks
+
+
+def children(codes):
+    '''
+    The N_SIDE ** 2 children of each code, all codes must be of the same resolution
+    '''
+    codes = np.asarray(codes, dtype=np.int64)
+    if codes.size == 0:
+        return codes
+    resolution = int(resolutions(codes[:1])[0])
+    if resolution >= MAX_RESOLUTION:
+        raise ValueError('Cells at resolution {} have no children'.format(MAX_RESOLUTION))
+    shift = DIGIT_BITS * (MAX_RESOLUTION - resolution - 1)
+    cleared = codes & ~np.int64(EMPTY_DIGIT << shift)
+    return (cleared[:, None] | (np.arange(N_SIDE * N_SIDE, dtype=np.int64) << shift)).ravel()
+
+
+_RANGE_GROUP = re.compile(r'^([{}][0-8]*)\[((?:[0-8](?:-[0-8])?)+)\]$'.format(FACES))
+_CELL_ID = re.compile(r'^[{}][0-8]{{0,{}}}$'.format(FACES, MAX_RESOLUTION))
+
+
+def _digit_class(digits):
+    # sorted unique digits as the body of a regex character class, e.g. 0 1 2 3 5 7 8 -> 0-3578
+    runs = []
+    for _, run in groupby(enumerate(digits), lambda item: item[1] - item[0]):
+        run = [digit for _, digit in run]
+        runs.append('{}-{}'.format(run[0], run[-1]) if len(run) > 2 else ''.join(str(digit) for digit in run))
+    return ''.join(runs)
+
+
+def encode_ranges(ids):
+    '''
+    A compact encoding of a list of cell ids: sibling cells are grouped under their parent's id followed by their
+    last digits as a character class, e.g. R785234501, R785234502, R785234503 and R785234505 become R78523450[1-35].
+    A cell without siblings in the list stays as it is. expand_ranges turns the groups back into the sorted ids.
+    '''
+    groups = []
+    for parent, siblings in groupby(sorted(set(ids), key=lambda cell: (cell[:-1], cell)),
+                                    lambda cell: cell[:-1] if len(cell) > 1 else None):
+        siblings = list(siblings)
+        if parent is None or len(siblings) == 1:
+            groups.extend(siblings)
+        else:
+            groups.append('{}[{}]'.format(parent, _digit_class([int(cell[-1]) for cell in siblings])))
+    return groups
+
+
+def expand_ranges(groups):
+    '''
+    The cell ids of a list of groups made by encode_ranges
+    '''
+    ids = []
+    for group in groups:
+        match = _RANGE_GROUP.match(group)
+        if match is None:
+            if not _CELL_ID.match(group):
+                raise ValueError('Not an rHEALPix cell id or range of cells: {!r}'.format(group))
+            ids.append(group)
+            continue
+        parent, digits = match.groups()
+        if len(parent) > MAX_RESOLUTION:
+            raise ValueError('Not an rHEALPix range of cells: {!r}'.format(group))
+        for low, high in re.findall(r'([0-8])(?:-([0-8]))?', digits):
+            ids.extend('{}{}'.format(parent, digit) for digit in range(int(low), int(high or low) + 1))
+    return ids
+
+
+class CellSet(object):
+    '''
+    An immutable set of DGGS cells, kept as a sorted array of unique int64 codes
+    '''
+
+    def __init__(self, codes=None, _sorted=False):
+        codes = np.empty(0, dtype=np.int64) if codes is None else np.asarray(codes, dtype=np.int64).ravel()
+        self.codes = codes if _sorted else np.unique(codes)
+
+    @classmethod
+    def from_ids(cls, ids):
+        '''
+        The set of the given cell ids (strings, or cell objects whose str() is the id)
+        '''
+        if not isinstance(ids, np.ndarray):
+            ids = [str(cell) for cell in ids]
+        return cls(encode(ids))
+
+    @classmethod
+    def from_ranges(cls, groups):
+        '''
+        The set of the cells of a list of groups made by encode_ranges
+        '''
+        return cls(encode(expand_ranges(groups)))
+
+    def ids(self):
+        return decode(self.codes)
+
+    def ranges(self):
+        return encode_ranges(self.ids())
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return iter(self.ids())
+
+    def __eq__(self, other):
+        return isinstance(other, CellSet) and np.array_equal(self.codes, other.codes)
+
+    def __repr__(self):
+        return 'CellSet({} cells)'.format(len(self))
+
+    def _code(self, cell):
+        if isinstance(cell, (int, np.integer)):
+            return np.int64(cell)
+        return encode([str(cell)])[0]
+
+    def __contains__(self, cell):
+        try:
+            code = self._code(cell)
+        except ValueError:
+            return False
+        i = np.searchsorted(self.codes, code)
+        return i < len(self.codes) and self.codes[i] == code
+
+    def contains_all(self, cells):
+        '''
+        A boolean array saying which of the given cells (a CellSet or an int64 array of codes) are in this set
+        '''
+        codes = cells.codes if isinstance(cells, CellSet) else np.asarray(cells, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self.codes, codes), max(len(self.codes) - 1, 0))
+        return self.codes[i] == codes if len(self.codes) else np.zeros(len(codes), dtype=bool)
+
+    def union(self, *others):
+        return CellSet(np.concatenate([self.codes] + [other.codes for other in others]))
+
+    def intersection(self, other):
+        return CellSet(np.intersect1d(self.codes, other.codes, assume_unique=True), _sorted=True)
+
+    def difference(self, other):
+        return CellSet(np.setdiff1d(self.codes, other.codes, assume_unique=True), _sorted=True)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def resolutions(self):
+        return resolutions(self.codes)
+
+    def parents(self, resolution):
+        '''
+        The set of the resolution `resolution` ancestors of the cells, cells coarser than that are kept as they are
+        '''
+        return CellSet(ancestors(self.codes, resolution))
+
+    def children(self):
+        '''
+        The set of the children of every cell, which must all be of the same resolution
+        '''
+        return CellSet(children(self.codes))
+
+    def expand(self, resolution):
+        '''
+        The same area as a set of cells all at the given resolution, every coarser cell replaced by its descendants
+        '''
+        codes = self.codes
+        cell_resolutions = resolutions(codes)
+        if len(codes) and cell_resolutions.max() > resolution:
+            raise ValueError('The set has cells finer than resolution {}'.format(resolution))
+        expanded = [codes[cell_resolutions == resolution]]
+        level = np.empty(0, dtype=np.int64)
+        for r in range(int(cell_resolutions.min()) if len(codes) else resolution, resolution):
+            level = children(np.concatenate([level, codes[cell_resolutions == r]]))
+        expanded.append(level)
+        return CellSet(np.concatenate(expanded))
+
+    def compact(self):
+        '''
+        The same area with every complete group of N_SIDE ** 2 sibling cells replaced by their parent, repeatedly,
+        and cells inside coarser ones dropped, giving the smallest mixed resolution set
+        '''
+        codes = self.codes
+        cell_resolutions = resolutions(codes)
+        # cells inside a coarser cell of the set add nothing to it
+        covered = np.zeros(len(codes), dtype=bool)
+        for r in np.unique(cell_resolutions)[:-1].tolist():
+            finer = cell_resolutions > r
+            covered[finer] |= np.isin(ancestors(codes[finer], r), codes[cell_resolutions == r])
+        codes, cell_resolutions = codes[~covered], cell_resolutions[~covered]
+        for r in range(int(cell_resolutions.max()) if len(codes) else 0, 0, -1):
+            at_r = cell_resolutions == r
+            parents = ancestors(codes[at_r], r - 1)
+            unique_parents, counts = np.unique(parents, return_counts=True)
+            complete = unique_parents[counts == N_SIDE * N_SIDE]
+            if len(complete):
+                replaced = np.zeros(len(codes), dtype=bool)
+                replaced[at_r] = np.isin(parents, complete)
+                codes = np.unique(np.concatenate([codes[~replaced], complete]))
+                cell_resolutions = resolutions(codes)
+        return CellSet(codes, _sorted=True)
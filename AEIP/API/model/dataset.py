@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+'''
+Tracks the version of the AEIP dataset loaded in the database, so that caches can be invalidated when it changes
+
+The version is a stamp the data load writes, with
+
+    python -m model.dataset stamp
+
+into a one-row-per-table version table, so it only changes when the data does (statistics counters are reset by
+pg_stat_reset, crash recovery and failovers). The file node of the table is stamped alongside it as a sanity check:
+a table that has been recreated, truncated or rewritten since it was stamped gets a version of its own, as does a
+table that was never stamped.
+'''
+
+import threading
+import time
+from datetime import datetime, timezone
+
+import conf
+from .sa1_themes import TABLE_NAME
+
+VERSION_CHECK_SECONDS = 60  # how long a looked up version is trusted before asking the database again
+VERSION_TABLE = 'aeip_dataset_version'
+
+_version = None
+_checked_at = None
+_lock = threading.Lock()
+
+
+def _load_dataset_version():
+    rows = conf.db_select('SELECT c.oid, c.relfilenode, to_regclass(%s) IS NOT NULL FROM pg_class c '
+                          'WHERE c.oid = %s::regclass', ['"{}"'.format(VERSION_TABLE), '"{}"'.format(TABLE_NAME)])
+    if not rows:
+        return None
+    oid, relfilenode, stamped = rows[0]
+    if stamped:
+        rows = conf.db_select('SELECT "version", "relfilenode" FROM "{}" WHERE "table_name" = %s'.format(VERSION_TABLE),
+                              [TABLE_NAME])
+        if rows is None:
+            return None
+        if rows and rows[0][1] == relfilenode:
+            return '{}:{}'.format(TABLE_NAME, rows[0][0])
+        if rows:
+            print('{} has been rewritten since it was stamped {}, run python -m model.dataset stamp'.format(
+                TABLE_NAME, rows[0][0]))
+            return '{}:{}:{}.{}'.format(TABLE_NAME, rows[0][0], oid, relfilenode)
+    return '{}:{}.{}'.format(TABLE_NAME, oid, relfilenode)
+
+
+def stamp_dataset(version=None):
+    '''
+    Records a new version of the dataset, by default the current UTC time, and returns it. Run it after every load.
+    '''
+    global _checked_at
+    version = version or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    conf.db_execute('''CREATE TABLE IF NOT EXISTS "{}" (
+                           "table_name" text PRIMARY KEY,
+                           "version" text NOT NULL,
+                           "relfilenode" oid NOT NULL,
+                           "stamped_at" timestamptz NOT NULL DEFAULT now())'''.format(VERSION_TABLE))
+    conf.db_execute('''INSERT INTO "{}" ("table_name", "version", "relfilenode")
+                       SELECT %s, %s, relfilenode FROM pg_class WHERE oid = %s::regclass
+                       ON CONFLICT ("table_name") DO UPDATE
+                       SET "version" = EXCLUDED."version", "relfilenode" = EXCLUDED."relfilenode",
+                           "stamped_at" = now()'''.format(VERSION_TABLE),
+                    [TABLE_NAME, version, '"{}"'.format(TABLE_NAME)])
+    with _lock:
+        _checked_at = None
+    return version
+
+
+def dataset_version():
+    '''
+    Returns an opaque string that changes whenever the AEIP table is reloaded or modified.
+    The database is asked at most once every VERSION_CHECK_SECONDS.
+    '''
+    global _version, _checked_at
+    now = time.monotonic()
+    with _lock:
+        if _checked_at is not None and now - _checked_at < VERSION_CHECK_SECONDS:
+            return _version
+    version = _load_dataset_version()
+    with _lock:
+        _version = version
+        _checked_at = now
+    return version
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Stamps or shows the version of the loaded AEIP dataset')
+    parser.add_argument('command', choices=['stamp', 'show'])
+    parser.add_argument('--version', help='the version to stamp, by default the current UTC time')
+    args = parser.parse_args()
+    if args.command == 'stamp':
+        print(stamp_dataset(args.version))
+    else:
+        print(dataset_version())
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+'''
+A cache of the DGGS cells of geometries, keyed on their content
+
+The same geometries, above all SA1 polygons, are converted again and again. Results are keyed on a hash of the
+geometry in a canonical form (keys sorted, numbers as floats) together with the resolution, the kind of conversion
+and the conversion version, so an equal geometry hits the cache whichever request or SA1 it comes from. Cells are
+kept in memory as CellSets and on disk as packed int64 codes, shared by the worker processes and kept across
+restarts, both tiers bounded in size.
+'''
+
+import json
+import os
+import threading
+from hashlib import sha256
+
+import numpy as np
+
+import conf
+from .cache import LRUCache, DiskCache
+from .cell_set import CellSet
+from .dggs_in_line import get_cells_in_feature, get_cells_in_geojson, CONVERSION_VERSION
+
+DGGS_CACHE_DIR = os.path.join(conf.CACHE_DIR, 'dggs')
+DGGS_CACHE_BYTES = 512 * 1024 * 1024
+
+_memory_cells = LRUCache('dggs_cells', maxsize=4096, weigh=lambda cells: cells.codes.nbytes,
+                         max_weight=64 * 1024 * 1024)
+_disk_cells = DiskCache('dggs_cells_disk', DGGS_CACHE_DIR, max_bytes=DGGS_CACHE_BYTES)
+
+_lock = threading.Lock()
+_stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+
+def _canonical(value):
+    # the same geometry whether its numbers were written as ints or floats, or its arrays as tuples or lists
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def geometry_key(geometry, resolution, mode):
+    '''
+    The cache key of the cells of a GeoJSON geometry dict (or a list of them) at a resolution, mode naming the
+    kind of conversion
+    '''
+    text = json.dumps(_canonical(geometry), sort_keys=True, separators=(',', ':'))
+    return sha256('{}|{}|{}|{}'.format(CONVERSION_VERSION, resolution, mode, text).encode('utf-8')).hexdigest()
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def cached_cells(geometry, resolution, mode, compute):
+    '''
+    The CellSet of a geometry from memory or disk, or from compute() which is then cached
+    '''
+    key = geometry_key(geometry, resolution, mode)
+    cells = _memory_cells.get(key)
+    if cells is not None:
+        _count('memory_hits')
+        return cells
+    value = _disk_cells.get(key)
+    if value is not None:
+        _count('disk_hits')
+        cells = CellSet(np.frombuffer(value, dtype='<i8').astype(np.int64), _sorted=True)
+    else:
+        _count('misses')
+        cells = compute()
+        _disk_cells.set(key, cells.codes.astype('<i8').tobytes())
+    _memory_cells.set(key, cells)
+    return cells
+
+
+def _mode(fill, compact):
+    return 'cover' if fill and compact else 'cover-expanded' if fill else 'lines'
+
+
+def _in_process(fn, *args):
+    return fn(*args)
+
+
+def feature_cells(feature, resolution, fill=False, compact=True, run=_in_process):
+    '''
+    get_cells_in_feature through the cache, run(fn, *args) computes a miss, e.g. in the DGGS pool
+    '''
+    return cached_cells(feature.get('geometry'), resolution, _mode(fill, compact),
+                        lambda: run(get_cells_in_feature, feature, resolution, False, fill, compact))
+
+
+def geojson_cells(geo_json, resolution, fill=False, compact=True, run=_in_process):
+    '''
+    get_cells_in_geojson through the cache, run(fn, *args) computes a miss, e.g. in the DGGS pool
+    '''
+    geometries = [feature.get('geometry') for feature in geo_json['features']]
+    return cached_cells(geometries, resolution, _mode(fill, compact),
+                        lambda: run(get_cells_in_geojson, geo_json, resolution, False, fill, compact))
+
+
+def dggs_cache_stats():
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+    stats['hit_rate'] = float(stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+    return stats
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+'''
+The AusPIX DGGS cells covering the area of a polygon, not just its boundary
+
+Cells are squares in the rHEALPix plane, so the polygon is projected there once and the cells are found top down:
+starting from the six resolution 0 cells, a cell outside the polygon is dropped, one wholly inside it is kept as it
+is and one on the boundary is split into its children, down to the requested resolution. The result is the smallest
+mixed resolution set of cells covering the polygon, which CellSet.expand turns back into cells of one resolution.
+
+The polygon must not cross the edges of the polar faces (N and S) nor the antimeridian, which no part of Australia
+does.
+'''
+
+import numpy as np
+from rhealpixdggs import dggs
+from shapely.geometry import box, shape, Polygon, MultiPolygon
+from shapely.prepared import prep
+
+from .cell_set import CellSet, FACES, N_SIDE, FACE_SHIFT, DIGIT_BITS, MAX_RESOLUTION, EMPTY_DIGIT, children
+
+rdggs = dggs.RHEALPixDGGS()
+
+MAX_EDGE_DEGREES = 0.01  # longer edges are split before projecting, as edges that are straight in lon, lat are not
+                         # quite straight in the plane
+
+
+def planar_line(ring):
+    '''
+    The rHEALPix plane image of a line or ring given as an (n, 2) array of lon, lat vertices, as an array of x, y
+    '''
+    ring = np.asarray(ring, dtype=np.float64)
+    previous, vertex = ring[:-1], ring[1:]
+    length = np.sqrt(((vertex - previous) ** 2).sum(axis=1))
+    segments = np.maximum(np.ceil(length / MAX_EDGE_DEGREES), 1).astype(np.int64)
+    edge = np.repeat(np.arange(len(segments)), segments)
+    step = np.arange(segments.sum()) - np.repeat(np.cumsum(segments) - segments, segments)
+    points = previous[edge] + (step / segments[edge])[:, None] * (vertex - previous)[edge]
+    points = np.vstack([points, ring[-1:]])
+    x, y = rdggs.rhealpix(points[:, 0], points[:, 1])
+    return np.column_stack([x, y])
+
+
+def planar_polygon(geometry):
+    '''
+    The rHEALPix plane image of a GeoJSON Polygon or MultiPolygon geometry dict, as a shapely geometry
+    '''
+    geom = shape(geometry)
+    polygons = geom.geoms if isinstance(geom, MultiPolygon) else [geom]
+    planar = [Polygon(planar_line(polygon.exterior.coords), [planar_line(ring.coords) for ring in polygon.interiors])
+              for polygon in polygons if not polygon.is_empty]
+    return MultiPolygon(planar).buffer(0)  # repairs rings that the projection has made touch
+
+
+def cell_squares(codes):
+    '''
+    The squares of an array of packed cell codes in the rHEALPix plane, as an (n, 4) array of xmin, ymin, xmax, ymax
+    '''
+    codes = np.asarray(codes, dtype=np.int64)
+    corners = np.array([rdggs.ul_vertex[face] for face in FACES], dtype=np.float64)[codes >> FACE_SHIFT]
+    digits = (codes[:, None] >> (DIGIT_BITS * np.arange(MAX_RESOLUTION - 1, -1, -1))) & EMPTY_DIGIT
+    used = digits != EMPTY_DIGIT
+    widths = rdggs.cell_width(0) / float(N_SIDE) ** np.arange(1, MAX_RESOLUTION + 1)
+    x = corners[:, 0] + (np.where(used, digits % N_SIDE, 0) * widths).sum(axis=1)
+    y = corners[:, 1] - (np.where(used, digits // N_SIDE, 0) * widths).sum(axis=1)
+    width = rdggs.cell_width(0) / float(N_SIDE) ** used.sum(axis=1)
+    return np.column_stack([x, y - width, x + width, y])
+
+
+def cell_square(code):
+    '''
+    The (xmin, ymin, xmax, ymax) of the square of a packed cell code in the rHEALPix plane
+    '''
+    return tuple(cell_squares([code])[0].tolist())
+
+
+def polygon_cells(geometry, resolution, compact=True):
+    '''
+    The CellSet of the cells covering a GeoJSON Polygon or MultiPolygon geometry dict: every cell of the given
+    resolution that overlaps it, with complete groups of children replaced by their parents if compact, otherwise
+    all of the given resolution
+    '''
+    polygon = planar_polygon(geometry)
+    prepared = prep(polygon)
+    covering = []
+    level = np.array([i << FACE_SHIFT | ((1 << FACE_SHIFT) - 1) for i in range(len(FACES))], dtype=np.int64)
+    for r in range(resolution + 1):
+        split = []
+        for code in level.tolist():
+            square = box(*cell_square(code))
+            if not prepared.intersects(square) or prepared.touches(square):
+                continue
+            if r == resolution or prepared.contains(square):
+                covering.append(code)
+            else:
+                split.append(code)
+        if not split:
+            break
+        level = children(np.array(split, dtype=np.int64))
+    cells = CellSet(covering).compact()  # siblings on the boundary can still make up a whole parent
+    return cells if compact else cells.expand(resolution)
@@ -1,7 +1,12 @@
 import math
+import numpy as np
 from rhealpixdggs import dggs
+from .cell_set import CellSet, encode, FACE_SHIFT
+from .dggs_cover import polygon_cells, planar_line, cell_squares
 rdggs = dggs.RHEALPixDGGS()
 
+CONVERSION_VERSION = 3  # bump it when the conversion finds different cells, it stamps stored and cached cells
+
 from shapely.geometry import shape, LineString, MultiLineString, MultiPolygon, Polygon
 from geojson.utils import coords
 
@@ -38,9 +43,7 @@ def densify_my_line(line_to_densify, resolution):
     designed to return a continuous string of ajoining DGGS cells along a line feature
     '''
 
-    resArea = (rdggs.cell_area(resolution, plane=False))  # ask engine for area of cell
-    # math to define a suitable distance between vertices - ensures good representation of the line - a continuous run of cells to define the line
-    min_dist = math.sqrt(float(resArea))/300000  # width of cell changes with sqrt of the area - 300000 is a constant that can be changed but will change output
+    min_dist = min_vertex_distance(resolution)
 
     # import pdb
     # pdb.set_trace()
@@ -77,6 +80,15 @@ def densify_my_line(line_to_densify, resolution):
     return new_line  # we return this line in the datset with extra points along it (densified)
 
 
+def min_vertex_distance(resolution):
+    '''
+    the distance in degrees between the vertices of a densified line at the given resolution
+    '''
+    resArea = (rdggs.cell_area(resolution, plane=False))  # ask engine for area of cell
+    # math to define a suitable distance between vertices - ensures good representation of the line - a continuous run of cells to define the line
+    return math.sqrt(float(resArea))/300000  # width of cell changes with sqrt of the area - 300000 is a constant that can be changed but will change output
+
+
 def split(start, end, segments):
     '''
    add vertices to a line to densify
@@ -91,81 +103,228 @@ def split(start, end, segments):
     return [start] + points + [end]
 
 
+def line_crossing_points(line_points, resolution):
+    '''
+    adaptive densification: one point inside each cell a line crosses at the given resolution, in order along the
+    line, as an (n, 2) array in the rHEALPix plane
+    line_points is an (n, 2) array of lon, lat vertices. In the plane the cells are squares on a grid, so rather
+    than stepping a fixed distance the line is cut where it crosses each grid line of the resolution and a point is
+    taken halfway along every piece, each of which lies in the cell next to the previous one
+    '''
+    planar = planar_line(line_points)
+    if len(planar) < 2:
+        return planar
+    width = rdggs.cell_width(resolution)
+    origin = np.array([0.0, rdggs.cell_width(0) / 2])  # the grid lines of every resolution pass through here
+    grid = (planar - origin) / width
+    start, end = grid[:-1], grid[1:]
+    segment_ids = [np.arange(len(start)), np.arange(len(start))]
+    ts = [np.zeros(len(start)), np.ones(len(start))]
+    for axis in (0, 1):
+        low = np.floor(np.minimum(start[:, axis], end[:, axis]))
+        crossings = (np.floor(np.maximum(start[:, axis], end[:, axis])) - low).astype(np.int64)
+        segment = np.repeat(np.arange(len(start)), crossings)
+        line = low[segment] + 1 + np.arange(crossings.sum()) - np.repeat(np.cumsum(crossings) - crossings, crossings)
+        segment_ids.append(segment)
+        ts.append((line - start[segment, axis]) / (end[segment, axis] - start[segment, axis]))
+    segment, t = np.concatenate(segment_ids), np.concatenate(ts)
+    order = np.lexsort((t, segment))
+    segment, t = segment[order], t[order]
+    # the pieces between consecutive crossings of a segment, skipping those of no length where the line passes
+    # through a corner
+    piece = (segment[:-1] == segment[1:]) & (t[1:] - t[:-1] > 1e-12)
+    middle = (t[:-1][piece] + t[1:][piece]) / 2
+    segment = segment[:-1][piece]
+    # the centre of the cell each piece is in, found with the same arithmetic as the crossings, so a line along a
+    # grid line stays on one side of it rather than going by how the engine rounds points on the edge
+    cells = np.floor(start[segment] + middle[:, None] * (end - start)[segment])
+    # where the line goes exactly through a corner, also the cell beside it, so consecutive cells share an edge
+    step = cells[1:] - cells[:-1]
+    corner = np.nonzero((np.abs(step) == 1).all(axis=1))[0]
+    cells = np.insert(cells, corner + 1, np.column_stack([cells[corner + 1, 0], cells[corner, 1]]), axis=0)
+    return origin + (cells + 0.5) * width
+
+
+def line_cells(line_points, resolution):
+    '''
+    the packed codes of the cells a line, an (n, 2) array of lon, lat vertices, crosses at the given resolution, in
+    order along the line
+    '''
+    points = line_crossing_points(line_points, resolution)
+    cells = rdggs.cells_from_points(points[:, 0], points[:, 1], resolution, plane=True)
+    return encode(cells[cells != ''])
+
+
+def find_gaps(codes):
+    '''
+    the positions i at which two cells next to each other along a line, codes[i] and codes[i + 1] of an array of
+    packed codes, are neither the same cell nor share an edge, i.e. where the line has skipped a cell (cells that
+    only share a corner mean the line jumped across the corner of another cell). Only cells on the same face are
+    compared: faces that meet on the sphere, like N and P, are not always next to each other in the plane
+    '''
+    codes = np.asarray(codes, dtype=np.int64)
+    squares = cell_squares(codes)
+    first, second = squares[:-1], squares[1:]
+    tolerance = 1e-6 * np.minimum(first[:, 2] - first[:, 0], second[:, 2] - second[:, 0])
+    # the length of the overlap of the two squares along x and along y, negative if they are apart
+    overlap_x = np.minimum(first[:, 2], second[:, 2]) - np.maximum(first[:, 0], second[:, 0])
+    overlap_y = np.minimum(first[:, 3], second[:, 3]) - np.maximum(first[:, 1], second[:, 1])
+    same = (overlap_x > tolerance) & (overlap_y > tolerance)
+    share_edge = ((overlap_x > tolerance) & (np.abs(overlap_y) <= tolerance)) | \
+                 ((overlap_y > tolerance) & (np.abs(overlap_x) <= tolerance))
+    same_face = (codes[:-1] >> FACE_SHIFT) == (codes[1:] >> FACE_SHIFT)
+    return np.nonzero(~same & ~share_edge & same_face)[0]
+
+
+def points_to_cells(points, resolution):
+    '''
+    the ids of the cells containing an (n, 2) array of lon, lat points, as an array of strings
+    the ellipsoidal projection and the cell index math are done for all the points at once by the DGGS engine,
+    which makes the same decisions as cell_from_point(resolution, pt, plane=False)
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return rdggs.cells_from_points(points[:, 0], points[:, 1], resolution, plane=False)
+
+
+def line_to_DGGS_array(points, resolution):
+    '''
+    line_to_DGGS for an (n, 2) array of points: the CellSet of the cells they fall in
+    '''
+    cells = points_to_cells(points, resolution)
+    return CellSet.from_ids(cells[cells != ''])  # outside the DGGS, cell_from_point returns None
+
+
 def line_to_DGGS(line_coords, resolution):  # one poly and the attribute record for it
     """
     Takes a list of line coords and a resolution and returns a list of DGGS cells objects.
     """
-    doneDGGScells = [] #to accumlate a list of completed cells
-    arrLines = []
+    doneDGGScells = {} #to accumlate the completed cells, by id
     for pt in line_coords:  # for each point calculate the DGGS by calling on the DGGS engine
         # ask the engine what cell thisPoint is in
         thisDGGS = rdggs.cell_from_point(resolution, pt, plane=False)# plane=false therefore on the ellipsoid curve
         #add cell if not already in there
-        if thisDGGS not in doneDGGScells: # == new one
-            doneDGGScells.append(thisDGGS) # save as a done cell
-    return doneDGGScells
+        doneDGGScells.setdefault(str(thisDGGS), thisDGGS)
+    return list(doneDGGScells.values())
 
 
-def get_cells_in_feature(fea, resolution, return_cell_obj=False):
+def get_cells_in_feature(fea, resolution, return_cell_obj=False, fill=False, compact=True):
+    # with fill, polygons give the cells covering their area (see dggs_cover), compacted to mixed resolutions
+    # unless compact is False, rather than the cells along their boundary
     geom = shape((fea['geometry']))
     cells = []
-    if isinstance(geom, MultiLineString) or isinstance(geom, MultiPolygon):
-        # return cell object for line
-        fea['geometry']['coordinates'] = densify_my_line(fea['geometry']['coordinates'], resolution)
-    elif isinstance(geom, LineString) or isinstance(geom, Polygon):
-        fea['geometry']['coordinates'] = densify_my_line([fea['geometry']['coordinates']], resolution)
+    if fill and (isinstance(geom, MultiPolygon) or isinstance(geom, Polygon)):
+        return polygon_cells(fea['geometry'], resolution, compact)
+    if isinstance(geom, MultiPolygon) or isinstance(geom, Polygon):
+        geom = geom.boundary  # the cells along every ring
+    if isinstance(geom, MultiLineString):
+        return CellSet(np.concatenate([line_cells(line.coords, resolution) for line in geom.geoms]))
+    elif isinstance(geom, LineString):
+        return CellSet(line_cells(geom.coords, resolution))
 
-    curr_coords = list(coords(fea))
-    cells = line_to_DGGS(curr_coords, resolution)
+    # points are converted as they are, in one call
+    curr_coords = np.array(list(coords(fea)), dtype=np.float64)
+    cells = line_to_DGGS_array(curr_coords, resolution)
 
     return cells
 
 
-def get_cells_in_geojson(geojson, resolution, return_cell_obj=False):
-    list_cells = []
-
-    for fea in geojson['features']:  # for feature in attribute table
-        res_cells = get_cells_in_feature(fea, resolution, return_cell_obj)
-        list_cells = list(list_cells + res_cells)
-    return list_cells
+def get_cells_in_geojson(geojson, resolution, return_cell_obj=False, fill=False, compact=True):
+    # the CellSet of the cells of every feature
+    cells = CellSet().union(*[get_cells_in_feature(fea, resolution, return_cell_obj, fill, compact)
+                              for fea in geojson['features']])
+    return cells.compact() if fill and compact else cells
 
 
 def reduce_duplicate_cells_2d_array(cells):
     # input 2-d array of cells
     # return original cells (str or object)
-    unique_cells = []
-    unique_cells_str = []
-    for cell_array in cells:
-        # 1-d array
-        for cell in cell_array:
-            cell_id = str(cell)
-            if cell_id not in unique_cells_str:
-                unique_cells_str.append(cell_id)
-                unique_cells.append(cell)
-    return unique_cells
+    return reduce_duplicate_cells_1d_array(cell for cell_array in cells for cell in cell_array)
 
 
 def reduce_duplicate_cells_1d_array(cells):
-    unique_cells = []
-    unique_cells_str = []
+    unique_cells = {}  # by id, in the order first seen
     for cell in cells:
-        cell_id = str(cell)
-        if cell_id not in unique_cells_str:
-            unique_cells_str.append(cell_id)
-            unique_cells.append(cell)
-    return unique_cells
+        unique_cells.setdefault(str(cell), cell)
+    return list(unique_cells.values())
 
 
-def get_cells_in_json_and_return_in_json(geo_json, resolution, if_polygon):
+def get_cells_in_json_and_return_in_json(geo_json, resolution, if_polygon, fill=False, compact=True):
 
-    cells = get_cells_in_geojson(geo_json, resolution, if_polygon)
-    cells = reduce_duplicate_cells_1d_array(cells)
+    cells = get_cells_in_geojson(geo_json, resolution, if_polygon, fill, compact)
 
     meta = {
         "cells_count": len(cells)
     }
     return {
         "meta": meta,
-        "dggs_cells": [str(cell) for cell in cells],
+        "dggs_cells": cells.ids(),
         # "payload": geojson_obj
     }
+
+
+def _benchmark_polygon(vertices, lat=-35.3):
+    # a jagged, coastline like ring about 50 km across
+    angles = np.linspace(0, 2 * math.pi, vertices, endpoint=False)
+    radius = 0.25 * (1 + 0.3 * np.sin(angles * 37) + 0.1 * np.sin(angles * 501))
+    ring = np.column_stack([149.1 + radius * np.cos(angles) / math.cos(math.radians(lat)), lat + radius * np.sin(angles)])
+    return {'type': 'MultiPolygon', 'coordinates': [[np.vstack([ring, ring[:1]]).tolist()]]}
+
+
+def _fixed_step_points(ring, resolution):
+    # densify_my_line's fixed step of min_vertex_distance degrees, but with every edge kept in the line's direction
+    ring = np.asarray(ring, dtype=np.float64)
+    points = [ring[:1]]
+    for previous, vertex in zip(ring[:-1], ring[1:]):
+        segments = max(int(round(math.sqrt(((vertex - previous) ** 2).sum()) / min_vertex_distance(resolution))), 1)
+        points.append(previous + np.linspace(0, 1, segments + 1)[1:, None] * (vertex - previous))
+    return np.vstack(points)
+
+
+def benchmark(vertices=2000, resolution=9, repeat=3, lat=-35.3):
+    '''
+    times the fixed step conversion (densify_my_line, then cell_from_point for every point) against the adaptive one
+    get_cells_in_feature uses, on the same ring, and checks both for gaps: cells next to each other along the ring
+    that do not share an edge
+    '''
+    import copy
+    import time
+
+    geometry = _benchmark_polygon(vertices, lat)
+    ring = geometry['coordinates'][0][0]
+
+    def fixed_step():
+        fea = {'type': 'Feature', 'geometry': copy.deepcopy(geometry)}
+        fea['geometry']['coordinates'] = densify_my_line(fea['geometry']['coordinates'], resolution)
+        return CellSet.from_ids(line_to_DGGS(list(coords(fea)), resolution))
+
+    def adaptive():
+        return get_cells_in_feature({'type': 'Feature', 'geometry': geometry}, resolution)
+
+    fixed_points = _fixed_step_points(ring, resolution)
+    fixed_cells = encode(points_to_cells(fixed_points, resolution))
+    adaptive_cells = line_cells(ring, resolution)
+    print('{} vertices at latitude {}, resolution {}'.format(vertices, lat, resolution))
+    results = {}
+    for name, run, points, cells in (('fixed step', fixed_step, len(fixed_points), fixed_cells),
+                                     ('adaptive', adaptive, len(line_crossing_points(ring, resolution)),
+                                      adaptive_cells)):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results[name] = run()
+            timings.append(time.perf_counter() - started)
+        print('{:>10}: {:.3f} s, {} points, {} cells, {} gaps'.format(name, min(timings), points, len(results[name]),
+                                                                     len(find_gaps(cells))))
+    print('cells only found by the fixed step: {}, only by the adaptive: {}'.format(
+        len(results['fixed step'] - results['adaptive']), len(results['adaptive'] - results['fixed step'])))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmarks the fixed step and adaptive line to cell conversions')
+    parser.add_argument('--vertices', type=int, default=2000)
+    parser.add_argument('--resolution', type=int, default=9)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--lat', type=float, default=-35.3)
+    args = parser.parse_args()
+    benchmark(args.vertices, args.resolution, args.repeat, args.lat)
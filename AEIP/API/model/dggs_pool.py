@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+'''
+A bounded pool of worker processes for the CPU-bound DGGS conversions made while serving requests
+
+The app serves requests from threads, so converting a big geometry in the request thread holds the GIL and stalls
+every other request of the process. Jobs run here in separate processes instead, each of which builds its
+RHEALPixDGGS engine once when it starts. A job is rejected at once when max_pending jobs are already running or
+waiting (DGGSPoolBusy), and a job that runs past its timeout or is cancelled has its worker process killed and
+replaced, so it stops using the CPU straight away.
+'''
+
+import multiprocessing
+import queue
+import threading
+import time
+
+import conf
+
+POLL_SECONDS = 0.05  # how often a waiting job checks whether it has been cancelled
+
+
+class DGGSPoolError(Exception):
+    pass
+
+
+class DGGSPoolBusy(DGGSPoolError):
+    pass
+
+
+class DGGSJobTimeout(DGGSPoolError):
+    pass
+
+
+class DGGSJobCancelled(DGGSPoolError):
+    pass
+
+
+def _warm_up():
+    # builds the module level RHEALPixDGGS engines and runs the conversion once, so the first job is not slow
+    from .dggs_in_line import get_cells_in_json_and_return_in_json
+    from .dggs_cover import polygon_cells
+    polygon = {'type': 'Polygon', 'coordinates': [[[149.1, -35.3], [149.11, -35.3], [149.11, -35.29], [149.1, -35.3]]]}
+    get_cells_in_json_and_return_in_json({'type': 'FeatureCollection',
+                                          'features': [{'type': 'Feature', 'geometry': polygon}]}, 9, True)
+    polygon_cells(polygon, 9)
+
+
+def _worker_main(conn):
+    _warm_up()
+    conn.send(('ready', None))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        fn, args, kwargs = job
+        try:
+            conn.send(('ok', fn(*args, **kwargs)))
+        except Exception as e:
+            conn.send(('error', e))
+
+
+class _Worker(object):
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class DGGSPool(object):
+    '''
+    Runs functions in up to `workers` warm worker processes, with at most max_pending jobs admitted at a time
+    '''
+
+    def __init__(self, workers=2, max_pending=8, timeout=30.0, start_method='spawn', python=None):
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self.timeout = timeout
+        self._context = multiprocessing.get_context(start_method)
+        if python:
+            self._context.set_executable(python)  # e.g. under mod_wsgi, where sys.executable is not python
+        self._admission = threading.BoundedSemaphore(self.max_pending)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._running = 0
+        self._stats = {
+            'submitted': 0,
+            'rejected': 0,
+            'completed': 0,
+            'failed': 0,
+            'timed_out': 0,
+            'cancelled': 0,
+            'workers_started': 0,
+            'workers_killed': 0,
+            'total_seconds': 0.0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _checkout(self, deadline, cancel):
+        # an idle worker, starting one whenever fewer than `workers` are alive, also while waiting, as a worker
+        # killed by a timeout or cancellation leaves room for a new one
+        while True:
+            with self._lock:
+                start = self._idle.empty() and self._started < self.workers
+                if start:
+                    self._started += 1
+            if start:
+                try:
+                    worker = _Worker(self._context)
+                except Exception:
+                    with self._lock:
+                        self._started -= 1
+                    raise
+                self._count('workers_started')
+                return worker
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                self._count('timed_out')
+                raise DGGSJobTimeout('No DGGS worker became free in time')
+            if cancel is not None and cancel.is_set():
+                self._count('cancelled')
+                raise DGGSJobCancelled('The DGGS job was cancelled')
+            try:
+                return self._idle.get(timeout=POLL_SECONDS if remaining is None else min(POLL_SECONDS, remaining))
+            except queue.Empty:
+                pass
+
+    def _discard(self, worker):
+        worker.kill()
+        with self._lock:
+            self._started -= 1
+        self._count('workers_killed')
+
+    def run(self, fn, *args, **kwargs):
+        '''
+        Returns fn(*args, **kwargs) computed in a worker process. fn and its arguments and result must be picklable
+        and fn importable by the workers, i.e. a module level function.
+
+        The keyword arguments timeout (seconds, default the pool's, None for no limit), cancel (a threading.Event
+        that cancels the job when set) and block (wait for admission instead of raising DGGSPoolBusy) are the pool's.
+        '''
+        timeout = kwargs.pop('timeout', self.timeout)
+        cancel = kwargs.pop('cancel', None)
+        block = kwargs.pop('block', False)
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+
+        if not self._admission.acquire(blocking=block, timeout=timeout if block else None):
+            self._count('rejected')
+            raise DGGSPoolBusy('Too many DGGS jobs, {} are already pending'.format(self.max_pending))
+        self._count('submitted')
+        try:
+            worker = self._checkout(deadline, cancel)
+            with self._lock:
+                self._running += 1
+            try:
+                return self._run_on(worker, fn, args, kwargs, deadline, cancel)
+            finally:
+                with self._lock:
+                    self._running -= 1
+        finally:
+            self._admission.release()
+            self._count('total_seconds', time.monotonic() - started)
+
+    def _run_on(self, worker, fn, args, kwargs, deadline, cancel):
+        try:
+            if not worker.ready:
+                self._receive(worker, deadline, cancel)  # the 'ready' sent once the worker has warmed up
+                worker.ready = True
+            worker.conn.send((fn, args, kwargs))
+            status, result = self._receive(worker, deadline, cancel)
+        except BaseException:
+            # the worker is still busy with the job (or dead), killing it is the only way to stop it
+            self._discard(worker)
+            raise
+        self._idle.put(worker)
+        if status == 'error':
+            self._count('failed')
+            raise result
+        self._count('completed')
+        return result
+
+    def _receive(self, worker, deadline, cancel):
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                self._count('timed_out')
+                raise DGGSJobTimeout('The DGGS job took too long')
+            if cancel is not None and cancel.is_set():
+                self._count('cancelled')
+                raise DGGSJobCancelled('The DGGS job was cancelled')
+            if worker.conn.poll(POLL_SECONDS if remaining is None else min(POLL_SECONDS, remaining)):
+                return worker.conn.recv()
+            if not worker.process.is_alive():
+                raise EOFError('The DGGS worker died')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['workers'] = self._started
+            stats['idle_workers'] = self._idle.qsize()
+            stats['running'] = self._running
+            stats['max_pending'] = self.max_pending
+        return stats
+
+    def close(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(worker)
+
+
+dggs_pool = DGGSPool(**conf.DGGS_POOL_SETTINGS)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+'''
+Providers that find the AusPIX DGGS cells of a GeoJSON FeatureCollection
+
+The in-process rhealpixdggs engine is the primary provider and the remote DGGS web API the fallback. Each provider
+sits behind a circuit breaker: after failure_threshold consecutive failures it is skipped for reset_timeout seconds,
+then a single trial call decides whether it is used again. The remote provider keeps its HTTP connections alive in
+a pooled session and every call is bounded by connect and read timeouts, so a slow remote cannot hold a worker
+thread indefinitely.
+'''
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .dggs_cache import geojson_cells
+from .dggs_pool import dggs_pool, DGGSPoolBusy
+
+
+class DGGSProviderError(Exception):
+    pass
+
+
+class LocalDGGSProvider(object):
+    '''
+    Finds the cells with the rhealpixdggs engine, in a worker process of the DGGS pool so that a big geometry does
+    not hold up the other requests, unless they are in the DGGS cache. When the pool is full it raises DGGSPoolBusy
+    rather than queue past max_pending, and the chain goes on to the next provider.
+    '''
+    name = 'local'
+
+    def find_cells(self, geo_json, resolution, as_polygon):
+        return geojson_cells(geo_json, resolution, run=dggs_pool.run).ids()
+
+
+class RemoteDGGSProvider(object):
+    '''
+    Finds the cells with the DGGS web API at api_uri, e.g. http://host/api/search/
+    '''
+    name = 'remote'
+
+    def __init__(self, api_uri, connect_timeout=2.0, read_timeout=10.0, pool_size=10):
+        self.api_uri = api_uri
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def find_cells(self, geo_json, resolution, as_polygon):
+        res = self.session.post('{}find_dggs_by_geojson'.format(self.api_uri),
+                                params={'resolution': resolution, 'dggs_as_polygon': as_polygon},
+                                json=geo_json,
+                                timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()['dggs_cells']
+
+
+class CircuitBreaker(object):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True  # let exactly one request through to test the provider
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def release(self):
+        # the call was never made, e.g. the provider was busy, so it says nothing about the provider
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class DGGSProviderChain(object):
+    '''
+    Asks each provider in turn, in priority order, skipping those whose circuit is open, and records per-provider
+    latency metrics
+    '''
+
+    def __init__(self, providers, failure_threshold=3, reset_timeout=30.0):
+        self.providers = providers
+        self._breakers = {p.name: CircuitBreaker(failure_threshold, reset_timeout) for p in providers}
+        self._metrics = {p.name: {'calls': 0, 'failures': 0, 'skipped': 0, 'busy': 0, 'total_seconds': 0.0,
+                                  'max_seconds': 0.0, 'last_seconds': None, 'last_error': None}
+                         for p in providers}
+        self._lock = threading.Lock()
+
+    def _record(self, name, seconds, error=None):
+        with self._lock:
+            metrics = self._metrics[name]
+            metrics['calls'] += 1
+            metrics['total_seconds'] += seconds
+            metrics['max_seconds'] = max(metrics['max_seconds'], seconds)
+            metrics['last_seconds'] = seconds
+            if error is not None:
+                metrics['failures'] += 1
+                metrics['last_error'] = '{}: {}'.format(type(error).__name__, error)
+
+    def find_cells(self, geo_json, resolution, as_polygon):
+        '''
+        Returns the list of cell ids of geo_json at the given resolution from the first provider that succeeds
+        '''
+        errors = []
+        for provider in self.providers:
+            breaker = self._breakers[provider.name]
+            if not breaker.allow():
+                with self._lock:
+                    self._metrics[provider.name]['skipped'] += 1
+                continue
+            started = time.monotonic()
+            try:
+                cells = provider.find_cells(geo_json, resolution, as_polygon)
+            except DGGSPoolBusy as e:
+                # overloaded, not broken: try the next provider without opening the circuit
+                breaker.release()
+                with self._lock:
+                    self._metrics[provider.name]['busy'] += 1
+                errors.append('{}: {}'.format(provider.name, e))
+                continue
+            except Exception as e:
+                self._record(provider.name, time.monotonic() - started, e)
+                breaker.record_failure()
+                errors.append('{}: {}'.format(provider.name, e))
+                continue
+            self._record(provider.name, time.monotonic() - started)
+            breaker.record_success()
+            return cells
+        raise DGGSProviderError('No DGGS provider could find the cells ({})'.format('; '.join(errors) or
+                                                                                    'all circuits open'))
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for provider in self.providers:
+                metrics = dict(self._metrics[provider.name])
+                metrics['mean_seconds'] = metrics['total_seconds'] / metrics['calls'] if metrics['calls'] else None
+                metrics['circuit'] = self._breakers[provider.name].state
+                stats[provider.name] = metrics
+            return stats
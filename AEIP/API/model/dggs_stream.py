@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+'''
+Streaming conversion of large GeoJSON files to AusPIX DGGS cells
+
+The features of a FeatureCollection are read one at a time from a file or request body, so a national roads or
+powerline file goes through in constant memory, as long as no single feature is too big. Newline delimited (or RS
+separated, RFC 8142) sequences of Features are read the same way. Each feature is converted on its own, without
+changing it, and the cells are yielded per feature:
+
+    python -m model.dggs_stream roads.geojson --resolution 10 > roads_cells.ndjson
+'''
+
+import codecs
+import json
+from functools import partial
+
+from .dggs_cache import feature_cells
+
+CHUNK_SIZE = 64 * 1024  # characters read at a time
+_WHITESPACE = ' \t\n\r\x1e'  # \x1e separates the records of a GeoJSON text sequence
+
+
+class GeoJSONStreamError(ValueError):
+    pass
+
+
+class _Reader(object):
+    # a growing text buffer over a file-like object of str or bytes, from which JSON values are decoded one by one
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.offset = 0  # characters dropped from the front of the buffer
+        self.eof = False
+
+    def _fill(self, size):
+        data = self.fp.read(size)
+        if isinstance(data, bytes):
+            data = self.utf8.decode(data, final=not data)
+        if not data:
+            self.eof = True
+            return False
+        # drop what has been consumed, so the buffer only ever holds about one value
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # the next character that is not whitespace, or '' at the end of the input
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise GeoJSONStreamError('Expected {} at character {}, found {!r}'.format(
+                ' or '.join(repr(c) for c in chars), self.offset + self.pos, char or 'the end'))
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError as e:
+                # a value cut off at the end of the buffer, read more (in ever bigger pieces, so that a big
+                # feature is not decoded over and over) and try again
+                if self.eof or not self._fill(size):
+                    raise GeoJSONStreamError('Invalid GeoJSON: {}'.format(e))
+                size *= 2
+                continue
+            if end == len(self.buffer) and not self.eof and isinstance(value, (int, float)):
+                self._fill(size)  # a number may go on in the next chunk
+                continue
+            self.pos = end
+            return value
+
+
+def iter_features(fp, chunk_size=CHUNK_SIZE):
+    '''
+    Yields the Features of a GeoJSON FeatureCollection, a single Feature or a sequence of Features (newline
+    delimited or RFC 8142) read incrementally from the file-like object fp, of text or UTF-8 bytes
+    '''
+    reader = _Reader(fp, chunk_size)
+    while reader.peek():
+        reader.expect('{')
+        members = {}
+        if reader.peek() != '}':
+            while True:
+                key = reader.value()
+                reader.expect(':')
+                if key == 'features':
+                    reader.expect('[')
+                    if reader.peek() != ']':
+                        while True:
+                            feature = reader.value()
+                            if not isinstance(feature, dict):
+                                raise GeoJSONStreamError('Not a GeoJSON Feature: {!r}'.format(feature)[:200])
+                            yield feature
+                            if reader.expect(',]') == ']':
+                                break
+                    else:
+                        reader.expect(']')
+                else:
+                    members[key] = reader.value()
+                if reader.expect(',}') == '}':
+                    break
+        else:
+            reader.expect('}')
+        if members.get('type') == 'Feature':
+            yield members
+
+
+def stream_cells(features, resolution, fill=False, compact=True, pool=None):
+    '''
+    Yields a dict of the id, properties and cell ids of each feature in turn, or of the error if it could not be
+    converted. Features are looked up in the DGGS cache, and converted in the DGGSPool pool if given, waiting for
+    room in it, otherwise in this process.
+    '''
+    run = {} if pool is None else {'run': partial(pool.run, block=True)}
+    for index, feature in enumerate(features):
+        result = {'index': index, 'id': feature.get('id'), 'properties': feature.get('properties')}
+        try:
+            cells = feature_cells(feature, resolution, fill, compact, **run)
+            result['cells_count'] = len(cells)
+            result['dggs_cells'] = cells.ids()
+        except Exception as e:
+            result['error'] = '{}: {}'.format(type(e).__name__, e)
+        yield result
+
+
+def stream_ndjson(fp, resolution, fill=False, compact=True, pool=None):
+    '''
+    The cells of every feature read from fp, as lines of newline delimited JSON
+    '''
+    try:
+        for result in stream_cells(iter_features(fp), resolution, fill, compact, pool):
+            yield json.dumps(result) + '\n'
+    except GeoJSONStreamError as e:
+        yield json.dumps({'error': str(e)}) + '\n'
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description='Converts the features of a GeoJSON file to DGGS cells, as NDJSON')
+    parser.add_argument('input', help='a GeoJSON file, - for stdin')
+    parser.add_argument('--resolution', type=int, default=9)
+    parser.add_argument('--fill', action='store_true', help='the cells covering polygons rather than their boundary')
+    parser.add_argument('--expand', action='store_true', help='with --fill, all cells at the resolution')
+    args = parser.parse_args()
+    fp = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    with fp:
+        for line in stream_ndjson(fp, args.resolution, args.fill, not args.expand):
+            sys.stdout.write(line)
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+'''
+SA1 exposure aggregated onto the AusPIX DGGS grid, at every resolution from 3 to 9
+
+Each SA1's additive exposure values (population, dwellings, reconstruction values, counts of facilities and so on)
+are apportioned to the cells of its compact cover (see dggs_cover) by the fraction of the SA1's area in each cell.
+rHEALPix is an equal area projection, so the fractions are those of the areas in the plane. The fractions are stored
+once, and the database then sums the values of the cells of every resolution from those of the cells below them:
+
+    python -m model.exposure_pyramid build --workers 8
+
+A cell wholly inside one SA1 is kept at the coarse resolution its cover gives it, since the exposure is spread evenly
+over it: a finer cell inside it gets its share by area, 1/9 per resolution. Every cell of the pyramid has the total
+of the cover cells at its resolution or finer inside it, and apart from that the uniform sums of those at exactly its
+resolution. As the cover of one SA1 can have a coarse cell around finer cells of another, the total exposure of any
+cell is its own total plus the share of the uniform sums of each of its ancestors, a lookup of at most 16 keys
+whatever the cell's resolution.
+'''
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+
+import conf
+from .cache import LRUCache
+from .cell_set import encode, ancestors, resolutions, N_SIDE, MAX_RESOLUTION, DIGIT_BITS
+from .dataset import dataset_version
+from .dggs_cover import planar_polygon, polygon_cells, cell_squares
+from .sa1_cells import cells_stamp, DEFAULT_RESOLUTION
+from .sa1_themes import TABLE_NAME, THEME_COLUMNS
+
+MIN_RESOLUTION = 3
+MAX_PYRAMID_RESOLUTION = DEFAULT_RESOLUTION
+PYRAMID_THEMES = ['building_exposure', 'demographic_exposure', 'economic_exposure', 'institution_exposure',
+                  'transport_exposure', 'utility_exposure', 'business_exposure', 'agriculture_exposure']
+NOT_ADDITIVE = ['residensity1km_v11_mean', 'aeip_TOP_5_EMPLOYING_INDUSTRIES', 'aeip_COMMODITY_LIST']
+PYRAMID_COLUMNS = [column for theme in PYRAMID_THEMES for column in THEME_COLUMNS[theme]
+                   if column not in NOT_ADDITIVE]
+BATCH_SIZE = 200  # SA1 geometries read from the database at a time
+CHUNK_SIZE = 10  # geometries handed to a worker process at a time
+
+FRACTIONS_TABLE = '{}_exposure_fractions'.format(TABLE_NAME)
+PYRAMID_TABLE = '{}_exposure_pyramid'.format(TABLE_NAME)
+
+UNIFORM_COLUMNS = ['{}_uniform'.format(column) for column in PYRAMID_COLUMNS]
+
+_pyramid_versions = LRUCache('exposure_pyramid_version', maxsize=1, ttl=60)
+
+
+class ExposurePyramidError(Exception):
+    pass
+
+
+def _fractions_of_sa1(sa1):
+    # runs in a worker process: the cells of the SA1's compact cover and the fraction of its area in each
+    sa1_id, geometry = sa1
+    polygon = planar_polygon(geometry)
+    codes = polygon_cells(geometry, MAX_PYRAMID_RESOLUTION).codes
+    if polygon.area <= 0 or not len(codes):
+        return sa1_id, [], [], []
+    squares = cell_squares(codes)
+    boxes = shapely.box(squares[:, 0], squares[:, 1], squares[:, 2], squares[:, 3])
+    fractions = shapely.area(shapely.intersection(boxes, polygon)) / polygon.area
+    keep = fractions > 0
+    return sa1_id, codes[keep].tolist(), resolutions(codes[keep]).tolist(), fractions[keep].tolist()
+
+
+def _store_fractions(table, results):
+    conf.db_execute('INSERT INTO "{}" ("id", code, resolution, fraction) '
+                    'SELECT * FROM unnest(%s::integer[], %s::bigint[], %s::smallint[], %s::double precision[])'
+                    .format(table),
+                    [[sa1_id for sa1_id, codes, cell_resolutions, fractions in results for code in codes],
+                     [code for result in results for code in result[1]],
+                     [r for result in results for r in result[2]],
+                     [f for result in results for f in result[3]]])
+
+
+def build_fractions(workers=4):
+    '''
+    Recomputes the area fractions of every SA1 in its cells, in worker processes
+    '''
+    if dataset_version() is None:
+        raise IOError('Could not read the version of {}'.format(TABLE_NAME))
+    version = cells_stamp()
+    fractions = FRACTIONS_TABLE + '_staging'  # swapped in once complete, so a pyramid is never summed from part of it
+    conf.db_execute('DROP TABLE IF EXISTS "{}"'.format(fractions))
+    conf.db_execute('''CREATE TABLE "{}" (
+                           "id" integer NOT NULL,
+                           code bigint NOT NULL,
+                           resolution smallint NOT NULL,
+                           fraction double precision NOT NULL
+                       )'''.format(fractions))
+    total = conf.db_select('SELECT count(*) FROM "{}"'.format(TABLE_NAME))[0][0]
+    print('Apportioning {} SA1s with {} workers'.format(total, workers))
+
+    done = 0
+    after = -1
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            rows = conf.db_select('SELECT "id", ST_AsGeoJSON(geom) FROM "{}" WHERE "id" > %s ORDER BY "id" LIMIT %s'
+                                  .format(TABLE_NAME), [after, BATCH_SIZE])
+            if rows is None:
+                raise IOError('Could not read the SA1 geometries')
+            if not rows:
+                break
+            after = rows[-1][0]
+            sa1s = [(sa1_id, json.loads(geometry)) for sa1_id, geometry in rows if geometry is not None]
+            _store_fractions(fractions, list(executor.map(_fractions_of_sa1, sa1s, chunksize=CHUNK_SIZE)))
+            done += len(rows)
+            elapsed = time.monotonic() - started
+            remaining = (total - done) * elapsed / done if done < total else 0
+            print('{}/{} SA1s, {:.1f} SA1s/s, about {:.0f} s to go'.format(done, total, done / elapsed, remaining))
+    conf.db_execute('ANALYZE "{}"'.format(fractions))
+    # stamped like the pyramid, which is only summed from fractions of the current dataset
+    conf.db_execute('COMMENT ON TABLE "{}" IS %s'.format(fractions), [version])
+    conf.db_swap_table(fractions, FRACTIONS_TABLE)
+
+
+def fractions_version():
+    rows = conf.db_select('SELECT obj_description(to_regclass(%s), %s)', ['"{}"'.format(FRACTIONS_TABLE), 'pg_class'])
+    return rows[0][0] if rows else None
+
+
+def _number(column):
+    # the columns may be stored as text, anything that is not a number counts as 0
+    return ('CASE WHEN t."{c}"::text ~ \'^\\s*[-+]?([0-9]+\\.?[0-9]*|\\.[0-9]+)([eE][-+]?[0-9]+)?\\s*$\' '
+            'THEN t."{c}"::text::double precision ELSE 0 END').format(c=column)
+
+
+def build_pyramid():
+    '''
+    Sums the apportioned exposure of the cells of every resolution from MIN_RESOLUTION to MAX_PYRAMID_RESOLUTION
+
+    Raises ExposurePyramidError if the area fractions are not those of the current dataset, as the sums would then
+    mix the fractions of the old SA1s with the values of the new ones.
+    '''
+    version = cells_stamp()
+    if fractions_version() != version:
+        raise ExposurePyramidError('The area fractions are missing or out of date, apportion the SA1s again with '
+                                   'python -m model.exposure_pyramid build')
+    pyramid = PYRAMID_TABLE + '_staging'  # swapped in once complete, while the pages keep using the old table
+    columns = ', '.join('"{}"'.format(column) for column in PYRAMID_COLUMNS + UNIFORM_COLUMNS)
+    conf.db_execute('DROP TABLE IF EXISTS "{}"'.format(pyramid))
+    conf.db_execute('''CREATE TABLE "{}" (
+                           code bigint PRIMARY KEY,
+                           resolution smallint NOT NULL,
+                           {}
+                       )'''.format(pyramid, ', '.join('"{}" double precision'.format(column)
+                                                      for column in PYRAMID_COLUMNS + UNIFORM_COLUMNS)))
+    for r in range(MIN_RESOLUTION, MAX_PYRAMID_RESOLUTION + 1):
+        # every cell at r holding cells of the covers at r or finer, the uniform sums from those that are at r
+        sums = ', '.join(['sum(f.fraction * {})'.format(_number(column)) for column in PYRAMID_COLUMNS] +
+                         ['coalesce(sum(f.fraction * {}) FILTER (WHERE f.resolution = {}), 0)'
+                          .format(_number(column), r) for column in PYRAMID_COLUMNS])
+        started = time.monotonic()
+        count = conf.db_execute('''
+            INSERT INTO "{pyramid}" (code, resolution, {columns})
+            SELECT f.code | %s, %s, {sums}
+            FROM "{fractions}" f JOIN "{table}" t ON t."id" = f."id"
+            WHERE f.resolution >= %s
+            GROUP BY 1'''.format(pyramid=pyramid, fractions=FRACTIONS_TABLE, table=TABLE_NAME,
+                                 columns=columns, sums=sums),
+            [(1 << (DIGIT_BITS * (MAX_RESOLUTION - r))) - 1, r, r])
+        print('resolution {}: {} cells in {:.1f} s'.format(r, count, time.monotonic() - started))
+    # cells of the covers coarser than MIN_RESOLUTION, only ever looked up as ancestors, for their uniform sums
+    conf.db_execute('''
+        INSERT INTO "{pyramid}" (code, resolution, {columns})
+        SELECT f.code, f.resolution, {sums}
+        FROM "{fractions}" f JOIN "{table}" t ON t."id" = f."id"
+        WHERE f.resolution < %s
+        GROUP BY f.code, f.resolution'''.format(
+            pyramid=pyramid, fractions=FRACTIONS_TABLE, table=TABLE_NAME,
+            columns=', '.join('"{}"'.format(column) for column in UNIFORM_COLUMNS),
+            sums=', '.join('sum(f.fraction * {})'.format(_number(column)) for column in PYRAMID_COLUMNS)),
+        [MIN_RESOLUTION])
+    conf.db_execute('ANALYZE "{}"'.format(pyramid))
+    conf.db_execute('COMMENT ON TABLE "{}" IS %s'.format(pyramid), [version])
+    conf.db_swap_table(pyramid, PYRAMID_TABLE)
+    _pyramid_versions.clear()
+
+
+def _built_from_version():
+    rows = conf.db_select('SELECT obj_description(to_regclass(%s), %s)', ['"{}"'.format(PYRAMID_TABLE), 'pg_class'])
+    return rows[0][0] if rows else None
+
+
+def pyramid_is_current():
+    built_from = _pyramid_versions.get_or_load(0, lambda: _built_from_version() or '')
+    return bool(built_from) and built_from == cells_stamp()
+
+
+def cell_exposure(cell):
+    '''
+    The total apportioned exposure in a cell id of resolution MIN_RESOLUTION or finer, as a dict by column
+
+    Raises ValueError for an invalid cell id and ExposurePyramidError if the pyramid is not built for the current
+    dataset.
+    '''
+    code = encode([cell])[0]
+    resolution = int(resolutions([code])[0])
+    if resolution < MIN_RESOLUTION:
+        raise ValueError('The exposure is aggregated to cells of resolution {} and finer'.format(MIN_RESOLUTION))
+    if not pyramid_is_current():
+        raise ExposurePyramidError('The exposure pyramid is not built for the current dataset')
+    # a cell finer than the pyramid gets its share of the pyramid cell around it, as if that were uniform
+    own = ancestors([code], MAX_PYRAMID_RESOLUTION)[0]
+    own_resolution = min(resolution, MAX_PYRAMID_RESOLUTION)
+    keys = [int(own)] + ancestors([own] * own_resolution, np.arange(own_resolution)).tolist()
+    rows = conf.db_select('SELECT code, resolution, {} FROM "{}" WHERE code = ANY(%s::bigint[])'
+                          .format(', '.join('"{}"'.format(column) for column in PYRAMID_COLUMNS + UNIFORM_COLUMNS),
+                                  PYRAMID_TABLE),
+                          [keys], prepare=True)
+    if rows is None:
+        raise IOError('Could not read the exposure pyramid')
+    exposure = dict.fromkeys(PYRAMID_COLUMNS, 0.0)
+    for row in rows:
+        if row['code'] == own:
+            share, summed = float(N_SIDE * N_SIDE) ** (own_resolution - resolution), PYRAMID_COLUMNS
+        else:
+            share, summed = float(N_SIDE * N_SIDE) ** (row['resolution'] - resolution), UNIFORM_COLUMNS
+        for column, value in zip(PYRAMID_COLUMNS, summed):
+            exposure[column] += (row[value] or 0.0) * share
+    return exposure
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Aggregates the SA1 exposure onto the AusPIX DGGS grid')
+    parser.add_argument('task', choices=['build', 'pyramid'],
+                        help='build apportions every SA1 and sums the pyramid, pyramid only sums it again')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    if args.task == 'build':
+        build_fractions(args.workers)
+    build_pyramid()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+'''
+Precomputed, simplified versions of every SA1 geometry at several tolerances (levels of detail)
+
+The SA1 polygons are only ever drawn in a small map, so sending them at full resolution wastes bytes and parse
+time, especially for coastal and rural SA1s. The LOD table is built once per dataset load with
+
+    python -m model.geom_lod build
+
+and maps pick the coarsest level whose tolerance is still below the size of a pixel at the zoom they render at.
+If the table has not been built, or was built from an older version of the dataset, the full geometry is used.
+'''
+
+import json
+
+import conf
+from .cache import LRUCache
+from .dataset import dataset_version
+from .sa1_themes import TABLE_NAME
+
+LOD_TABLE = '{}_lod'.format(TABLE_NAME)
+
+# simplification tolerances in degrees, roughly 10 m, 50 m and 200 m. SA1 maps are drawn at zoom 8 or closer, where
+# a pixel is at most 0.0055 degrees, so coarser levels would never be used
+LOD_TOLERANCES = [0.0001, 0.0005, 0.002]
+
+# decimal places kept in the simplified GeoJSON, 6 is about 0.1 m
+LOD_DECIMAL_DIGITS = 6
+
+TILE_SIZE = 256  # pixels, the web mercator tiles folium draws its maps on
+
+_lod_geometries = LRUCache('sa1_lod_geometries', maxsize=2048, ttl=3600,
+                           weigh=lambda lod: lod['size'], max_weight=32 * 1024 * 1024)
+_lod_versions = LRUCache('sa1_lod_version', maxsize=1, ttl=60)
+
+
+def degrees_per_pixel(zoom):
+    return 360.0 / (TILE_SIZE * 2 ** zoom)
+
+
+def tolerance_for_zoom(zoom):
+    '''
+    The coarsest LOD tolerance that is no bigger than a pixel at the given zoom, or None if even the finest
+    level would show at that zoom and the full geometry is needed
+    '''
+    pixel = degrees_per_pixel(zoom)
+    fitting = [tolerance for tolerance in LOD_TOLERANCES if tolerance <= pixel]
+    return max(fitting) if fitting else None
+
+
+def _built_from_version():
+    rows = conf.db_select('SELECT obj_description(to_regclass(%s), %s)', ['"{}"'.format(LOD_TABLE), 'pg_class'])
+    return rows[0][0] if rows else None
+
+
+def lod_is_current():
+    built_from = _lod_versions.get_or_load('built_from', lambda: _built_from_version() or '')
+    return bool(built_from) and built_from == dataset_version()
+
+
+def _load_lod_geometry(sa1_id, tolerance):
+    rows = conf.db_select('''SELECT tolerance, geom FROM "{}"
+                             WHERE "id" = %s AND tolerance <= %s
+                             ORDER BY tolerance DESC
+                             LIMIT 1'''.format(LOD_TABLE), [sa1_id, tolerance], prepare=True)
+    if not rows:
+        return None
+    return {
+        'tolerance': rows[0][0],
+        'geom': json.loads(rows[0][1]),
+        'size': len(rows[0][1])
+    }
+
+
+def get_lod_geometry(sa1_id, zoom):
+    '''
+    Returns the simplified GeoJSON geometry dict of the SA1 to draw at the given zoom, or None if there is no
+    suitable level of detail and the full geometry should be used instead
+    '''
+    tolerance = tolerance_for_zoom(zoom)
+    if tolerance is None or not lod_is_current():
+        return None
+    lod = _lod_geometries.get_or_load((dataset_version(), str(sa1_id), tolerance),
+                                      lambda: _load_lod_geometry(sa1_id, tolerance))
+    return lod['geom'] if lod is not None else None
+
+
+def build_lod():
+    '''
+    (Re)builds the LOD table from the current dataset, simplifying each SA1 at every tolerance while preserving
+    the topology of its rings
+    '''
+    version = dataset_version()
+    lod = LOD_TABLE + '_staging'  # swapped in once complete, while the pages keep using the old table
+    conf.db_execute('DROP TABLE IF EXISTS "{}"'.format(lod))
+    conf.db_execute('''CREATE TABLE "{lod}" AS
+                       SELECT "id", tolerance, ST_AsGeoJSON(simplified, %s) AS geom, ST_NPoints(simplified) AS npoints
+                       FROM (
+                           SELECT t."id", levels.tolerance,
+                                  ST_SimplifyPreserveTopology(t.geom, levels.tolerance) AS simplified
+                           FROM "{table}" t
+                           CROSS JOIN unnest(%s::float8[]) AS levels(tolerance)
+                       ) AS lod'''.format(lod=lod, table=TABLE_NAME),
+                    [LOD_DECIMAL_DIGITS, LOD_TOLERANCES])
+    conf.db_execute('CREATE INDEX ON "{}" ("id", tolerance)'.format(lod))
+    conf.db_execute('ANALYZE "{}"'.format(lod))
+    conf.db_execute('COMMENT ON TABLE "{}" IS %s'.format(lod), [version])
+    conf.db_swap_table(lod, LOD_TABLE)
+    _lod_versions.clear()
+
+
+def lod_summary():
+    return conf.db_select('''SELECT tolerance, count(*), sum(npoints), sum(length(geom))
+                             FROM "{}" GROUP BY tolerance ORDER BY tolerance'''.format(LOD_TABLE))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Builds the simplified SA1 geometries used for maps')
+    parser.add_argument('task', choices=['build', 'summary'])
+    args = parser.parse_args()
+    if args.task == 'build':
+        build_lod()
+    for tolerance, count, points, size in lod_summary() or []:
+        print('tolerance {}: {} SA1s, {} points, {} bytes of GeoJSON'.format(tolerance, count, points, size))
@@ -2,39 +2,43 @@
 
 from flask import render_template, Response
 
-import conf
 from pyldapi import Renderer, Profile
-from rdflib import Graph, URIRef, RDF, Namespace, Literal, BNode
-from rdflib.namespace import XSD, SKOS   #imported for 'export_rdf' function
 
 from .gazetteer import GAZETTEERS, NAME_AUTHORITIES
-from .dggs_in_line import get_cells_in_json_and_return_in_json
+from .sa1_themes import TABLE_NAME, NAME_FIELD
+from .sa1_record import get_sa1_record
+from .sa1_cells import get_precomputed_cells
+from .cell_set import encode_ranges
+from .sa1_rdf import SA1RDFRenderer, geometry_pairs, dggs_literal, DGGS_URI
+from .dggs_provider import DGGSProviderChain, LocalDGGSProvider, RemoteDGGSProvider, DGGSProviderError
 
 # for DGGSC:C zone attribution
-import requests
-import ast
 DGGS_API_URI = "http://ec2-54-206-28-241.ap-southeast-2.compute.amazonaws.com/api/search/"
 # test_DGGS_API_URI = "https://dggs.loci.cat/api/search/"
-DGGS_uri = 'http://ec2-52-63-73-113.ap-southeast-2.compute.amazonaws.com/AusPIX-DGGS-dataset/ausPIX/'
+DGGS_uri = DGGS_URI
+DGGS_API_CONNECT_TIMEOUT = 2.0  # seconds
+DGGS_API_READ_TIMEOUT = 10.0  # seconds
+
+dggs_providers = DGGSProviderChain([
+    LocalDGGSProvider(),
+    RemoteDGGSProvider(DGGS_API_URI, DGGS_API_CONNECT_TIMEOUT, DGGS_API_READ_TIMEOUT)
+])
 
 from rhealpixdggs import dggs
 rdggs = dggs.RHEALPixDGGS()
 
-# TABLE_NAME = 'AEIP_SA1join84'
-TABLE_NAME = 'aeip_sa1_84withresdensityv11'
-NAME_FIELD = 'SA1_MAIN16'
-
 
-class SA1_LOC_INFO(Renderer):
+class SA1_LOC_INFO(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'loc_info'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/power/',
@@ -50,28 +54,6 @@ class SA1_LOC_INFO(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "SA2_MAIN16",
-                   "SA2_NAME16",
-                   "SA3_CODE16",                   
-                   "SA3_NAME16",
-                   "SA4_CODE16",
-                   "SA4_NAME16",
-                   "GCC_CODE16",
-                   "GCC_NAME16",
-                   "STE_CODE16",
-                   "STE_NAME16",
-                   "SA1SQKM16",
-                   "aeip_LGA_WITHIN_AOI",
-                   "aeip_LOCALITIES_WITHIN_AOI",
-                   ST_AsEWKT(geom) As geom_wkt,
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/sa1/',
             'label': 'SA1 AEIP Location Information',
@@ -81,25 +63,31 @@ class SA1_LOC_INFO(Renderer):
 
         self.thisFeature = []
         self.featureCords = []
-
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.SA2_CODE = str(row[1])
-            self.SA2_name = row[2]
-            self.SA3_CODE = str(row[3])
-            self.SA3_name = row[4]
-            self.SA4_CODE = str(row[5])
-            self.SA4_name = row[6]
-            self.GCC_CODE = str(row[7])
-            self.GCC_name = row[8]
-            self.STE_CODE = str(row[9])
-            self.STE_name = row[10]
-            self.area_sqkm = row[11]
-            self.LGA = row[12]
-            self.Localities = row[13]
+        self.listOfCells = []
+        # the DGGS cells are shown grouped by parent (see cell_set.encode_ranges) unless ?cells=all, while the RDF
+        # lists every cell unless ?cells=ranges
+        self.expand_cells = request.values.get('cells') == 'all'
+        self.cell_ranges = request.values.get('cells') == 'ranges'
+
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.SA2_CODE = str(record['SA2_MAIN16'])
+            self.SA2_name = record['SA2_NAME16']
+            self.SA3_CODE = str(record['SA3_CODE16'])
+            self.SA3_name = record['SA3_NAME16']
+            self.SA4_CODE = str(record['SA4_CODE16'])
+            self.SA4_name = record['SA4_NAME16']
+            self.GCC_CODE = str(record['GCC_CODE16'])
+            self.GCC_name = record['GCC_NAME16']
+            self.STE_CODE = str(record['STE_CODE16'])
+            self.STE_name = record['STE_NAME16']
+            self.area_sqkm = record['SA1SQKM16']
+            self.LGA = record['aeip_LGA_WITHIN_AOI']
+            self.Localities = record['aeip_LOCALITIES_WITHIN_AOI']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             # import pdb
             # pdb.set_trace()
@@ -109,13 +97,13 @@ class SA1_LOC_INFO(Renderer):
             #         for list_lv3 in list_lv2:
 
 
-            self.wkt = row[-2]
+            self.wkt = record['geom_wkt']
             self.geometry_type = self.geom['type']
 
             # import pdb
             # pdb.set_trace()
 
-            # using the web API to find the DGGS cells for the geojson
+            # find the DGGS cells for the geojson
             dggs_api_param = {
                 'resolution': 9,
                 "dggs_as_polygon": True
@@ -131,25 +119,34 @@ class SA1_LOC_INFO(Renderer):
                 ]
             }
 
-            # self.listOfCells = get_cells_in_json_and_return_in_json(geo_json, dggs_api_param['resolution'],
-            #                                                         dggs_api_param['dggs_as_polygon'])['dggs_cells']
-
-            try:
-                res = requests.post('{}find_dggs_by_geojson'.format(DGGS_API_URI), params=dggs_api_param, json=geo_json)
-                self.listOfCells = res.json()['dggs_cells']
-            except:
-                self.listOfCells = get_cells_in_json_and_return_in_json(geo_json, dggs_api_param['resolution'],
-                                                                    dggs_api_param['dggs_as_polygon'])['dggs_cells']
-
-            for cell in self.listOfCells:
-                self.thisFeature.append({'label': str(cell),
-                                      'uri': '{}{}'.format(DGGS_uri, str(cell))})
+            # precomputed by 'python -m model.sa1_cells build', otherwise the local DGGS engine first, then the
+            # web API, each behind a circuit breaker
+            self.listOfCells = get_precomputed_cells(self.id, dggs_api_param['resolution'])
+            if self.listOfCells is None:
+                try:
+                    self.listOfCells = dggs_providers.find_cells(geo_json, dggs_api_param['resolution'],
+                                                                 dggs_api_param['dggs_as_polygon'])
+                except DGGSProviderError as e:
+                    print(e)
+                    self.listOfCells = []
+
+            if self.expand_cells:
+                for cell in self.listOfCells:
+                    self.thisFeature.append({'label': str(cell),
+                                          'uri': '{}{}'.format(DGGS_uri, str(cell))})
+            else:
+                for group in encode_ranges(str(cell) for cell in self.listOfCells):
+                    prefix, _, digits = group.rstrip(']').partition('[')
+                    self.thisFeature.append({'label': group,
+                                          'uri': None if digits else '{}{}'.format(DGGS_uri, group),
+                                          'prefix': prefix,
+                                          'digits': digits})
 
 
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -162,8 +159,6 @@ class SA1_LOC_INFO(Renderer):
                 html_page,   # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 SA2_code=self.SA2_CODE,
                 SA2_name=self.SA2_name,
                 SA3_code=self.SA3_CODE,
@@ -178,6 +173,8 @@ class SA1_LOC_INFO(Renderer):
                 lga=self.LGA,
                 localities=self.Localities,
                 ausPIX_DGGS = self.thisFeature,
+                ausPIX_DGGS_uri = DGGS_uri,
+                cells_expanded = self.expand_cells,
                 wkt=self.wkt
             ),
             status=200,
@@ -187,122 +184,29 @@ class SA1_LOC_INFO(Renderer):
 
 
     def _generate_dggs(self):
+        # the list of cell URIs, or with ?cells=ranges the cell groups separated by spaces
         if self.id is not None and self.thisFeature is not None:
-            dggs_uri = []
-            for item in self.thisFeature:
-                dggs_uri.append(item['uri'])
-            return '{}'.format(dggs_uri)
+            return dggs_literal(self.listOfCells, self.cell_ranges)
         else:
             return ''
 
 
-    def export_rdf(self, model_view='SA1_AEIP'):
-        g = Graph()  # make instance of a RDF graph
-
-        # namespace declarations
-        dcterms = Namespace('http://purl.org/dc/terms/')  # already imported
-        g.bind('dcterms', dcterms)
-        geo = Namespace('http://www.opengis.net/ont/geosparql#')
-        g.bind('geo', geo)
-        owl = Namespace('http://www.w3.org/2002/07/owl#')
-        g.bind('owl', owl)
-        rdfs = Namespace('http://www.w3.org/2000/01/rdf-schema#')
-        g.bind('rdfs', rdfs)
-        sf = Namespace('http://www.opengis.net/ont/sf#')
-        g.bind('sf', sf)
-        skos = Namespace('https://www.w3.org/2009/08/skos-reference/skos.html')
-
-        geox = Namespace('http://linked.data.gov.au/def/geox#')
-        g.bind('geox', geox)
-        g.bind('xsd', XSD)
-
-        core = Namespace('http://linked.data.gov.au/def/core#')
-        g.bind('core', core)
-        net = Namespace('http://linked.data.gov.au/def/net#')
-        g.bind('net', net)
-
-        auspix = URIRef('http://ec2-52-63-73-113.ap-southeast-2.compute.amazonaws.com/AusPIX-DGGS-dataset/')
-        g.bind('auspix', auspix)
-
-        ptype = Namespace('http://pid.geoscience.gov.au/def/voc/ga/PlaceType/')
-        g.bind('ptype', ptype)
-
-        # specific to powerline datasdet
-        pline_ds = Namespace('http://linked.data.gov.au/dataset/powerlines/')
-        g.bind('pline_ds', pline_ds)
-
-        # made the cell ID the subject of the triples
-        pline = Namespace('http://linked.data.gov.au/def/powerlines/')
-        g.bind('pline', pline)
-
-        # build the graphs
-        power_line = URIRef('{}{}'.format(pline_ds, self.id))
-        g.add((power_line, RDF.type, URIRef(pline + 'Powerline')))
-        g.add((power_line, dcterms.identifier, Literal(self.id, datatype=pline.ID)))
-        # g.add((power_line, pline.operator, Literal(str(self.operator), datatype=dcterms.Agent)))
-        # g.add((power_line, pline.owner, Literal(str(self.owner), datatype=dcterms.Agent)))
-        g.add((power_line, pline.description, Literal(str(self.descripton))))
-        g.add((power_line, pline.lineclass, Literal(str(self.lineclass))))
-        g.add((power_line, pline.capacityKV, Literal(str(self.capacitykv))))
-        g.add((power_line, pline.state, Literal(str(self.state))))
-
-
-        g.add((power_line, core.name, Literal(self.hasName['value'], lang='en-AU')))
-        g.add((power_line, core.attriuteSource, Literal(str(self.attributesource))))
-        # g.add((power_line, core.custodianAgency, Literal(str(self.custodianagency), datatype=SKOS.Concept)))
-        # g.add((power_line, core.custodianLicensing, Literal(str(self.custodianlicensing), datatype=dcterms.LicenseDocument)))
-        g.add((power_line, core.featureSource, Literal(str(self.featuresource))))
-        g.add((power_line, core.featureType, URIRef(ptype + self.featuretype)))
-        g.add((power_line, core.operationalStatus, Literal(str(self.operationalstatus), datatype=SKOS.Concept)))
-        # g.add((power_line, core.sourceJurisdiction, Literal(str(self.sourcejurisdication), datatype=SKOS.Concept)))
-        g.add((power_line, core.attriuteDate, Literal(str(self.attributedate), datatype=XSD.dateTime)))
-        g.add((power_line, core.featureDate, Literal(str(self.featuredate), datatype=XSD.dateTime)))
-        # g.add((power_line, core.loadingDate, Literal(str(self.loadingdate), datatype=XSD.dateTime)))
-        g.add((power_line, core.planimetricAccuracy, Literal(str(self.planimetricaccuracy), datatype=core.Measure)))
-        # g.add((power_line, core.sourceUFI, Literal(str(self.sourceUFI))))
-        # g.add((power_line, core.verticalAccuracy, Literal(str(self.verticalaccuracy), datatype=core.Measure)))
-        g.add((power_line, core.spatialConfidence, Literal(str(self.spatialconfidence))))
-
-
-        pline_wkt = BNode()
-        g.add((pline_wkt, RDF.type, URIRef(sf + self.geometry_type)))
-        g.add((pline_wkt, geo.asWKT, Literal(self.wkt, datatype=geo.wktLiteral)))
-        g.add((power_line, geo.hasGeometry, pline_wkt))
-
-        pline_dggs = BNode()
-        g.add((pline_dggs, RDF.type, URIRef(geo + 'Geometry')))
-        g.add((pline_dggs, geox.asDGGS, Literal(self._generate_dggs(), datatype=geox.dggsLiteral)))
-        g.add((power_line, geo.hasGeometry, pline_dggs))
-
-
-
-        if self.mediatype == 'text/turtle':
-            return Response(
-                g.serialize(format='turtle'),
-                mimetype = 'text/turtle'
-            )
-        elif self.mediatype == 'application/rdf+xml':
-            return Response(
-                g.serialize(format='application/rdf+xml'),
-                mimetype = 'application/rdf+xml'
-            )
-        else: # JSON-LD
-            return Response(
-                g.serialize(format='json-ld'),
-                mimetype = 'application/ld+json'
-            )
+    def _rdf_extra(self, record):
+        # the geometry, as WKT and as DGGS cells
+        return geometry_pairs(self.geometry_type, self.wkt, self._generate_dggs())
 
 
-class SA1_BULD_EXPO(Renderer):
+class SA1_BULD_EXPO(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'building_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/power/',
@@ -318,26 +222,6 @@ class SA1_BULD_EXPO(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_POPULATION",
-                   "aeip_DWELLINGS",
-                   "aeip_BUILDINGS",
-                   "aeip_PRE_1980_CONSTRUCTION_COUNT",
-                   "aeip_PRE_1990_PROBABLE_ASBESTOS",
-                   "aeip_RESIDENTIAL_RECONSTRUCTION_VALUE",
-                   "aeip_RESIDENTIAL_CONTENTS_VALUE", 
-                   "aeip_COMMERCIAL_BUILDING_COUNT",
-                   "aeip_COMMERCIAL_RECONSTRUCTION_VALUE",
-                   "aeip_INDUSTRIAL_BUILDING_COUNT",
-                   "aeip_INDUSTRIAL_RECONSTRUCTION_VALUE",
-                   "residensity1km_v11_mean",                            
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/sa1/',
             'label': 'SA1 AEIP Building Exposure',
@@ -346,23 +230,24 @@ class SA1_BULD_EXPO(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.population = str(row[1])
-            self.dwellings = row[2]
-            self.buildings = str(row[3])
-            self.pre_1980_construction_count = row[4]
-            self.pre_1990_probable_asbestos = str(row[5])
-            self.residential_reconstruction_value = row[6]
-            self.residential_contents_value = str(row[7])
-            self.commercial_building_count = row[8]
-            self.commercial_reconstruction_value = str(row[9])
-            self.industrial_building_count = row[10]
-            self.industrial_reconstruction_value = row[11]
-            self.residensity = row[12]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.population = str(record['aeip_POPULATION'])
+            self.dwellings = record['aeip_DWELLINGS']
+            self.buildings = str(record['aeip_BUILDINGS'])
+            self.pre_1980_construction_count = record['aeip_PRE_1980_CONSTRUCTION_COUNT']
+            self.pre_1990_probable_asbestos = str(record['aeip_PRE_1990_PROBABLE_ASBESTOS'])
+            self.residential_reconstruction_value = record['aeip_RESIDENTIAL_RECONSTRUCTION_VALUE']
+            self.residential_contents_value = str(record['aeip_RESIDENTIAL_CONTENTS_VALUE'])
+            self.commercial_building_count = record['aeip_COMMERCIAL_BUILDING_COUNT']
+            self.commercial_reconstruction_value = str(record['aeip_COMMERCIAL_RECONSTRUCTION_VALUE'])
+            self.industrial_building_count = record['aeip_INDUSTRIAL_BUILDING_COUNT']
+            self.industrial_reconstruction_value = record['aeip_INDUSTRIAL_RECONSTRUCTION_VALUE']
+            self.residensity = record['residensity1km_v11_mean']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -373,8 +258,6 @@ class SA1_BULD_EXPO(Renderer):
                 html_page,   # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 population=self.population,
                 dwellings=self.dwellings,
                 buildings=self.buildings,
@@ -396,7 +279,7 @@ class SA1_BULD_EXPO(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -413,16 +296,17 @@ class SA1_BULD_EXPO(Renderer):
 
 
 
-class SA1_SEIFA(Renderer):
+class SA1_SEIFA(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'SEIFA'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -438,25 +322,6 @@ class SA1_SEIFA(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_SEIFA_DECILE_SCORE_10",
-                   "aeip_SEIFA_DECILE_SCORE_9",
-                   "aeip_SEIFA_DECILE_SCORE_8",
-                   "aeip_SEIFA_DECILE_SCORE_7",
-                   "aeip_SEIFA_DECILE_SCORE_6",
-                   "aeip_SEIFA_DECILE_SCORE_5",
-                   "aeip_SEIFA_DECILE_SCORE_4", 
-                   "aeip_SEIFA_DECILE_SCORE_3",
-                   "aeip_SEIFA_DECILE_SCORE_2",
-                   "aeip_SEIFA_DECILE_SCORE_1",
-                   "aeip_WITHOUT_SEIFA_SCORE",                       
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 AEIP SEIFA Exposure',
@@ -465,22 +330,23 @@ class SA1_SEIFA(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.seifa_decile_score_10 = str(row[1])
-            self.seifa_decile_score_9 = row[2]
-            self.seifa_decile_score_8 = str(row[3])
-            self.seifa_decile_score_7 = row[4]
-            self.seifa_decile_score_6 = str(row[5])
-            self.seifa_decile_score_5 = row[6]
-            self.seifa_decile_score_4 = str(row[7])
-            self.seifa_decile_score_3 = row[8]
-            self.seifa_decile_score_2 = str(row[9])
-            self.seifa_decile_score_1 = row[10]
-            self.without_seifa_score = row[11]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.seifa_decile_score_10 = str(record['aeip_SEIFA_DECILE_SCORE_10'])
+            self.seifa_decile_score_9 = record['aeip_SEIFA_DECILE_SCORE_9']
+            self.seifa_decile_score_8 = str(record['aeip_SEIFA_DECILE_SCORE_8'])
+            self.seifa_decile_score_7 = record['aeip_SEIFA_DECILE_SCORE_7']
+            self.seifa_decile_score_6 = str(record['aeip_SEIFA_DECILE_SCORE_6'])
+            self.seifa_decile_score_5 = record['aeip_SEIFA_DECILE_SCORE_5']
+            self.seifa_decile_score_4 = str(record['aeip_SEIFA_DECILE_SCORE_4'])
+            self.seifa_decile_score_3 = record['aeip_SEIFA_DECILE_SCORE_3']
+            self.seifa_decile_score_2 = str(record['aeip_SEIFA_DECILE_SCORE_2'])
+            self.seifa_decile_score_1 = record['aeip_SEIFA_DECILE_SCORE_1']
+            self.without_seifa_score = record['aeip_WITHOUT_SEIFA_SCORE']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -491,8 +357,6 @@ class SA1_SEIFA(Renderer):
                 html_page,   # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 seifa_decile_score_10=self.seifa_decile_score_10,
                 seifa_decile_score_9=self.seifa_decile_score_9,
                 seifa_decile_score_8=self.seifa_decile_score_8,
@@ -513,7 +377,7 @@ class SA1_SEIFA(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -529,16 +393,17 @@ class SA1_SEIFA(Renderer):
             return ''
 
 
-class SA1_DEMO(Renderer):
+class SA1_DEMO(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'demographic_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -554,25 +419,6 @@ class SA1_DEMO(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-           SELECT
-               "SA1_MAIN16",
-               "aeip_ALL_AGED_65_AND_OVER",
-               "aeip_INCLUDES_PERSONS_AGED_14_YEARS_AND_UNDER",
-               "aeip_INCLUDES_AN_INDIGENOUS_PERSON",
-               "aeip_ARE_A_SINGLE_PARENT_HOUSEHOLD",
-               "aeip_ARE_IN_NEED_OF_ASSISTANCE_FOR_SELF_CARE_ACTIVITIES",
-               "aeip_INCLUDE_PERSONS_NOT_PROFICIENT_IN_ENGLISH",
-               "aeip_DO_NOT_HAVE_ACCESS_TO_A_MOTOR_VEHICLE",
-               "aeip_NO_ONE_HAS_COMPLETED_YEAR_12_OR_HIGHER",
-               "aeip_MOVED_TO_THE_REGION_IN_THE_LAST_1_YEAR",
-               "aeip_MOVED_TO_THE_REGION_IN_THE_LAST_5_YEARS",
-               "aeip_TOP_5_EMPLOYING_INDUSTRIES",                 
-               ST_AsGeoJSON(geom) As geom
-           FROM "{}"
-           WHERE "id" = '{}'
-       '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 AEIP Demographic Exposure',
@@ -581,22 +427,23 @@ class SA1_DEMO(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.all_aged_65_and_over = row[1]
-            self.includes_persons_aged_14_years_and_under = row[2]
-            self.includes_an_indigenous_person = row[3]
-            self.are_a_single_parent_household = row[4]
-            self.are_in_need_of_assistance_for_self_care_activites = row[5]
-            self.include_persons_not_proficient_in_english = row[6]
-            self.do_not_have_access_to_a_motor_vehicle = row[7]
-            self.no_one_has_completed_year_12_or_higher = row[8]
-            self.moved_to_the_region_in_the_last_1_year = row[9]
-            self.moved_to_the_region_in_the_last_5_years = row[10]
-            self.top_5_employing_industries = row[11]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.all_aged_65_and_over = record['aeip_ALL_AGED_65_AND_OVER']
+            self.includes_persons_aged_14_years_and_under = record['aeip_INCLUDES_PERSONS_AGED_14_YEARS_AND_UNDER']
+            self.includes_an_indigenous_person = record['aeip_INCLUDES_AN_INDIGENOUS_PERSON']
+            self.are_a_single_parent_household = record['aeip_ARE_A_SINGLE_PARENT_HOUSEHOLD']
+            self.are_in_need_of_assistance_for_self_care_activites = record['aeip_ARE_IN_NEED_OF_ASSISTANCE_FOR_SELF_CARE_ACTIVITIES']
+            self.include_persons_not_proficient_in_english = record['aeip_INCLUDE_PERSONS_NOT_PROFICIENT_IN_ENGLISH']
+            self.do_not_have_access_to_a_motor_vehicle = record['aeip_DO_NOT_HAVE_ACCESS_TO_A_MOTOR_VEHICLE']
+            self.no_one_has_completed_year_12_or_higher = record['aeip_NO_ONE_HAS_COMPLETED_YEAR_12_OR_HIGHER']
+            self.moved_to_the_region_in_the_last_1_year = record['aeip_MOVED_TO_THE_REGION_IN_THE_LAST_1_YEAR']
+            self.moved_to_the_region_in_the_last_5_years = record['aeip_MOVED_TO_THE_REGION_IN_THE_LAST_5_YEARS']
+            self.top_5_employing_industries = record['aeip_TOP_5_EMPLOYING_INDUSTRIES']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -607,8 +454,6 @@ class SA1_DEMO(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 all_aged_65_and_over=self.all_aged_65_and_over,
                 includes_persons_aged_14_years_and_under=self.includes_persons_aged_14_years_and_under,
                 includes_an_indigenous_person=self.includes_an_indigenous_person,
@@ -628,7 +473,7 @@ class SA1_DEMO(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -643,16 +488,17 @@ class SA1_DEMO(Renderer):
             return ''
 
 
-class SA1_ECON(Renderer):
+class SA1_ECON(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'economic_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -668,19 +514,6 @@ class SA1_ECON(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_ARE_LOW_INCOME_1_TO_499_WK",
-                   "aeip_ARE_MEDIUM_INCOME_500_TO_1499_WK",
-                   "aeip_ARE_HIGH_INCOME_1500_PLUS_WK",
-                   "aeip_ARE_IN_PUBLIC_HOUSING",
-                   "aeip_ARE_ALL_UNEMPLOYED",                            
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 Economic Exposure',
@@ -689,16 +522,17 @@ class SA1_ECON(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.are_low_income_1_to_499_wk = row[1]
-            self.are_medium_income_500_to_1499_wk = row[2]
-            self.are_high_income_1500_plus_wk = row[3]
-            self.are_in_public_housing = row[4]
-            self.are_all_unemployed = row[5]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.are_low_income_1_to_499_wk = record['aeip_ARE_LOW_INCOME_1_TO_499_WK']
+            self.are_medium_income_500_to_1499_wk = record['aeip_ARE_MEDIUM_INCOME_500_TO_1499_WK']
+            self.are_high_income_1500_plus_wk = record['aeip_ARE_HIGH_INCOME_1500_PLUS_WK']
+            self.are_in_public_housing = record['aeip_ARE_IN_PUBLIC_HOUSING']
+            self.are_all_unemployed = record['aeip_ARE_ALL_UNEMPLOYED']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -709,8 +543,6 @@ class SA1_ECON(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 are_low_income_1_to_499_wk=self.are_low_income_1_to_499_wk,
                 are_medium_income_500_to_1499_wk=self.are_medium_income_500_to_1499_wk,
                 are_high_income_1500_plus_wk=self.are_high_income_1500_plus_wk,
@@ -724,7 +556,7 @@ class SA1_ECON(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -739,16 +571,17 @@ class SA1_ECON(Renderer):
             return ''
 
 
-class SA1_INST(Renderer):
+class SA1_INST(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'institution_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -764,37 +597,6 @@ class SA1_INST(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_SCHOOL_PRE_PRIMARY",
-                   "aeip_SCHOOL_SECONDARY",
-                   "aeip_SCHOOL_TERTIARY",
-                   "aeip_SCHOOL_OTHER",
-                   "aeip_HOSPITAL_PUBLIC",
-                   "aeip_HOSPITAL_PRIVATE",
-                   "aeip_NURSING_HOME",
-                   "aeip_RETIREMENT_HOME",
-                   "aeip_POLICE_STATION",
-                   "aeip_FIRE_STATION",
-                   "aeip_AMBULANCE_STATION",
-                   "aeip_SES_FACILITY",
-                   "aeip_EMERGENCY_MANAGEMENT_FACILITIES",
-                   "aeip_FEDERAL_COURT",
-                   "aeip_MEDICARE_OFFICE",
-                   "aeip_CENTRELINK_OFFICE",
-                   "aeip_DIPLOMATIC_FACILITY",
-                   "aeip_CONSULATE_FACILITY",
-                   "aeip_MAJOR_DEFENCE_FACILITY",
-                   "aeip_CORRECTIONAL_FACILITY",
-                   "aeip_IMMIGRATION_DETENTION_FACILITY",
-                   "aeip_LOCAL_GOVERNMENT_OFFICE",  
-    
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 Institution Exposure',
@@ -803,33 +605,34 @@ class SA1_INST(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.school_pre_primary = row[1]
-            self.school_secondary = row[2]
-            self.school_tertiary = row[3]
-            self.school_other = row[4]
-            self.hospital_public = row[5]
-            self.hospital_private = row[6]
-            self.nursing_home = row[7]
-            self.retirement_home = row[8]
-            self.police_station = row[9]
-            self.fire_station = row[10]
-            self.ambulance_station = row[11]
-            self.ses_facility = row[12]
-            self.emergency_management_facility = row[13]
-            self.federal_court = row[14]
-            self.medicare_office = row[15]
-            self.centrelink_office = row[16]
-            self.diplomatic_facility = row[17]
-            self.consulate_facility = row[18]
-            self.major_defence_facility = row[19]
-            self.correctional_facility = row[20]
-            self.immigration_detention_facility = row[21]
-            self.local_government_office = row[22]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.school_pre_primary = record['aeip_SCHOOL_PRE_PRIMARY']
+            self.school_secondary = record['aeip_SCHOOL_SECONDARY']
+            self.school_tertiary = record['aeip_SCHOOL_TERTIARY']
+            self.school_other = record['aeip_SCHOOL_OTHER']
+            self.hospital_public = record['aeip_HOSPITAL_PUBLIC']
+            self.hospital_private = record['aeip_HOSPITAL_PRIVATE']
+            self.nursing_home = record['aeip_NURSING_HOME']
+            self.retirement_home = record['aeip_RETIREMENT_HOME']
+            self.police_station = record['aeip_POLICE_STATION']
+            self.fire_station = record['aeip_FIRE_STATION']
+            self.ambulance_station = record['aeip_AMBULANCE_STATION']
+            self.ses_facility = record['aeip_SES_FACILITY']
+            self.emergency_management_facility = record['aeip_EMERGENCY_MANAGEMENT_FACILITIES']
+            self.federal_court = record['aeip_FEDERAL_COURT']
+            self.medicare_office = record['aeip_MEDICARE_OFFICE']
+            self.centrelink_office = record['aeip_CENTRELINK_OFFICE']
+            self.diplomatic_facility = record['aeip_DIPLOMATIC_FACILITY']
+            self.consulate_facility = record['aeip_CONSULATE_FACILITY']
+            self.major_defence_facility = record['aeip_MAJOR_DEFENCE_FACILITY']
+            self.correctional_facility = record['aeip_CORRECTIONAL_FACILITY']
+            self.immigration_detention_facility = record['aeip_IMMIGRATION_DETENTION_FACILITY']
+            self.local_government_office = record['aeip_LOCAL_GOVERNMENT_OFFICE']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -840,8 +643,6 @@ class SA1_INST(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 school_pre_primary=self.school_pre_primary,
                 school_secondary=self.school_secondary,
                 school_tertiary=self.school_tertiary,
@@ -872,7 +673,7 @@ class SA1_INST(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -887,16 +688,17 @@ class SA1_INST(Renderer):
             return ''
 
 
-class SA1_TRANSPORT(Renderer):
+class SA1_TRANSPORT(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'transport_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -912,23 +714,6 @@ class SA1_TRANSPORT(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_AIRPORT_MAJOR_AREAS",
-                   "aeip_AIRPORT_MAJOR_TERMINALS",
-                   "aeip_AIRPORT_LANDING_GROUNDS",
-                   "aeip_ROADS_MAJOR_KMS",
-                   "aeip_ROADS_ARTERIAL_AND_SUB_ARTERIAL_KMS",
-                   "aeip_RAILWAY_TRACKS_KMS",
-                   "aeip_RAILWAY_STATIONS",
-                   "aeip_MARITIME_MAJOR_PORT",
-                   "aeip_MARITIME_FERRY_TERMINAL",
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 Infrastructure-Transport Exposure',
@@ -937,20 +722,21 @@ class SA1_TRANSPORT(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.airport_major_areas = row[1]
-            self.airport_major_terminals = row[2]
-            self.airport_landing_grounds = row[3]
-            self.roads_major_kms = row[4]
-            self.roads_arterial_and_sub_arterial_kms = row[5]
-            self.railway_track_kms = row[6]
-            self.railway_stations = row[7]
-            self.maritime_major_port = row[8]
-            self.maritime_ferry_terminal = row[9]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.airport_major_areas = record['aeip_AIRPORT_MAJOR_AREAS']
+            self.airport_major_terminals = record['aeip_AIRPORT_MAJOR_TERMINALS']
+            self.airport_landing_grounds = record['aeip_AIRPORT_LANDING_GROUNDS']
+            self.roads_major_kms = record['aeip_ROADS_MAJOR_KMS']
+            self.roads_arterial_and_sub_arterial_kms = record['aeip_ROADS_ARTERIAL_AND_SUB_ARTERIAL_KMS']
+            self.railway_track_kms = record['aeip_RAILWAY_TRACKS_KMS']
+            self.railway_stations = record['aeip_RAILWAY_STATIONS']
+            self.maritime_major_port = record['aeip_MARITIME_MAJOR_PORT']
+            self.maritime_ferry_terminal = record['aeip_MARITIME_FERRY_TERMINAL']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -961,8 +747,6 @@ class SA1_TRANSPORT(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 airport_major_areas=self.airport_major_areas,
                 airport_major_terminals=self.airport_major_terminals,
                 airport_landing_grounds=self.airport_landing_grounds,
@@ -980,7 +764,7 @@ class SA1_TRANSPORT(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -996,16 +780,17 @@ class SA1_TRANSPORT(Renderer):
 
 
 
-class SA1_TRANSPORT(Renderer):
+class SA1_TRANSPORT(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'transport_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -1021,23 +806,6 @@ class SA1_TRANSPORT(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_AIRPORT_MAJOR_AREAS",
-                   "aeip_AIRPORT_MAJOR_TERMINALS",
-                   "aeip_AIRPORT_LANDING_GROUNDS",
-                   "aeip_ROADS_MAJOR_KMS",
-                   "aeip_ROADS_ARTERIAL_AND_SUB_ARTERIAL_KMS",
-                   "aeip_RAILWAY_TRACKS_KMS",
-                   "aeip_RAILWAY_STATIONS",
-                   "aeip_MARITIME_MAJOR_PORT",
-                   "aeip_MARITIME_FERRY_TERMINAL",
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 Infrastructure-Transport Exposure',
@@ -1046,20 +814,21 @@ class SA1_TRANSPORT(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.airport_major_areas = row[1]
-            self.airport_major_terminals = row[2]
-            self.airport_landing_grounds = row[3]
-            self.roads_major_kms = row[4]
-            self.roads_arterial_and_sub_arterial_kms = row[5]
-            self.railway_track_kms = row[6]
-            self.railway_stations = row[7]
-            self.maritime_major_port = row[8]
-            self.maritime_ferry_terminal = row[9]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.airport_major_areas = record['aeip_AIRPORT_MAJOR_AREAS']
+            self.airport_major_terminals = record['aeip_AIRPORT_MAJOR_TERMINALS']
+            self.airport_landing_grounds = record['aeip_AIRPORT_LANDING_GROUNDS']
+            self.roads_major_kms = record['aeip_ROADS_MAJOR_KMS']
+            self.roads_arterial_and_sub_arterial_kms = record['aeip_ROADS_ARTERIAL_AND_SUB_ARTERIAL_KMS']
+            self.railway_track_kms = record['aeip_RAILWAY_TRACKS_KMS']
+            self.railway_stations = record['aeip_RAILWAY_STATIONS']
+            self.maritime_major_port = record['aeip_MARITIME_MAJOR_PORT']
+            self.maritime_ferry_terminal = record['aeip_MARITIME_FERRY_TERMINAL']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -1070,8 +839,6 @@ class SA1_TRANSPORT(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 airport_major_areas=self.airport_major_areas,
                 airport_major_terminals=self.airport_major_terminals,
                 airport_landing_grounds=self.airport_landing_grounds,
@@ -1089,7 +856,7 @@ class SA1_TRANSPORT(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -1105,16 +872,17 @@ class SA1_TRANSPORT(Renderer):
 
 
 
-class SA1_UTILITY(Renderer):
+class SA1_UTILITY(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'utility_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -1130,30 +898,6 @@ class SA1_UTILITY(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_POWER_STATION_MAJOR_FOSSIL_FUEL",
-                   "aeip_POWER_STATION_MAJOR_RENEWABLE",
-                   "aeip_TRANSMISSION_SUBSTATION",
-                   "aeip_TRANSMISSION_ELECTRICITY_LINES_KMS",
-                   "aeip_LIQUID_FUEL_REFINERIES",
-                   "aeip_LIQUID_FUEL_TERMINALS",
-                   "aeip_LIQUID_FUEL_DEPOTS",
-                   "aeip_LIQUID_FUEL_PETROL_STATIONS",
-                   "aeip_GAS_PIPELINES_KMS",
-                   "aeip_OIL_PIPELINES_KMS",
-                   "aeip_OFFSHORE_EXTRACTION_PLATFORM",
-                   "aeip_WASTE_MANAGEMENT_SITE",
-                   "aeip_WASTE_WATER_TREATMENT_PLANT",
-                   "aeip_MAJOR_DAM_WALLS",
-                   "aeip_TELEPHONE_EXCHANGE",
-                   "aeip_BROADCASTING_STUDIO_RADIO_TV",
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 Infrastructure-Utility Exposure',
@@ -1162,27 +906,28 @@ class SA1_UTILITY(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.power_station_major_fossil_fuel = row[1]
-            self.power_station_major_renewable = row[2]
-            self.transmission_substation= row[3]
-            self.transmission_electricity_lines_kms = row[4]
-            self.liquid_fuel_refineries = row[5]
-            self.liquid_fuel_terminals = row[6]
-            self.liquid_fuel_depots = row[7]
-            self.liquid_fuel_petrol_stations = row[8]
-            self.gas_pipelines_kms = row[9]
-            self.oil_pipelines_kms = row[10]
-            self.offshore_extraction_platform = row[11]
-            self.waste_management_site = row[12]
-            self.waste_water_treatment_plant = row[13]
-            self.major_dam_walls = row[14]
-            self.telephone_exchange = row[15]
-            self.broadcasting_studio_radio_tv = row[16]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.power_station_major_fossil_fuel = record['aeip_POWER_STATION_MAJOR_FOSSIL_FUEL']
+            self.power_station_major_renewable = record['aeip_POWER_STATION_MAJOR_RENEWABLE']
+            self.transmission_substation= record['aeip_TRANSMISSION_SUBSTATION']
+            self.transmission_electricity_lines_kms = record['aeip_TRANSMISSION_ELECTRICITY_LINES_KMS']
+            self.liquid_fuel_refineries = record['aeip_LIQUID_FUEL_REFINERIES']
+            self.liquid_fuel_terminals = record['aeip_LIQUID_FUEL_TERMINALS']
+            self.liquid_fuel_depots = record['aeip_LIQUID_FUEL_DEPOTS']
+            self.liquid_fuel_petrol_stations = record['aeip_LIQUID_FUEL_PETROL_STATIONS']
+            self.gas_pipelines_kms = record['aeip_GAS_PIPELINES_KMS']
+            self.oil_pipelines_kms = record['aeip_OIL_PIPELINES_KMS']
+            self.offshore_extraction_platform = record['aeip_OFFSHORE_EXTRACTION_PLATFORM']
+            self.waste_management_site = record['aeip_WASTE_MANAGEMENT_SITE']
+            self.waste_water_treatment_plant = record['aeip_WASTE_WATER_TREATMENT_PLANT']
+            self.major_dam_walls = record['aeip_MAJOR_DAM_WALLS']
+            self.telephone_exchange = record['aeip_TELEPHONE_EXCHANGE']
+            self.broadcasting_studio_radio_tv = record['aeip_BROADCASTING_STUDIO_RADIO_TV']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -1193,8 +938,6 @@ class SA1_UTILITY(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 power_station_major_fossil_fuel=self.power_station_major_fossil_fuel,
                 power_station_major_renewable=self.power_station_major_renewable,
                 transmission_substation=self.transmission_substation,
@@ -1219,7 +962,7 @@ class SA1_UTILITY(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -1235,16 +978,17 @@ class SA1_UTILITY(Renderer):
 
 
 
-class SA1_BUSINESS(Renderer):
+class SA1_BUSINESS(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'business_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -1260,52 +1004,6 @@ class SA1_BUSINESS(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_ACCOMMODATION_AND_FOOD_SERVICES",
-                   "aeip_ADMINISTRATIVE_AND_SUPPORT_SERVICES",
-                   "aeip_AGRICULTURE_FORESTRY_FISHING",
-                   "aeip_ARTS_AND_RECREATION_SERVICES",
-                   "aeip_CONSTRUCTION",
-                   "aeip_EDUCATION_AND_TRAINING",
-                   "aeip_ELECT_GAS_WATER_WASTE_SERVICES",
-                   "aeip_FINANCIAL_AND_INSURANCE_SERVICES",
-                   "aeip_HEALTH_CARE_AND_SOCIAL_ASSISTANCE",
-                   "aeip_INFORMATION_MEDIA_AND_TELECOMMUNICATIONS",
-                   "aeip_MANUFACTURING",
-                   "aeip_MINING",
-                   "aeip_OTHER_SERVICES",
-                   "aeip_PROFESSIONAL_SCIENTIFIC_AND_TECHNICAL_SERVICES",
-                   "aeip_PUBLIC_ADMINISTRATION_AND_SAFETY",
-                   "aeip_RENTAL_HIRING_AND_REAL_ESTATE_SERVICES",
-                   "aeip_RETAIL_TRADE",
-                   "aeip_TRANSPORT_POSTAL_AND_WAREHOUSING",
-                   "aeip_WHOLESALE_TRADE",
-                   "aeip_UNCLASSIFIED_BUSINESSES",
-                   "aeip_TOTAL_NUMBER_OF_BUSINESSES",
-                   "aeip_NUMBER_OF_REGISTERED_CHARITY_ORGANISATIONS",
-                   "aeip_AGRICULTURE_AND_FISHING_SUPPORT_SERVICES",
-                   "aeip_AQUACULTURE",
-                   "aeip_DAIRY_CATTLE_FARMING",
-                   "aeip_DEER_FARMING",
-                   "aeip_FISHING",
-                   "aeip_FORESTRY_AND_LOGGING",
-                   "aeip_FORESTRY_SUPPORT_SERVICES",
-                   "aeip_FRUIT_AND_TREE_NUT_GROWING",
-                   "aeip_HUNTING_AND_TRAPPING",
-                   "aeip_MUSHROOM_AND_VEGETABLE_GROWING",
-                   "aeip_NURSERY_AND_FLORICULTURE_PRODUCTION",
-                   "aeip_OTHER_CROP_GROWING",
-                   "aeip_OTHER_LIVESTOCK_FARMING",
-                   "aeip_POULTRY_FARMING",
-                   "aeip_SHEEP_BEEF_CATTLE_AND_GRAIN_FARMING",
-                   "aeip_TOTAL_NUMBER_OF_PRIMARY_PRODUCERS",                   
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 Business Exposure',
@@ -1314,49 +1012,50 @@ class SA1_BUSINESS(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.accommodation_and_food_services = row[1]
-            self.administrative_and_support_services = row[2]
-            self.agriculture_forestry_fishing= row[3]
-            self.arts_and_recreation_services = row[4]
-            self.construction = row[5]
-            self.education_and_training = row[6]
-            self.elect_gas_water_waste_services = row[7]
-            self.financial_and_insurance_services = row[8]
-            self.health_care_and_social_assistance = row[9]
-            self.information_media_and_telecommunications = row[10]
-            self.manufacturing = row[11]
-            self.mining = row[12]
-            self.other_services = row[13]
-            self.professional_scientific_and_technical_services = row[14]
-            self.public_administration_and_safety = row[15]
-            self.rental_hiring_and_real_estate_services = row[16]
-            self.retail_trade = row[17]
-            self.transport_postal_and_warehousing = row[18]
-            self.wholesale_trade = row[19]
-            self.unclassified_businesses = row[20]
-            self.total_number_of_businesses = row[21]
-            self.number_of_registered_charity_organisations = row[22]
-            self.agriculture_and_fishing_support_services = row[23]
-            self.aquaculture = row[24]
-            self.dairy_cattle_farming = row[25]
-            self.deer_farming = row[26]
-            self.fishing = row[27]
-            self.forestry_and_logging = row[28]
-            self.forestry_support_services = row[29]
-            self.fruit_and_tree_nut_growing = row[30]
-            self.hunting_and_trapping = row[31]
-            self.mushroom_and_vegetable_growing = row[32]
-            self.nursery_and_floriculture_production = row[33]
-            self.other_crop_growing = row[34]
-            self.other_livestock_farming = row[35]
-            self.poultry_farming = row[36]
-            self.sheep_beef_cattle_and_grain_farming = row[37]
-            self.total_number_of_primary_producers = row[38]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.accommodation_and_food_services = record['aeip_ACCOMMODATION_AND_FOOD_SERVICES']
+            self.administrative_and_support_services = record['aeip_ADMINISTRATIVE_AND_SUPPORT_SERVICES']
+            self.agriculture_forestry_fishing= record['aeip_AGRICULTURE_FORESTRY_FISHING']
+            self.arts_and_recreation_services = record['aeip_ARTS_AND_RECREATION_SERVICES']
+            self.construction = record['aeip_CONSTRUCTION']
+            self.education_and_training = record['aeip_EDUCATION_AND_TRAINING']
+            self.elect_gas_water_waste_services = record['aeip_ELECT_GAS_WATER_WASTE_SERVICES']
+            self.financial_and_insurance_services = record['aeip_FINANCIAL_AND_INSURANCE_SERVICES']
+            self.health_care_and_social_assistance = record['aeip_HEALTH_CARE_AND_SOCIAL_ASSISTANCE']
+            self.information_media_and_telecommunications = record['aeip_INFORMATION_MEDIA_AND_TELECOMMUNICATIONS']
+            self.manufacturing = record['aeip_MANUFACTURING']
+            self.mining = record['aeip_MINING']
+            self.other_services = record['aeip_OTHER_SERVICES']
+            self.professional_scientific_and_technical_services = record['aeip_PROFESSIONAL_SCIENTIFIC_AND_TECHNICAL_SERVICES']
+            self.public_administration_and_safety = record['aeip_PUBLIC_ADMINISTRATION_AND_SAFETY']
+            self.rental_hiring_and_real_estate_services = record['aeip_RENTAL_HIRING_AND_REAL_ESTATE_SERVICES']
+            self.retail_trade = record['aeip_RETAIL_TRADE']
+            self.transport_postal_and_warehousing = record['aeip_TRANSPORT_POSTAL_AND_WAREHOUSING']
+            self.wholesale_trade = record['aeip_WHOLESALE_TRADE']
+            self.unclassified_businesses = record['aeip_UNCLASSIFIED_BUSINESSES']
+            self.total_number_of_businesses = record['aeip_TOTAL_NUMBER_OF_BUSINESSES']
+            self.number_of_registered_charity_organisations = record['aeip_NUMBER_OF_REGISTERED_CHARITY_ORGANISATIONS']
+            self.agriculture_and_fishing_support_services = record['aeip_AGRICULTURE_AND_FISHING_SUPPORT_SERVICES']
+            self.aquaculture = record['aeip_AQUACULTURE']
+            self.dairy_cattle_farming = record['aeip_DAIRY_CATTLE_FARMING']
+            self.deer_farming = record['aeip_DEER_FARMING']
+            self.fishing = record['aeip_FISHING']
+            self.forestry_and_logging = record['aeip_FORESTRY_AND_LOGGING']
+            self.forestry_support_services = record['aeip_FORESTRY_SUPPORT_SERVICES']
+            self.fruit_and_tree_nut_growing = record['aeip_FRUIT_AND_TREE_NUT_GROWING']
+            self.hunting_and_trapping = record['aeip_HUNTING_AND_TRAPPING']
+            self.mushroom_and_vegetable_growing = record['aeip_MUSHROOM_AND_VEGETABLE_GROWING']
+            self.nursery_and_floriculture_production = record['aeip_NURSERY_AND_FLORICULTURE_PRODUCTION']
+            self.other_crop_growing = record['aeip_OTHER_CROP_GROWING']
+            self.other_livestock_farming = record['aeip_OTHER_LIVESTOCK_FARMING']
+            self.poultry_farming = record['aeip_POULTRY_FARMING']
+            self.sheep_beef_cattle_and_grain_farming = record['aeip_SHEEP_BEEF_CATTLE_AND_GRAIN_FARMING']
+            self.total_number_of_primary_producers = record['aeip_TOTAL_NUMBER_OF_PRIMARY_PRODUCERS']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -1367,8 +1066,6 @@ class SA1_BUSINESS(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 accommodation_and_food_services=self.accommodation_and_food_services,
                 administrative_and_support_services=self.administrative_and_support_services,
                 agriculture_forestry_fishing=self.agriculture_forestry_fishing,
@@ -1415,7 +1112,7 @@ class SA1_BUSINESS(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -1431,16 +1128,17 @@ class SA1_BUSINESS(Renderer):
 
 
 
-class SA1_AGRI(Renderer):
+class SA1_AGRI(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'agriculture_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -1456,17 +1154,6 @@ class SA1_AGRI(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-           SELECT
-               "SA1_MAIN16",
-               "aeip_ESTIMATED_VACP_VALUE",
-               "aeip_ESTIMATED_AGRICULTURAL_AREA_HA",
-               "aeip_COMMODITY_LIST",               
-               ST_AsGeoJSON(geom) As geom
-           FROM "{}"
-           WHERE "id" = '{}'
-       '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 AEIP Agriculture Exposure',
@@ -1475,14 +1162,15 @@ class SA1_AGRI(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.estimated_vacp_value = row[1]
-            self.estimated_agricultural_area_ha = row[2]
-            self.commodity_list = row[3]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.estimated_vacp_value = record['aeip_ESTIMATED_VACP_VALUE']
+            self.estimated_agricultural_area_ha = record['aeip_ESTIMATED_AGRICULTURAL_AREA_HA']
+            self.commodity_list = record['aeip_COMMODITY_LIST']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -1493,8 +1181,6 @@ class SA1_AGRI(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 estimated_vacp_value=self.estimated_vacp_value,
                 estimated_agricultural_area_ha=self.estimated_agricultural_area_ha,
                 commodity_list=self.commodity_list
@@ -1506,7 +1192,7 @@ class SA1_AGRI(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
@@ -1522,16 +1208,17 @@ class SA1_AGRI(Renderer):
 
 
 
-class SA1_ENVI(Renderer):
+class SA1_ENVI(SA1RDFRenderer, Renderer):
     """
     This class represents a placename and methods in this class allow a placename to be loaded from the GA placenames
     database and to be exported in a number of formats including RDF, according to the 'PlaceNames Ontology'
 
     [[and an expression of the Dublin Core ontology, HTML, XML in the form according to the AS4590 XML schema.]]??
     """
+    theme = 'environment_exposure'
 
     def __init__(self, request, uri):
-        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/rdf+xml']
+        format_list = ['text/html', 'text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']
         profiles = {
             'SA1_AEIP': Profile(
                 'http://linked.data.gov.au/def/SA1/',
@@ -1547,50 +1234,6 @@ class SA1_ENVI(Renderer):
 
         self.id = uri.split('/')[-1]
 
-        q = '''
-               SELECT
-                   "SA1_MAIN16",
-                   "aeip_WH_FEATURES",
-                   "aeip_WH_TOTAL_AREA",
-                   "aeip_WH_BUFFER_FEATURES",
-                   "aeip_WH_TOTAL_BUFFER_AREA",
-                   "aeip_NH_HISTORIC_FEATURES",
-                   "aeip_NH_TOTAL_HISTORIC_AREA",
-                   "aeip_NH_INDIGENOUS_FEATURES",
-                   "aeip_NH_TOTAL_INDIGENOUS_AREA",
-                   "aeip_NH_NATURAL_FEATURES",
-                   "aeip_NH_TOTAL_NATURAL_AREA",
-                   "aeip_CH_HISTORIC_FEATURES",
-                   "aeip_CH_TOTAL_HISTORIC_AREA",
-                   "aeip_CH_INDIGENOUS_FEATURES",
-                   "aeip_CH_TOTAL_INDIGENOUS_AREA",
-                   "aeip_CH_NATURAL_FEATURES",
-                   "aeip_CH_TOTAL_NATURAL_AREA",
-                   "aeip_CAPAD_IA_FEATURES",
-                   "aeip_CAPAD_IA_TOTAL_AREA",
-                   "aeip_CAPAD_IB_FEATURES",
-                   "aeip_CAPAD_IB_TOTAL_AREA",
-                   "aeip_CAPAD_II_FEATURES",
-                   "aeip_CAPAD_II_TOTAL_AREA",
-                   "aeip_CAPAD_III_FEATURES",
-                   "aeip_CAPAD_III_TOTAL_AREA",
-                   "aeip_CAPAD_IV_FEATURES",
-                   "aeip_CAPAD_IV_TOTAL_AREA",
-                   "aeip_CAPAD_V_FEATURES",
-                   "aeip_CAPAD_V_TOTAL_AREA",
-                   "aeip_CAPAD_VI_FEATURES",
-                   "aeip_CAPAD_VI_TOTAL_AREA",
-                   "aeip_RAMSAR_FEATURES",
-                   "aeip_RAMSAR_TOTAL_AREA",
-                   "aeip_IBRA_FEATURES",
-                   "aeip_IBRA_TOTAL_AREA",
-                   "aeip_NRM_FEATURES",
-                   "aeip_NRM_TOTAL_AREA",                   
-                   ST_AsGeoJSON(geom) As geom
-               FROM "{}"
-               WHERE "id" = '{}'
-           '''.format(TABLE_NAME, self.id)
-
         self.hasName = {
             'uri': 'http://linked.data.gov.au/def/SA1/',
             'label': 'SA1 Environment Exposure',
@@ -1599,47 +1242,48 @@ class SA1_ENVI(Renderer):
         }
 
         self.featureCords = []
-        for row in conf.db_select(q):
-            self.hasName['value'] = str(row[0])
-            self.wh_features = row[1]
-            self.wh_total_area = row[2]
-            self.wh_buffer_features= row[3]
-            self.wh_total_buffer_area = row[4]
-            self.nh_historic_features = row[5]
-            self.nh_total_historic_area = row[6]
-            self.nh_indigenous_features = row[7]
-            self.nh_total_indigenous_area = row[8]
-            self.nh_natural_features = row[9]
-            self.nh_total_natural_area = row[10]
-            self.ch_historic_features = row[11]
-            self.ch_total_historic_area = row[12]
-            self.ch_indigenous_features = row[13]
-            self.ch_total_indigenous_area = row[14]
-            self.ch_natural_features = row[15]
-            self.ch_total_natural_area = row[16]
-            self.capad_ia_features = row[17]
-            self.capad_ia_total_area = row[18]
-            self.capad_ib_features = row[19]
-            self.capad_ib_total_area = row[20]
-            self.capad_ii_features = row[21]
-            self.capad_ii_total_area = row[22]
-            self.capad_iii_features = row[23]
-            self.capad_iii_total_area = row[24]
-            self.capad_iv_features = row[25]
-            self.capad_iv_total_area = row[26]
-            self.capad_v_features = row[27]
-            self.capad_v_total_area = row[28]
-            self.capad_vi_features = row[29]
-            self.capad_vi_total_area = row[30]
-            self.ramsar_features = row[31]
-            self.ramsar_total_area = row[32]
-            self.ibra_features = row[33]
-            self.ibra_total_area = row[34]
-            self.nrm_features = row[35]
-            self.nrm_total_area = row[36]
+        record = get_sa1_record(self.id)
+        if record is not None:
+            self.hasName['value'] = str(record['SA1_MAIN16'])
+            self.wh_features = record['aeip_WH_FEATURES']
+            self.wh_total_area = record['aeip_WH_TOTAL_AREA']
+            self.wh_buffer_features= record['aeip_WH_BUFFER_FEATURES']
+            self.wh_total_buffer_area = record['aeip_WH_TOTAL_BUFFER_AREA']
+            self.nh_historic_features = record['aeip_NH_HISTORIC_FEATURES']
+            self.nh_total_historic_area = record['aeip_NH_TOTAL_HISTORIC_AREA']
+            self.nh_indigenous_features = record['aeip_NH_INDIGENOUS_FEATURES']
+            self.nh_total_indigenous_area = record['aeip_NH_TOTAL_INDIGENOUS_AREA']
+            self.nh_natural_features = record['aeip_NH_NATURAL_FEATURES']
+            self.nh_total_natural_area = record['aeip_NH_TOTAL_NATURAL_AREA']
+            self.ch_historic_features = record['aeip_CH_HISTORIC_FEATURES']
+            self.ch_total_historic_area = record['aeip_CH_TOTAL_HISTORIC_AREA']
+            self.ch_indigenous_features = record['aeip_CH_INDIGENOUS_FEATURES']
+            self.ch_total_indigenous_area = record['aeip_CH_TOTAL_INDIGENOUS_AREA']
+            self.ch_natural_features = record['aeip_CH_NATURAL_FEATURES']
+            self.ch_total_natural_area = record['aeip_CH_TOTAL_NATURAL_AREA']
+            self.capad_ia_features = record['aeip_CAPAD_IA_FEATURES']
+            self.capad_ia_total_area = record['aeip_CAPAD_IA_TOTAL_AREA']
+            self.capad_ib_features = record['aeip_CAPAD_IB_FEATURES']
+            self.capad_ib_total_area = record['aeip_CAPAD_IB_TOTAL_AREA']
+            self.capad_ii_features = record['aeip_CAPAD_II_FEATURES']
+            self.capad_ii_total_area = record['aeip_CAPAD_II_TOTAL_AREA']
+            self.capad_iii_features = record['aeip_CAPAD_III_FEATURES']
+            self.capad_iii_total_area = record['aeip_CAPAD_III_TOTAL_AREA']
+            self.capad_iv_features = record['aeip_CAPAD_IV_FEATURES']
+            self.capad_iv_total_area = record['aeip_CAPAD_IV_TOTAL_AREA']
+            self.capad_v_features = record['aeip_CAPAD_V_FEATURES']
+            self.capad_v_total_area = record['aeip_CAPAD_V_TOTAL_AREA']
+            self.capad_vi_features = record['aeip_CAPAD_VI_FEATURES']
+            self.capad_vi_total_area = record['aeip_CAPAD_VI_TOTAL_AREA']
+            self.ramsar_features = record['aeip_RAMSAR_FEATURES']
+            self.ramsar_total_area = record['aeip_RAMSAR_TOTAL_AREA']
+            self.ibra_features = record['aeip_IBRA_FEATURES']
+            self.ibra_total_area = record['aeip_IBRA_TOTAL_AREA']
+            self.nrm_features = record['aeip_NRM_FEATURES']
+            self.nrm_total_area = record['aeip_NRM_TOTAL_AREA']
 
             # get geometry from database
-            self.geom = ast.literal_eval(row[-1])
+            self.geom = record['geom']
             self.featureCords = self.geom['coordinates']
             self.geometry_type = self.geom['type']
 
@@ -1650,8 +1294,6 @@ class SA1_ENVI(Renderer):
                 html_page,  # uses the html template to send all this data to it.
                 id=self.id,
                 hasName=self.hasName,
-                coordinate_list=self.featureCords,
-                geometry_type=self.geometry_type,
                 wh_features=self.wh_features,
                 wh_total_area=self.wh_total_area,
                 wh_buffer_features=self.wh_buffer_features,
@@ -1696,7 +1338,7 @@ class SA1_ENVI(Renderer):
     def render(self):
         if self.profile == 'alt':
             return self._render_alt_profile()  # this function is in Renderer
-        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/rdf+xml']:
+        elif self.mediatype in ['text/turtle', 'application/ld+json', 'application/n-triples', 'application/rdf+xml']:
             return self.export_rdf(self.profile)
         else:  # default is HTML response: self.format == 'text/html':
             return self.export_html(self.profile)
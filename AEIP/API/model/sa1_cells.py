@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+'''
+Precomputed AusPIX DGGS cells of every SA1
+
+The cells of an SA1 only change when the dataset is reloaded, so rather than converting the geometry on every page
+view they are computed once per dataset load, in parallel, with
+
+    python -m model.sa1_cells build --resolution 9 --workers 8
+
+Each resolution is stored in its own table, stamped with the versions of the dataset and of the conversion it was
+built from. A table of older versions is rebuilt aside, in a staging table swapped in once complete, so that a
+process still trusting the stamp it read up to a minute earlier never reads a half built table. A build that is
+interrupted can be run again and carries on with the SA1s that are still missing. SA1s that are not in the table,
+or a table built from older versions, fall back to converting the geometry when the page is shown.
+
+With --cover the cells covering the whole area of each SA1 are stored instead of those along its boundary, as the
+smallest mixed resolution set (see dggs_cover), in a table of their own.
+'''
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import conf
+from .cache import LRUCache
+from .cell_set import CellSet
+from .dataset import dataset_version
+from .dggs_cache import feature_cells
+from .dggs_cover import polygon_cells
+from .dggs_in_line import get_cells_in_json_and_return_in_json, CONVERSION_VERSION
+from .dggs_pool import dggs_pool
+from .sa1_record import get_sa1_record
+from .sa1_themes import TABLE_NAME
+
+DEFAULT_RESOLUTION = 9
+BATCH_SIZE = 200  # SA1 geometries read from the database and written back at a time
+CHUNK_SIZE = 10  # geometries handed to a worker process at a time
+
+_cell_versions = LRUCache('sa1_cells_version', maxsize=16, ttl=60)
+_covers = LRUCache('sa1_covers', maxsize=256, ttl=3600, weigh=lambda cells: cells.codes.nbytes,
+                   max_weight=32 * 1024 * 1024)
+
+
+def cells_table(resolution, cover=False):
+    return '{}_{}_r{}'.format(TABLE_NAME, 'cover' if cover else 'cells', resolution)
+
+
+def _table_comment(table):
+    rows = conf.db_select('SELECT obj_description(to_regclass(%s), %s)', ['"{}"'.format(table), 'pg_class'])
+    return rows[0][0] if rows else None
+
+
+def _built_from_version(resolution, cover=False):
+    return _table_comment(cells_table(resolution, cover))
+
+
+def cells_stamp():
+    return '{}#{}'.format(dataset_version(), CONVERSION_VERSION)
+
+
+def cells_are_current(resolution, cover=False):
+    built_from = _cell_versions.get_or_load((resolution, cover), lambda: _built_from_version(resolution, cover) or '')
+    return bool(built_from) and built_from == cells_stamp()
+
+
+def get_precomputed_cells(sa1_id, resolution=DEFAULT_RESOLUTION, cover=False):
+    '''
+    Returns the list of cell ids of the SA1 at the given resolution (its compact cover if cover), or None if they
+    have not been precomputed for the current version of the dataset
+    '''
+    if not cells_are_current(resolution, cover):
+        return None
+    rows = conf.db_select('SELECT cells FROM "{}" WHERE "id" = %s'.format(cells_table(resolution, cover)),
+                          [sa1_id], prepare=True)
+    return list(rows[0][0]) if rows else None
+
+
+def get_sa1_cover(sa1_id, resolution=DEFAULT_RESOLUTION):
+    '''
+    Returns the CellSet of the cells covering the area of the SA1, compacted to mixed resolutions, precomputed if
+    possible and otherwise from its geometry (cached, or in the DGGS pool, which may raise DGGSPoolBusy or
+    DGGSJobTimeout), or None if there is no such SA1
+    '''
+    def load():
+        ids = get_precomputed_cells(sa1_id, resolution, cover=True)
+        if ids is not None:
+            return CellSet.from_ids(ids)
+        record = get_sa1_record(sa1_id)
+        if record is None or record['geom'] is None:
+            return None
+        return feature_cells({'geometry': record['geom']}, resolution, fill=True, run=dggs_pool.run)
+    return _covers.get_or_load((dataset_version(), str(sa1_id), resolution), load)
+
+
+def _cells_of_sa1(sa1):
+    # runs in a worker process, the same conversion SA1_LOC_INFO does for a single SA1
+    sa1_id, geometry, resolution, cover = sa1
+    if cover:
+        return sa1_id, polygon_cells(geometry, resolution).ids()
+    geo_json = {'type': 'FeatureCollection', 'features': [{'type': 'Feature', 'geometry': geometry}]}
+    return sa1_id, get_cells_in_json_and_return_in_json(geo_json, resolution, True)['dggs_cells']
+
+
+def _prepare_table(table, version):
+    conf.db_execute('''CREATE TABLE IF NOT EXISTS "{}" (
+                           "id" integer PRIMARY KEY,
+                           cells text[] NOT NULL
+                       )'''.format(table))
+    if _table_comment(table) != version:
+        # built from another version of the dataset or of the conversion (or new), start over
+        conf.db_execute('TRUNCATE "{}"'.format(table))
+        conf.db_execute('COMMENT ON TABLE "{}" IS %s'.format(table), [version])
+
+
+def _missing_sa1s(table, after, limit):
+    return conf.db_select('''SELECT t."id", ST_AsGeoJSON(t.geom)
+                             FROM "{table}" t
+                             WHERE t."id" > %s
+                               AND NOT EXISTS (SELECT 1 FROM "{cells}" c WHERE c."id" = t."id")
+                             ORDER BY t."id"
+                             LIMIT %s'''.format(table=TABLE_NAME, cells=table), [after, limit])
+
+
+def _count_missing(table):
+    # those with a geometry to convert
+    rows = conf.db_select('''SELECT count(*) FROM "{table}" t
+                             WHERE t.geom IS NOT NULL
+                               AND NOT EXISTS (SELECT 1 FROM "{cells}" c WHERE c."id" = t."id")'''
+                          .format(table=TABLE_NAME, cells=table))
+    return rows[0][0] if rows else 0
+
+
+def _store_cells(table, results):
+    conf.db_execute('INSERT INTO "{}" ("id", cells) VALUES {} ON CONFLICT ("id") DO NOTHING'
+                    .format(table, ', '.join(['(%s, %s::text[])'] * len(results))),
+                    [value for result in results for value in result])
+
+
+def build_cells(resolution=DEFAULT_RESOLUTION, workers=4, cover=False):
+    '''
+    Computes the cells (or the compact covers, if cover) of every SA1 not yet in the table of the given resolution,
+    in worker processes, and reports progress as it goes
+    '''
+    if dataset_version() is None:
+        raise IOError('Could not read the version of {}'.format(TABLE_NAME))
+    version = cells_stamp()
+    live = cells_table(resolution, cover)
+    # a table of the current versions only gets the SA1s it lacks, each batch visible at once, anything else is built
+    # aside and swapped in once complete, as other processes keep using the table while it is built
+    table = live if _table_comment(live) == version else live + '_staging'
+    _prepare_table(table, version)
+    total = _count_missing(table)
+    print('Computing resolution {} {} of {} SA1s with {} workers'.format(resolution, 'covers' if cover else 'cells',
+                                                                        total, workers))
+
+    done = 0
+    after = -1
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            rows = _missing_sa1s(table, after, BATCH_SIZE)
+            if rows is None:
+                raise IOError('Could not read the SA1 geometries')
+            if not rows:
+                break
+            after = rows[-1][0]
+            sa1s = [(sa1_id, json.loads(geometry), resolution, cover)
+                    for sa1_id, geometry in rows if geometry is not None]
+            # an SA1 without a geometry has no cells, stored as such so that it is not missing
+            results = [(sa1_id, []) for sa1_id, geometry in rows if geometry is None]
+            results += executor.map(_cells_of_sa1, sa1s, chunksize=CHUNK_SIZE)
+            _store_cells(table, results)
+            done += len(sa1s)
+            if not done:
+                continue
+            elapsed = time.monotonic() - started
+            remaining = (total - done) * elapsed / done if done < total else 0
+            print('{}/{} SA1s, {:.1f} SA1s/s, about {:.0f} s to go'.format(done, total, done / elapsed, remaining))
+
+    conf.db_execute('ANALYZE "{}"'.format(table))
+    if table != live:
+        conf.db_swap_table(table, live)
+    _cell_versions.clear()
+
+
+def cells_summary(resolution, cover=False):
+    table = cells_table(resolution, cover)
+    return conf.db_select('''SELECT count(*), sum(cardinality(cells)), obj_description(to_regclass(%s), %s)
+                             FROM "{}"'''.format(table), ['"{}"'.format(table), 'pg_class'])
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Precomputes the AusPIX DGGS cells of every SA1')
+    parser.add_argument('task', choices=['build', 'summary'])
+    parser.add_argument('--resolution', type=int, default=DEFAULT_RESOLUTION)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--cover', action='store_true', help='the cells covering each SA1 rather than its boundary')
+    args = parser.parse_args()
+    if args.task == 'build':
+        build_cells(args.resolution, args.workers, args.cover)
+    for count, cells, built_from in cells_summary(args.resolution, args.cover) or []:
+        print('resolution {}: {} SA1s, {} cells, built from {}'.format(args.resolution, count, cells, built_from))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+'''
+The whole AEIP dataset as gzipped N-Triples or N-Quads, for loading into a triple store
+
+Rows are read from a server-side cursor and written out as they come, so memory use does not grow with the dataset.
+Every theme of every SA1 is the resource its page describes, e.g. <{base}building_exposure/123>, with the same
+triples (see sa1_rdf); in N-Quads each theme is a named graph, <{base}building_exposure/>. The DGGS cells of the
+location theme are included when they have been precomputed (python -m model.sa1_cells build). The dump is served at
+/dump and written to files, split into partitions by SA1 id and in parallel, with
+
+    python -m model.sa1_dump dump/ --format nquads --partitions 8 --workers 8 --base-uri http://example.org/
+'''
+
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import conf
+from .rdf_writer import rdf_writer
+from .sa1_cells import cells_table, cells_are_current, DEFAULT_RESOLUTION
+from .sa1_rdf import sa1_description, geometry_pairs, dggs_literal
+from .sa1_themes import TABLE_NAME, NAME_FIELD, THEME_COLUMNS, parse_themes
+
+FORMATS = {
+    'ntriples': ('application/n-triples', '.nt.gz'),
+    'nquads': ('application/n-quads', '.nq.gz'),
+}
+ITERSIZE = 500  # rows fetched from the server-side cursor at a time
+FLUSH_SIZE = 256 * 1024  # characters of RDF compressed at a time
+
+
+def _dump_query(themes, with_cells):
+    columns = [NAME_FIELD] + [column for theme in themes for column in THEME_COLUMNS[theme]]
+    select = ['t."id"'] + ['t."{}"'.format(column) for column in sorted(set(columns), key=columns.index)]
+    joins = ''
+    if 'loc_info' in themes:
+        select += ['ST_AsEWKT(t.geom) AS geom_wkt', "replace(ST_GeometryType(t.geom), 'ST_', '') AS geometry_type"]
+        if with_cells:
+            select.append('c.cells')
+            joins = 'LEFT JOIN "{}" c ON c."id" = t."id"'.format(cells_table(DEFAULT_RESOLUTION))
+    return '''SELECT {select}
+              FROM "{table}" t {joins}
+              WHERE t."id" %% %s = %s
+              ORDER BY t."id"'''.format(select=', '.join(select), table=TABLE_NAME, joins=joins)
+
+
+def iter_rdf(base_uri, themes, rdf_format='ntriples', partition=0, partitions=1, cell_ranges=False):
+    '''
+    Yields the RDF of every SA1 in the partition (those whose id % partitions == partition) one SA1 at a time, with
+    the DGGS cells as cell groups if cell_ranges (see sa1_rdf.dggs_literal)
+    '''
+    with_cells = 'loc_info' in themes and cells_are_current(DEFAULT_RESOLUTION)
+    rows = conf.db_stream(_dump_query(themes, with_cells), [partitions, partition], itersize=ITERSIZE)
+    for row in rows:
+        sa1_id = row['id']
+        for theme in themes:
+            subject = '{}{}/{}'.format(base_uri, theme, sa1_id)
+            pairs = sa1_description(row, [theme], sa1_id)
+            if theme == 'loc_info' and row['geom_wkt'] is not None:
+                dggs = dggs_literal(row['cells'], cell_ranges) if with_cells and row['cells'] else None
+                pairs += geometry_pairs(row['geometry_type'], row['geom_wkt'], dggs)
+            blank_prefix = 's{}{}'.format(sa1_id, theme.replace('_', ''))
+            if rdf_format == 'nquads':
+                yield rdf_writer.nquads(subject, pairs, '{}{}/'.format(base_uri, theme), blank_prefix)
+            else:
+                yield rdf_writer.ntriples(subject, pairs, blank_prefix)
+
+
+def gzip_chunks(texts, flush_size=FLUSH_SIZE):
+    '''
+    Compresses an iterable of strings into a stream of gzip chunks
+    '''
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16 + asks for the gzip container
+    pending = []
+    size = 0
+    for text in texts:
+        pending.append(text)
+        size += len(text)
+        if size >= flush_size:
+            chunk = compressor.compress(''.join(pending).encode('utf-8'))
+            pending, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(''.join(pending).encode('utf-8')) + compressor.flush()
+
+
+def dump_partition(directory, base_uri, themes, rdf_format, partition, partitions, cell_ranges=False):
+    '''
+    Writes one partition of the dump to a file in directory and returns its path and the number of SA1s
+    '''
+    extension = FORMATS[rdf_format][1]
+    path = os.path.join(directory, 'aeip-{:03d}-of-{:03d}{}'.format(partition, partitions, extension))
+    count = [0]
+
+    def counted():
+        for text in iter_rdf(base_uri, themes, rdf_format, partition, partitions, cell_ranges):
+            count[0] += 1
+            yield text
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for chunk in gzip_chunks(counted()):
+            f.write(chunk)
+    os.replace(tmp_path, path)
+    return path, count[0] // len(themes)
+
+
+def dump(directory, base_uri, themes, rdf_format='ntriples', partitions=1, workers=1, cell_ranges=False):
+    '''
+    Writes the dump as partitions files, workers of them at a time in separate processes
+    '''
+    os.makedirs(directory, exist_ok=True)
+    started = time.monotonic()
+    # spawned rather than forked, so no process shares the database connections of another
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as executor:
+        futures = [executor.submit(dump_partition, directory, base_uri, themes, rdf_format, partition, partitions,
+                                   cell_ranges)
+                   for partition in range(partitions)]
+        for future in futures:
+            path, count = future.result()
+            print('{}: {} SA1s, {:.1f} MB, {:.0f} s'.format(path, count, os.path.getsize(path) / 1024.0 / 1024.0,
+                                                            time.monotonic() - started))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Dumps the AEIP dataset as gzipped N-Triples or N-Quads')
+    parser.add_argument('directory')
+    parser.add_argument('--base-uri', required=True, help='the URI the API is served at, e.g. http://example.org/')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='ntriples')
+    parser.add_argument('--themes', help='comma separated themes, e.g. loc_info,SEIFA, by default all of them')
+    parser.add_argument('--partitions', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--cell-ranges', action='store_true',
+                        help='the DGGS cells as cell groups (see cell_set.encode_ranges) rather than a list of URIs')
+    args = parser.parse_args()
+    base_uri = args.base_uri if args.base_uri.endswith('/') else args.base_uri + '/'
+    dump(args.directory, base_uri, parse_themes(args.themes), args.format, args.partitions, args.workers,
+         args.cell_ranges)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+'''
+The exposure attributes of every SA1 as tables, for spreadsheets and analysis tools
+
+CSV and newline delimited JSON are streamed at /export, read from a server-side cursor and sent as they come, so
+memory use does not grow with the table. The columns are those of the chosen themes (keys of THEME_COLUMNS, like the
+SA1_* classes in sa1_aeip), after the id and SA1 code: flat in CSV, one object per theme in NDJSON. Parquet and
+Arrow files, with the column types of the database, are written offline with
+
+    python -m model.sa1_export aeip_sa1.parquet --themes building_exposure,SEIFA
+
+which needs pyarrow (pip install pyarrow).
+'''
+
+import csv
+import io
+import json
+import os
+from decimal import Decimal
+
+import conf
+from .sa1_themes import TABLE_NAME, NAME_FIELD, THEME_COLUMNS, parse_themes
+
+FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'ndjson': ('application/x-ndjson', '.ndjson'),
+}
+TABLE_FORMATS = ['parquet', 'arrow']
+ITERSIZE = 2000  # rows fetched from the server-side cursor at a time
+CHUNK_SIZE = 64 * 1024  # characters sent at a time
+ROW_GROUP_SIZE = 10000  # rows per Parquet row group or Arrow record batch
+
+# the Arrow type of each Postgres one and the Python type its values are converted to, anything else is a string
+_COLUMN_TYPES = {
+    'smallint': ('int16', int),
+    'integer': ('int32', int),
+    'bigint': ('int64', int),
+    'real': ('float32', float),
+    'double precision': ('float64', float),
+    'numeric': ('float64', float),
+    'boolean': ('bool_', bool),
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_columns(themes):
+    '''
+    The columns exported for the themes: id, the SA1 code and the columns of every theme, without repeats
+    '''
+    columns = ['id', NAME_FIELD] + [column for theme in themes for column in THEME_COLUMNS[theme]]
+    return sorted(set(columns), key=columns.index)
+
+
+def iter_rows(columns):
+    query = 'SELECT {} FROM "{}" ORDER BY "id"'.format(', '.join('"{}"'.format(c) for c in columns), TABLE_NAME)
+    return conf.db_stream(query, itersize=ITERSIZE)
+
+
+def _chunked(texts, chunk_size):
+    pending = []
+    size = 0
+    for text in texts:
+        pending.append(text)
+        size += len(text)
+        if size >= chunk_size:
+            yield ''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending)
+
+
+def _csv_chunks(columns, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    for row in iter_rows(columns):
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def _ndjson_lines(themes):
+    for row in iter_rows(export_columns(themes)):
+        record = {'id': row['id'], NAME_FIELD: row[NAME_FIELD]}
+        for theme in themes:
+            record[theme] = {column: row[column] for column in THEME_COLUMNS[theme]}
+        yield json.dumps(record, default=_json_value) + '\n'
+
+
+def iter_export(themes, export_format='csv'):
+    '''
+    Yields the export of the themes as CSV or NDJSON text, CHUNK_SIZE characters or so at a time
+    '''
+    if export_format == 'ndjson':
+        return _chunked(_ndjson_lines(themes), CHUNK_SIZE)
+    return _csv_chunks(export_columns(themes), CHUNK_SIZE)
+
+
+def column_types(columns):
+    '''
+    The Postgres data type of each of the columns
+    '''
+    rows = conf.db_select('SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s',
+                          [TABLE_NAME])
+    if rows is None:
+        raise ExportError('Could not read the column types of {}'.format(TABLE_NAME))
+    types = {row['column_name']: row['data_type'] for row in rows}
+    return [types.get(column, 'text') for column in columns]
+
+
+def import_pyarrow(table_format):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError('Writing {} files needs pyarrow (pip install pyarrow)'.format(table_format))
+    return pyarrow
+
+
+def typed_columns(pa, columns):
+    '''
+    The Arrow field of each of the columns, typed like it is in the database, and the converter of its values
+    '''
+    fields = []
+    converters = []
+    for column, data_type in zip(columns, column_types(columns)):
+        arrow_type, convert = _COLUMN_TYPES.get(data_type, ('string', str))
+        fields.append(pa.field(column, getattr(pa, arrow_type)()))
+        converters.append(convert)
+    return fields, converters
+
+
+def iter_batches(pa, schema, rows, batch_size=ROW_GROUP_SIZE):
+    '''
+    Groups rows, lists of values matching the schema, into Arrow record batches of batch_size rows
+    '''
+    values = [[] for _ in schema]
+
+    def batch():
+        arrays = [pa.array(field_values, type=field.type) for field_values, field in zip(values, schema)]
+        for field_values in values:
+            del field_values[:]
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+    for row in rows:
+        for field_values, value in zip(values, row):
+            field_values.append(value)
+        if len(values[0]) == batch_size:
+            yield batch()
+    if values[0]:
+        yield batch()
+
+
+def write_arrow(path, table_format, schema, rows, row_group_size=ROW_GROUP_SIZE):
+    '''
+    Writes rows, lists of values matching the schema, as a Parquet or Arrow IPC file, row_group_size rows per
+    row group or record batch, and returns the number of rows. The file is only put in place once complete.
+    '''
+    pa = import_pyarrow(table_format)
+    tmp_path = path + '.tmp'
+    if table_format == 'arrow':
+        writer = pa.ipc.new_file(tmp_path, schema)
+    else:
+        writer = pa.parquet.ParquetWriter(tmp_path, schema, compression='zstd')
+    count = 0
+    try:
+        for batch in iter_batches(pa, schema, rows, row_group_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    finally:
+        writer.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def write_table(path, themes, table_format='parquet', row_group_size=ROW_GROUP_SIZE):
+    '''
+    Writes the export of the themes as a Parquet or Arrow IPC file and returns the number of rows
+    '''
+    pa = import_pyarrow(table_format)
+    columns = export_columns(themes)
+    fields, converters = typed_columns(pa, columns)
+    rows = ([None if value is None else convert(value) for convert, value in zip(converters, row)]
+            for row in iter_rows(columns))
+    return write_arrow(path, table_format, pa.schema(fields), rows, row_group_size)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Exports the exposure attributes of every SA1 as a table')
+    parser.add_argument('path', help='the file to write, e.g. aeip_sa1.parquet')
+    parser.add_argument('--format', choices=sorted(FORMATS) + TABLE_FORMATS,
+                        help='by default the extension of path, parquet if it is neither')
+    parser.add_argument('--themes', help='comma separated themes, e.g. loc_info,SEIFA, by default all of them')
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args()
+    export_format = args.format or os.path.splitext(args.path)[1].lstrip('.')
+    if export_format not in FORMATS and export_format not in TABLE_FORMATS:
+        export_format = 'parquet'
+    themes = parse_themes(args.themes)
+    if export_format in FORMATS:
+        with open(args.path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in iter_export(themes, export_format):
+                f.write(chunk)
+    else:
+        print('{} rows written to {}'.format(write_table(args.path, themes, export_format, args.row_group_size),
+                                             args.path))
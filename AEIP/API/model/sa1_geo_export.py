@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+'''
+The SA1 polygons with their exposure attributes as GeoParquet or FlatGeobuf files, for GIS tools
+
+Both formats let a client read only the SA1s of an area, with HTTP range requests, instead of the whole file. The
+rows are written in the Z-order of the SA1 centroids (their geohashes), so the SA1s of each GeoParquet row group are
+close together, and every row has a bbox column (the GeoParquet 1.1 bbox covering) whose statistics give the
+bounding box of its row group. FlatGeobuf files get a packed Hilbert R-tree of the features. Geometries are written
+in WGS84 longitude and latitude, read from a server-side cursor. Either file is written with
+
+    python -m model.sa1_geo_export aeip_sa1.parquet --themes building_exposure
+    python -m model.sa1_geo_export aeip_sa1.fgb
+
+which needs pyarrow, and for FlatGeobuf pyogrio, which writes it with GDAL (pip install pyarrow pyogrio).
+'''
+
+import json
+import os
+
+import conf
+from .sa1_export import ExportError, ROW_GROUP_SIZE, ITERSIZE, export_columns, import_pyarrow, typed_columns, \
+    iter_batches, write_arrow
+from .sa1_themes import TABLE_NAME, parse_themes
+
+GEO_FORMATS = {
+    'geoparquet': '.parquet',
+    'flatgeobuf': '.fgb',
+}
+GEOMETRY_COLUMN = 'geometry'
+BBOX_COLUMN = 'bbox'
+GEOPARQUET_VERSION = '1.1.0'
+
+_GEOMETRIES = 'SELECT *, ST_Multi(ST_Transform(geom, 4326)) AS g FROM "{}"'.format(TABLE_NAME)
+
+
+def _geo_query(columns):
+    return '''SELECT {columns}, ST_AsBinary(g) AS geom_wkb,
+                     ST_XMin(g) AS bbox_xmin, ST_YMin(g) AS bbox_ymin, ST_XMax(g) AS bbox_xmax, ST_YMax(g) AS bbox_ymax
+              FROM ({geometries}) t
+              ORDER BY ST_GeoHash(ST_Centroid(g), 10), "id"'''.format(
+        columns=', '.join('"{}"'.format(c) for c in columns), geometries=_GEOMETRIES)
+
+
+def geometry_summary():
+    '''
+    The bounding box of all the geometries (None if there are none) and their types, for the GeoParquet metadata
+    '''
+    rows = conf.db_select('''SELECT min(ST_XMin(g)), min(ST_YMin(g)), max(ST_XMax(g)), max(ST_YMax(g)),
+                                    array_agg(DISTINCT replace(ST_GeometryType(g), 'ST_', ''))
+                             FROM ({}) t
+                             WHERE g IS NOT NULL'''.format(_GEOMETRIES))
+    if not rows:
+        raise ExportError('Could not summarise the geometries of {}'.format(TABLE_NAME))
+    xmin, ymin, xmax, ymax, geometry_types = rows[0]
+    if xmin is None:
+        return None, []
+    return [float(xmin), float(ymin), float(xmax), float(ymax)], sorted(geometry_types)
+
+
+def geoparquet_metadata(bbox, geometry_types):
+    # no crs, which means OGC:CRS84, WGS84 longitude and latitude
+    column = {
+        'encoding': 'WKB',
+        'geometry_types': geometry_types,
+        'covering': {
+            'bbox': {edge: [BBOX_COLUMN, edge] for edge in ['xmin', 'ymin', 'xmax', 'ymax']},
+        },
+    }
+    if bbox is not None:
+        column['bbox'] = bbox
+    return {
+        'version': GEOPARQUET_VERSION,
+        'primary_column': GEOMETRY_COLUMN,
+        'columns': {GEOMETRY_COLUMN: column},
+    }
+
+
+def _geo_schema(pa, columns, with_bbox):
+    fields, converters = typed_columns(pa, columns)
+    fields.append(pa.field(GEOMETRY_COLUMN, pa.binary(), metadata={'ARROW:extension:name': 'geoarrow.wkb'}))
+    if with_bbox:
+        fields.append(pa.field(BBOX_COLUMN, pa.struct([(edge, pa.float64())
+                                                        for edge in ['xmin', 'ymin', 'xmax', 'ymax']])))
+    return fields, converters
+
+
+def _geo_rows(columns, converters, with_bbox):
+    for row in conf.db_stream(_geo_query(columns), itersize=ITERSIZE):
+        values = [None if row[column] is None else convert(row[column])
+                  for column, convert in zip(columns, converters)]
+        if row['geom_wkb'] is None:
+            values.append(None)
+            if with_bbox:
+                values.append(None)
+        else:
+            values.append(bytes(row['geom_wkb']))
+            if with_bbox:
+                values.append({'xmin': row['bbox_xmin'], 'ymin': row['bbox_ymin'],
+                               'xmax': row['bbox_xmax'], 'ymax': row['bbox_ymax']})
+        yield values
+
+
+def write_geoparquet(path, themes, row_group_size=ROW_GROUP_SIZE):
+    '''
+    Writes the SA1 geometries and the columns of the themes as GeoParquet and returns the number of rows
+    '''
+    pa = import_pyarrow('GeoParquet')
+    columns = export_columns(themes)
+    fields, converters = _geo_schema(pa, columns, True)
+    bbox, geometry_types = geometry_summary()
+    schema = pa.schema(fields, metadata={'geo': json.dumps(geoparquet_metadata(bbox, geometry_types))})
+    return write_arrow(path, 'parquet', schema, _geo_rows(columns, converters, True), row_group_size)
+
+
+def write_flatgeobuf(path, themes):
+    '''
+    Writes the SA1 geometries and the columns of the themes as FlatGeobuf with a spatial index and returns the
+    number of rows
+    '''
+    pa = import_pyarrow('FlatGeobuf')
+    try:
+        from pyogrio.raw import write_arrow as write_ogr
+    except ImportError:
+        raise ExportError('Writing FlatGeobuf files needs pyogrio (pip install pyogrio)')
+    columns = export_columns(themes)
+    fields, converters = _geo_schema(pa, columns, False)
+    schema = pa.schema(fields)
+    count = [0]
+
+    def counted():
+        for batch in iter_batches(pa, schema, _geo_rows(columns, converters, False), ITERSIZE):
+            count[0] += batch.num_rows
+            yield batch
+    root, extension = os.path.splitext(path)
+    tmp_path = root + '.tmp' + extension  # GDAL picks the kind of output by its extension
+    # GDAL sorts the features along a Hilbert curve and packs the R-tree when the file is closed
+    write_ogr(pa.RecordBatchReader.from_batches(schema, counted()), tmp_path, layer='sa1', driver='FlatGeobuf',
+              geometry_name=GEOMETRY_COLUMN, geometry_type='MultiPolygon', crs='EPSG:4326',
+              layer_options={'SPATIAL_INDEX': 'YES'})
+    os.replace(tmp_path, path)
+    return count[0]
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Exports the SA1 geometries and exposure attributes for GIS tools')
+    parser.add_argument('path', help='the file to write, e.g. aeip_sa1.parquet or aeip_sa1.fgb')
+    parser.add_argument('--format', choices=sorted(GEO_FORMATS), help='by default the extension of path')
+    parser.add_argument('--themes', help='comma separated themes, e.g. loc_info,SEIFA, by default all of them')
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE, help='rows per GeoParquet row group')
+    args = parser.parse_args()
+    geo_format = args.format or next((name for name, extension in GEO_FORMATS.items()
+                                      if args.path.endswith(extension)), 'geoparquet')
+    themes = parse_themes(args.themes)
+    if geo_format == 'flatgeobuf':
+        count = write_flatgeobuf(args.path, themes)
+    else:
+        count = write_geoparquet(args.path, themes, args.row_group_size)
+    print('{} SA1s written to {}'.format(count, args.path))
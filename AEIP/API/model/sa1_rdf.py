@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+'''
+The RDF of the SA1 themes, driven by the columns of each theme in sa1_themes
+
+Every column of a theme becomes a predicate of the aeip: vocabulary named after it (aeip_POPULATION is
+aeip:POPULATION), mapped once here when the module
+is imported, so a theme's RDF costs one pass over its columns whatever the theme. The theme classes of sa1_aeip get
+their export_rdf from SA1RDFRenderer, the bulk dump (sa1_dump) uses sa1_description directly.
+'''
+
+import decimal
+from collections import OrderedDict
+
+from flask import Response
+
+from .cell_set import encode_ranges
+from .rdf_writer import rdf_writer, PREFIXES, RDF_TYPE, IRI, Literal
+from .sa1_record import get_sa1_record
+from .sa1_themes import NAME_FIELD, THEME_COLUMNS
+
+AEIP = PREFIXES['aeip']
+FEATURE = IRI(PREFIXES['geo'] + 'Feature')
+IDENTIFIER = PREFIXES['dcterms'] + 'identifier'
+NAME = PREFIXES['core'] + 'name'
+XSD_INTEGER = PREFIXES['xsd'] + 'integer'
+XSD_DECIMAL = PREFIXES['xsd'] + 'decimal'
+DGGS_URI = 'http://ec2-52-63-73-113.ap-southeast-2.compute.amazonaws.com/AusPIX-DGGS-dataset/ausPIX/'
+
+
+def column_predicate(column):
+    return AEIP + (column[len('aeip_'):] if column.startswith('aeip_') else column)
+
+
+THEME_PREDICATES = OrderedDict((theme, [(column, column_predicate(column)) for column in columns])
+                               for theme, columns in THEME_COLUMNS.items())
+
+
+def _literal(value):
+    if isinstance(value, bool):
+        return Literal(str(value).lower(), PREFIXES['xsd'] + 'boolean')
+    if isinstance(value, int):
+        return Literal(value, XSD_INTEGER)
+    if isinstance(value, (float, decimal.Decimal)):
+        return Literal(value, XSD_DECIMAL)
+    return Literal(value)
+
+
+def sa1_description(record, themes, sa1_id):
+    '''
+    The (predicate, object) pairs of an SA1 record for the given themes (keys of THEME_COLUMNS), see rdf_writer.
+    Columns without a value are left out.
+    '''
+    pairs = [(RDF_TYPE, FEATURE), (IDENTIFIER, Literal(str(sa1_id)))]
+    if record[NAME_FIELD] is not None:
+        pairs.append((NAME, Literal(str(record[NAME_FIELD]), lang='en-AU')))
+    for theme in themes:
+        pairs.extend((predicate, _literal(record[column]))
+                     for column, predicate in THEME_PREDICATES[theme] if record[column] is not None)
+    return pairs
+
+
+def dggs_literal(cells, ranges=False):
+    '''
+    The text of the geox:dggsLiteral of a list of cell ids: the list of their URIs or, with ranges, the much shorter
+    cell groups of cell_set.encode_ranges separated by spaces
+    '''
+    if ranges:
+        return ' '.join(encode_ranges(str(cell) for cell in cells))
+    return '{}'.format(['{}{}'.format(DGGS_URI, cell) for cell in cells])
+
+
+def geometry_pairs(geometry_type, wkt, dggs=None):
+    '''
+    The geo:hasGeometry pairs of an SA1: its WKT geometry and, if given, the literal of its DGGS cells
+    '''
+    geo = PREFIXES['geo']
+    geox = PREFIXES['geox']
+    pairs = [(geo + 'hasGeometry', [(RDF_TYPE, IRI(PREFIXES['sf'] + geometry_type)),
+                                    (geo + 'asWKT', Literal(wkt, geo + 'wktLiteral'))])]
+    if dggs is not None:
+        pairs.append((geo + 'hasGeometry', [(RDF_TYPE, IRI(geo + 'Geometry')),
+                                            (geox + 'asDGGS', Literal(dggs, geox + 'dggsLiteral'))]))
+    return pairs
+
+
+class SA1RDFRenderer(object):
+    '''
+    export_rdf for the theme classes, which set theme to their key in THEME_COLUMNS and may add pairs of their own
+    with _rdf_extra
+    '''
+    theme = None
+
+    def _rdf_extra(self, record):
+        return []
+
+    def export_rdf(self, model_view='SA1_AEIP'):
+        record = get_sa1_record(self.id)
+        if record is None:
+            return Response('No SA1 with id {}'.format(self.id), mimetype='text/plain', status=404)
+        pairs = sa1_description(record, [self.theme], self.id) + self._rdf_extra(record)
+        return Response(rdf_writer.serialize(self.instance_uri, pairs, self.mediatype), mimetype=self.mediatype)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+'''
+A per-process cache of whole SA1 records, shared by every theme class in sa1_aeip
+
+Users usually click through several themes of the same SA1, so the first theme requested loads every theme's
+columns and the geometry in one query and the others are served from the cache.
+'''
+
+import json
+
+import conf
+from .cache import LRUCache
+from .dataset import dataset_version
+from .sa1_themes import TABLE_NAME, NAME_FIELD, ALL_COLUMNS
+
+RECORD_CACHE_SIZE = 512  # records
+RECORD_CACHE_BYTES = 64 * 1024 * 1024  # total GeoJSON size of the cached geometries
+RECORD_TTL = 600  # seconds
+
+_SA1_RECORD_QUERY = '''
+    SELECT
+        "id",
+        "{name}",
+        {columns},
+        ST_AsEWKT(geom) As geom_wkt,
+        ST_XMin(geom) As bbox_xmin,
+        ST_YMin(geom) As bbox_ymin,
+        ST_XMax(geom) As bbox_xmax,
+        ST_YMax(geom) As bbox_ymax,
+        ST_AsGeoJSON(geom) As geom
+    FROM "{table}"
+    WHERE "id" = %s
+'''.format(name=NAME_FIELD, table=TABLE_NAME, columns=',\n        '.join('"{}"'.format(c) for c in ALL_COLUMNS))
+
+_records = LRUCache('sa1_records', maxsize=RECORD_CACHE_SIZE, ttl=RECORD_TTL,
+                    weigh=lambda record: record['geom_size'], max_weight=RECORD_CACHE_BYTES)
+
+
+def _load_sa1_record(sa1_id):
+    rows = conf.db_select(_SA1_RECORD_QUERY, [sa1_id], prepare=True)
+    if not rows:
+        return None
+    record = dict(rows[0])
+    record['geom_size'] = len(record['geom'] or '') + len(record['geom_wkt'] or '')
+    # parsed once here rather than by every theme
+    record['geom'] = json.loads(record['geom']) if record['geom'] is not None else None
+    record['bbox'] = (record.pop('bbox_xmin'), record.pop('bbox_ymin'), record.pop('bbox_xmax'), record.pop('bbox_ymax'))
+    return record
+
+
+def get_sa1_record(sa1_id):
+    '''
+    Returns a dict of every column of the SA1 with the given id, its geometry parsed from GeoJSON under 'geom' and
+    as EWKT under 'geom_wkt' and its (xmin, ymin, xmax, ymax) bounding box under 'bbox', or None if there is no
+    such SA1.
+
+    The record is shared between requests and must not be modified.
+    '''
+    return _records.get_or_load((dataset_version(), str(sa1_id)), lambda: _load_sa1_record(sa1_id))
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+'''
+Queries behind the SA1 register listings
+
+Pages are fetched with keyset (seek) pagination on NAME_FIELD rather than OFFSET, so that page 1000 costs the same
+as page 1. The pyldapi ContainerRenderer still links pages by number, so the key that ends every page is looked up
+once per (search, per_page) and cached as a list of page bookmarks.
+
+Register counts are cached per search string as well. The unfiltered listing uses the planner's row estimate
+instead of COUNT(*). Both caches are keyed on the dataset version, so they are invalidated when the table changes.
+'''
+
+import conf
+from .cache import LRUCache
+from .dataset import dataset_version
+from .sa1_themes import TABLE_NAME, NAME_FIELD
+from .sa1_search import search_filter, SEARCH_INDEXES
+
+BOOKMARK_TTL = 3600  # seconds
+COUNT_TTL = 3600  # seconds
+
+REGISTER_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS "{table}_{name}_idx" ON "{table}" ("{name}")'.format(table=TABLE_NAME,
+                                                                                   name=NAME_FIELD),
+]
+
+_page_bookmarks = LRUCache('register_page_bookmarks', maxsize=64, ttl=BOOKMARK_TTL)
+_counts = LRUCache('register_counts', maxsize=1024, ttl=COUNT_TTL)
+
+
+def _normalise_search(search_string):
+    return search_string.strip().upper() if search_string else None
+
+
+def _count_items(search_string):
+    where, params = search_filter(search_string)
+    sql = 'SELECT COUNT(*) FROM "{table}" {where}'.format(table=TABLE_NAME, where=where)
+    rows = conf.db_select(sql, params, prepare=True)
+    return rows[0][0] if rows else None
+
+
+def _estimate_items():
+    # the planner's estimate is kept up to date by (auto)analyze, -1 or 0 means the table has not been analysed
+    rows = conf.db_select('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                          ['"{}"'.format(TABLE_NAME)])
+    if rows and rows[0][0] > 0:
+        return rows[0][0]
+    return _count_items(None)
+
+
+def get_register_count(search_string=None):
+    search = _normalise_search(search_string)
+    if search:
+        loader = lambda: _count_items(search_string)
+    else:
+        loader = _estimate_items
+    count = _counts.get_or_load((dataset_version(), search), loader)
+    if count is None:
+        raise IOError('Could not count the register items')
+    return count
+
+
+def _load_page_bookmarks(search_string, per_page):
+    # the last key of every full page, i.e. bookmarks[n] is the key to seek past to reach page n + 2
+    where, params = search_filter(search_string)
+    sql = '''SELECT "{name}" FROM (
+                 SELECT "{name}", row_number() OVER (ORDER BY "{name}") AS rn
+                 FROM "{table}" {where}
+             ) AS keyed
+             WHERE rn %% %s = 0
+             ORDER BY rn'''.format(name=NAME_FIELD, table=TABLE_NAME, where=where)
+    rows = conf.db_select(sql, params + [per_page], prepare=True)
+    if rows is None:
+        return None
+    return [row[0] for row in rows]
+
+
+def get_page_start_key(search_string, page, per_page):
+    '''
+    Returns the key to seek past to get to the given page, None for the first page.
+    Raises IndexError if the page is past the end of the register.
+    '''
+    if page <= 1:
+        return None
+    key = (dataset_version(), _normalise_search(search_string), per_page)
+    bookmarks = _page_bookmarks.get_or_load(key, lambda: _load_page_bookmarks(search_string, per_page))
+    if bookmarks is None:
+        raise IOError('Could not load the register page bookmarks')
+    if page - 2 >= len(bookmarks):
+        raise IndexError('Page {} is past the end of the register'.format(page))
+    return bookmarks[page - 2]
+
+
+def get_register_page(search_string=None, page=1, per_page=50, after=None):
+    '''
+    Returns a list of (id, name) tuples for one page of the register.
+
+    If after is given it is used as the seek key directly (cursor mode), otherwise the page number is
+    translated to a seek key using the cached page bookmarks.
+    '''
+    if after is None:
+        try:
+            after = get_page_start_key(search_string, page, per_page)
+        except IndexError:
+            return []
+
+    where, params = search_filter(search_string)
+    if after is not None:
+        where = '{} "{}" > %s'.format(where + ' AND' if where else 'WHERE', NAME_FIELD)
+        params = params + [after]
+    sql = '''SELECT "id", "{name}" FROM "{table}" {where}
+             ORDER BY "{name}"
+             LIMIT %s'''.format(name=NAME_FIELD, table=TABLE_NAME, where=where)
+    return [(row[0], row[1]) for row in conf.db_select(sql, params + [per_page], prepare=True)]
+
+
+def create_register_indexes():
+    for ddl in REGISTER_INDEXES + SEARCH_INDEXES:
+        conf.db_execute(ddl)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Maintenance tasks for the SA1 register listings')
+    parser.add_argument('task', choices=['create-indexes'])
+    args = parser.parse_args()
+    if args.task == 'create-indexes':
+        create_register_indexes()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+'''
+Search predicates for the SA1 register
+
+Infix searches are served by pg_trgm GIN indexes on the same UPPER(...) expressions the predicate uses. Searches
+that look like an SA1, SA2 or SA3 code take a prefix path instead. SA1 codes start with the code of the SA2 they
+are in, which in turn starts with its SA3 code, so a prefix range on SA1_MAIN16 finds every SA1 in that area
+from a text_pattern_ops btree. All values are passed as query parameters so the statements can be prepared once
+and reused.
+'''
+
+from .sa1_themes import TABLE_NAME, NAME_FIELD
+
+# lengths of the ABS SA3, SA2 and SA1 codes that SA1_MAIN16 is built from
+CODE_PREFIX_LENGTHS = (5, 9, 11)
+MAX_ID = 2 ** 31 - 1  # the id column is an integer
+
+SEARCH_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS "{table}_id_trgm_idx" ON "{table}" '
+    'USING gin (UPPER(cast("id" as text)) gin_trgm_ops)'.format(table=TABLE_NAME),
+    'CREATE INDEX IF NOT EXISTS "{table}_{name}_trgm_idx" ON "{table}" '
+    'USING gin (UPPER("{name}") gin_trgm_ops)'.format(table=TABLE_NAME, name=NAME_FIELD),
+    'CREATE INDEX IF NOT EXISTS "{table}_{name}_prefix_idx" ON "{table}" '
+    '("{name}" text_pattern_ops)'.format(table=TABLE_NAME, name=NAME_FIELD),
+]
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def is_code_search(search):
+    return search.isdigit() and len(search) in CODE_PREFIX_LENGTHS
+
+
+def search_filter(search_string):
+    '''
+    Returns the WHERE clause and its parameters for a register search, or ('', []) when not searching
+    '''
+    search = search_string.strip().upper() if search_string else ''
+    if not search:
+        return '', []
+
+    if is_code_search(search):
+        # every SA1 in the SA1/SA2/SA3 with this code, using the byte-wise pattern operators
+        # that the text_pattern_ops index serves, or the record whose id it is if it fits the integer id
+        upper_bound = search[:-1] + chr(ord(search[-1]) + 1)
+        if int(search) > MAX_ID:
+            return '''WHERE ("{name}" ~>=~ %s AND "{name}" ~<~ %s)'''.format(name=NAME_FIELD), [search, upper_bound]
+        return '''WHERE (("{name}" ~>=~ %s AND "{name}" ~<~ %s) OR "id" = %s)'''.format(name=NAME_FIELD), \
+               [search, upper_bound, int(search)]
+
+    pattern = '%{}%'.format(_escape_like(search))
+    return '''WHERE (UPPER(cast("id" as text)) LIKE %s OR UPPER("{name}") LIKE %s)'''.format(name=NAME_FIELD), \
+           [pattern, pattern]
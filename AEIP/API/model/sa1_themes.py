@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+'''
+The AEIP SA1 table and the columns shown by each theme (the SA1_* classes in sa1_aeip), keyed by the
+theme's register path
+'''
+
+from collections import OrderedDict
+
+# TABLE_NAME = 'AEIP_SA1join84'
+TABLE_NAME = 'aeip_sa1_84withresdensityv11'
+NAME_FIELD = 'SA1_MAIN16'
+
+THEME_COLUMNS = OrderedDict([
+    ('loc_info', [
+        'SA2_MAIN16',
+        'SA2_NAME16',
+        'SA3_CODE16',
+        'SA3_NAME16',
+        'SA4_CODE16',
+        'SA4_NAME16',
+        'GCC_CODE16',
+        'GCC_NAME16',
+        'STE_CODE16',
+        'STE_NAME16',
+        'SA1SQKM16',
+        'aeip_LGA_WITHIN_AOI',
+        'aeip_LOCALITIES_WITHIN_AOI',
+    ]),
+    ('building_exposure', [
+        'aeip_POPULATION',
+        'aeip_DWELLINGS',
+        'aeip_BUILDINGS',
+        'aeip_PRE_1980_CONSTRUCTION_COUNT',
+        'aeip_PRE_1990_PROBABLE_ASBESTOS',
+        'aeip_RESIDENTIAL_RECONSTRUCTION_VALUE',
+        'aeip_RESIDENTIAL_CONTENTS_VALUE',
+        'aeip_COMMERCIAL_BUILDING_COUNT',
+        'aeip_COMMERCIAL_RECONSTRUCTION_VALUE',
+        'aeip_INDUSTRIAL_BUILDING_COUNT',
+        'aeip_INDUSTRIAL_RECONSTRUCTION_VALUE',
+        'residensity1km_v11_mean',
+    ]),
+    ('SEIFA', [
+        'aeip_SEIFA_DECILE_SCORE_10',
+        'aeip_SEIFA_DECILE_SCORE_9',
+        'aeip_SEIFA_DECILE_SCORE_8',
+        'aeip_SEIFA_DECILE_SCORE_7',
+        'aeip_SEIFA_DECILE_SCORE_6',
+        'aeip_SEIFA_DECILE_SCORE_5',
+        'aeip_SEIFA_DECILE_SCORE_4',
+        'aeip_SEIFA_DECILE_SCORE_3',
+        'aeip_SEIFA_DECILE_SCORE_2',
+        'aeip_SEIFA_DECILE_SCORE_1',
+        'aeip_WITHOUT_SEIFA_SCORE',
+    ]),
+    ('demographic_exposure', [
+        'aeip_ALL_AGED_65_AND_OVER',
+        'aeip_INCLUDES_PERSONS_AGED_14_YEARS_AND_UNDER',
+        'aeip_INCLUDES_AN_INDIGENOUS_PERSON',
+        'aeip_ARE_A_SINGLE_PARENT_HOUSEHOLD',
+        'aeip_ARE_IN_NEED_OF_ASSISTANCE_FOR_SELF_CARE_ACTIVITIES',
+        'aeip_INCLUDE_PERSONS_NOT_PROFICIENT_IN_ENGLISH',
+        'aeip_DO_NOT_HAVE_ACCESS_TO_A_MOTOR_VEHICLE',
+        'aeip_NO_ONE_HAS_COMPLETED_YEAR_12_OR_HIGHER',
+        'aeip_MOVED_TO_THE_REGION_IN_THE_LAST_1_YEAR',
+        'aeip_MOVED_TO_THE_REGION_IN_THE_LAST_5_YEARS',
+        'aeip_TOP_5_EMPLOYING_INDUSTRIES',
+    ]),
+    ('economic_exposure', [
+        'aeip_ARE_LOW_INCOME_1_TO_499_WK',
+        'aeip_ARE_MEDIUM_INCOME_500_TO_1499_WK',
+        'aeip_ARE_HIGH_INCOME_1500_PLUS_WK',
+        'aeip_ARE_IN_PUBLIC_HOUSING',
+        'aeip_ARE_ALL_UNEMPLOYED',
+    ]),
+    ('institution_exposure', [
+        'aeip_SCHOOL_PRE_PRIMARY',
+        'aeip_SCHOOL_SECONDARY',
+        'aeip_SCHOOL_TERTIARY',
+        'aeip_SCHOOL_OTHER',
+        'aeip_HOSPITAL_PUBLIC',
+        'aeip_HOSPITAL_PRIVATE',
+        'aeip_NURSING_HOME',
+        'aeip_RETIREMENT_HOME',
+        'aeip_POLICE_STATION',
+        'aeip_FIRE_STATION',
+        'aeip_AMBULANCE_STATION',
+        'aeip_SES_FACILITY',
+        'aeip_EMERGENCY_MANAGEMENT_FACILITIES',
+        'aeip_FEDERAL_COURT',
+        'aeip_MEDICARE_OFFICE',
+        'aeip_CENTRELINK_OFFICE',
+        'aeip_DIPLOMATIC_FACILITY',
+        'aeip_CONSULATE_FACILITY',
+        'aeip_MAJOR_DEFENCE_FACILITY',
+        'aeip_CORRECTIONAL_FACILITY',
+        'aeip_IMMIGRATION_DETENTION_FACILITY',
+        'aeip_LOCAL_GOVERNMENT_OFFICE',
+    ]),
+    ('transport_exposure', [
+        'aeip_AIRPORT_MAJOR_AREAS',
+        'aeip_AIRPORT_MAJOR_TERMINALS',
+        'aeip_AIRPORT_LANDING_GROUNDS',
+        'aeip_ROADS_MAJOR_KMS',
+        'aeip_ROADS_ARTERIAL_AND_SUB_ARTERIAL_KMS',
+        'aeip_RAILWAY_TRACKS_KMS',
+        'aeip_RAILWAY_STATIONS',
+        'aeip_MARITIME_MAJOR_PORT',
+        'aeip_MARITIME_FERRY_TERMINAL',
+    ]),
+    ('utility_exposure', [
+        'aeip_POWER_STATION_MAJOR_FOSSIL_FUEL',
+        'aeip_POWER_STATION_MAJOR_RENEWABLE',
+        'aeip_TRANSMISSION_SUBSTATION',
+        'aeip_TRANSMISSION_ELECTRICITY_LINES_KMS',
+        'aeip_LIQUID_FUEL_REFINERIES',
+        'aeip_LIQUID_FUEL_TERMINALS',
+        'aeip_LIQUID_FUEL_DEPOTS',
+        'aeip_LIQUID_FUEL_PETROL_STATIONS',
+        'aeip_GAS_PIPELINES_KMS',
+        'aeip_OIL_PIPELINES_KMS',
+        'aeip_OFFSHORE_EXTRACTION_PLATFORM',
+        'aeip_WASTE_MANAGEMENT_SITE',
+        'aeip_WASTE_WATER_TREATMENT_PLANT',
+        'aeip_MAJOR_DAM_WALLS',
+        'aeip_TELEPHONE_EXCHANGE',
+        'aeip_BROADCASTING_STUDIO_RADIO_TV',
+    ]),
+    ('business_exposure', [
+        'aeip_ACCOMMODATION_AND_FOOD_SERVICES',
+        'aeip_ADMINISTRATIVE_AND_SUPPORT_SERVICES',
+        'aeip_AGRICULTURE_FORESTRY_FISHING',
+        'aeip_ARTS_AND_RECREATION_SERVICES',
+        'aeip_CONSTRUCTION',
+        'aeip_EDUCATION_AND_TRAINING',
+        'aeip_ELECT_GAS_WATER_WASTE_SERVICES',
+        'aeip_FINANCIAL_AND_INSURANCE_SERVICES',
+        'aeip_HEALTH_CARE_AND_SOCIAL_ASSISTANCE',
+        'aeip_INFORMATION_MEDIA_AND_TELECOMMUNICATIONS',
+        'aeip_MANUFACTURING',
+        'aeip_MINING',
+        'aeip_OTHER_SERVICES',
+        'aeip_PROFESSIONAL_SCIENTIFIC_AND_TECHNICAL_SERVICES',
+        'aeip_PUBLIC_ADMINISTRATION_AND_SAFETY',
+        'aeip_RENTAL_HIRING_AND_REAL_ESTATE_SERVICES',
+        'aeip_RETAIL_TRADE',
+        'aeip_TRANSPORT_POSTAL_AND_WAREHOUSING',
+        'aeip_WHOLESALE_TRADE',
+        'aeip_UNCLASSIFIED_BUSINESSES',
+        'aeip_TOTAL_NUMBER_OF_BUSINESSES',
+        'aeip_NUMBER_OF_REGISTERED_CHARITY_ORGANISATIONS',
+        'aeip_AGRICULTURE_AND_FISHING_SUPPORT_SERVICES',
+        'aeip_AQUACULTURE',
+        'aeip_DAIRY_CATTLE_FARMING',
+        'aeip_DEER_FARMING',
+        'aeip_FISHING',
+        'aeip_FORESTRY_AND_LOGGING',
+        'aeip_FORESTRY_SUPPORT_SERVICES',
+        'aeip_FRUIT_AND_TREE_NUT_GROWING',
+        'aeip_HUNTING_AND_TRAPPING',
+        'aeip_MUSHROOM_AND_VEGETABLE_GROWING',
+        'aeip_NURSERY_AND_FLORICULTURE_PRODUCTION',
+        'aeip_OTHER_CROP_GROWING',
+        'aeip_OTHER_LIVESTOCK_FARMING',
+        'aeip_POULTRY_FARMING',
+        'aeip_SHEEP_BEEF_CATTLE_AND_GRAIN_FARMING',
+        'aeip_TOTAL_NUMBER_OF_PRIMARY_PRODUCERS',
+    ]),
+    ('agriculture_exposure', [
+        'aeip_ESTIMATED_VACP_VALUE',
+        'aeip_ESTIMATED_AGRICULTURAL_AREA_HA',
+        'aeip_COMMODITY_LIST',
+    ]),
+    ('environment_exposure', [
+        'aeip_WH_FEATURES',
+        'aeip_WH_TOTAL_AREA',
+        'aeip_WH_BUFFER_FEATURES',
+        'aeip_WH_TOTAL_BUFFER_AREA',
+        'aeip_NH_HISTORIC_FEATURES',
+        'aeip_NH_TOTAL_HISTORIC_AREA',
+        'aeip_NH_INDIGENOUS_FEATURES',
+        'aeip_NH_TOTAL_INDIGENOUS_AREA',
+        'aeip_NH_NATURAL_FEATURES',
+        'aeip_NH_TOTAL_NATURAL_AREA',
+        'aeip_CH_HISTORIC_FEATURES',
+        'aeip_CH_TOTAL_HISTORIC_AREA',
+        'aeip_CH_INDIGENOUS_FEATURES',
+        'aeip_CH_TOTAL_INDIGENOUS_AREA',
+        'aeip_CH_NATURAL_FEATURES',
+        'aeip_CH_TOTAL_NATURAL_AREA',
+        'aeip_CAPAD_IA_FEATURES',
+        'aeip_CAPAD_IA_TOTAL_AREA',
+        'aeip_CAPAD_IB_FEATURES',
+        'aeip_CAPAD_IB_TOTAL_AREA',
+        'aeip_CAPAD_II_FEATURES',
+        'aeip_CAPAD_II_TOTAL_AREA',
+        'aeip_CAPAD_III_FEATURES',
+        'aeip_CAPAD_III_TOTAL_AREA',
+        'aeip_CAPAD_IV_FEATURES',
+        'aeip_CAPAD_IV_TOTAL_AREA',
+        'aeip_CAPAD_V_FEATURES',
+        'aeip_CAPAD_V_TOTAL_AREA',
+        'aeip_CAPAD_VI_FEATURES',
+        'aeip_CAPAD_VI_TOTAL_AREA',
+        'aeip_RAMSAR_FEATURES',
+        'aeip_RAMSAR_TOTAL_AREA',
+        'aeip_IBRA_FEATURES',
+        'aeip_IBRA_TOTAL_AREA',
+        'aeip_NRM_FEATURES',
+        'aeip_NRM_TOTAL_AREA',
+    ]),
+])
+
+# every attribute column, in theme order without repeats
+ALL_COLUMNS = list(OrderedDict((column, None) for columns in THEME_COLUMNS.values() for column in columns))
+
+
+def parse_themes(themes):
+    '''
+    Validates a comma separated list of themes (keys of THEME_COLUMNS), None gives every theme
+    '''
+    if not themes:
+        return list(THEME_COLUMNS)
+    themes = [theme.strip() for theme in themes.split(',') if theme.strip()]
+    unknown = [theme for theme in themes if theme not in THEME_COLUMNS]
+    if unknown:
+        raise ValueError('Unknown themes: {}'.format(', '.join(unknown)))
+    return themes
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+'''
+Mapbox Vector Tiles of the SA1 layer
+
+Tiles are cut by PostGIS (ST_AsMVT) in web mercator, carry the SA1 id and code plus a selectable set of exposure
+attributes, and are cached in memory and on disk keyed on the dataset version. Zoom levels 0-10 can be warmed
+offline with
+
+    python -m model.sa1_tiles seed --max-zoom 10 --workers 8
+'''
+
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import conf
+from .cache import LRUCache, DiskCache
+from .dataset import dataset_version
+from .geom_lod import degrees_per_pixel
+from .sa1_themes import TABLE_NAME, NAME_FIELD, ALL_COLUMNS
+
+LAYER_NAME = 'sa1'
+EXTENT = 4096  # MVT coordinate space of a tile
+BUFFER = 64  # MVT coordinates drawn past the tile edge so polygon outlines join up
+MAX_ZOOM = 16
+SEED_MAX_ZOOM = 10
+
+DEFAULT_ATTRS = ['aeip_POPULATION', 'aeip_DWELLINGS', 'aeip_BUILDINGS', 'aeip_RESIDENTIAL_RECONSTRUCTION_VALUE']
+
+TILE_CACHE_DIR = os.path.join(conf.CACHE_DIR, 'tiles')
+TILE_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+_memory_tiles = LRUCache('tiles', maxsize=4096, weigh=len, max_weight=128 * 1024 * 1024)
+_disk_tiles = DiskCache('tiles_disk', TILE_CACHE_DIR, max_bytes=TILE_CACHE_BYTES)
+
+_srid = None
+_srid_lock = threading.Lock()
+
+
+class TileError(ValueError):
+    pass
+
+
+def parse_attrs(attrs):
+    '''
+    Validates a comma separated list of attribute columns against the AEIP columns, None gives the default set.
+    The columns come back in one order without repeats, so each set of columns has one query and one cache key.
+    '''
+    if attrs is None:
+        return canonical_attrs(DEFAULT_ATTRS)
+    columns = [column.strip() for column in attrs.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in ALL_COLUMNS]
+    if unknown:
+        raise TileError('Unknown attributes: {}'.format(', '.join(unknown)))
+    return canonical_attrs(columns)
+
+
+def canonical_attrs(attrs):
+    return sorted(set(attrs), key=ALL_COLUMNS.index)
+
+
+def _table_srid():
+    global _srid
+    with _srid_lock:
+        if _srid is None:
+            rows = conf.db_select('SELECT Find_SRID(current_schema()::text, %s, %s)', [TABLE_NAME, 'geom'])
+            if not rows:
+                raise IOError('Could not find the SRID of {}'.format(TABLE_NAME))
+            _srid = rows[0][0]
+        return _srid
+
+
+def _tile_query(attrs):
+    columns = ''.join(', t."{}"'.format(column) for column in attrs)
+    return '''
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%s, %s, %s) AS geom
+        ), tile AS (
+            SELECT ST_AsMVTGeom(ST_Transform(ST_Simplify(t.geom, %s, true), 3857), bounds.geom, {extent}, {buffer})
+                       AS geom,
+                   t."id", t."{name}"{columns}
+            FROM "{table}" t, bounds
+            WHERE t.geom && ST_Transform(bounds.geom, {srid})
+        )
+        SELECT ST_AsMVT(tile.*, '{layer}', {extent}, 'geom') FROM tile
+    '''.format(extent=EXTENT, buffer=BUFFER, name=NAME_FIELD, columns=columns, table=TABLE_NAME,
+               srid=_table_srid(), layer=LAYER_NAME)
+
+
+def _render_tile(z, x, y, attrs):
+    # simplify to half a pixel before clipping, at low zooms most vertices would collapse anyway
+    rows = conf.db_select(_tile_query(attrs), [z, x, y, degrees_per_pixel(z) / 2], prepare=True)
+    if rows is None:
+        return None
+    return bytes(rows[0][0]) if rows[0][0] is not None else b''
+
+
+def get_tile(z, x, y, attrs=None):
+    '''
+    Returns the MVT bytes of a tile of the SA1 layer, carrying the given attribute columns
+    '''
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise TileError('No tile {}/{}/{}'.format(z, x, y))
+    attrs = canonical_attrs(DEFAULT_ATTRS if attrs is None else attrs)
+    key = '{}/{}/{}/{}/{}'.format(dataset_version(), ','.join(attrs), z, x, y)
+
+    tile = _memory_tiles.get(key)
+    if tile is None:
+        tile = _disk_tiles.get(key)
+        if tile is None:
+            tile = _render_tile(z, x, y, attrs)
+            if tile is None:
+                raise IOError('Could not render tile {}/{}/{}'.format(z, x, y))
+            _disk_tiles.set(key, tile)
+        _memory_tiles.set(key, tile)
+    return tile
+
+
+def _lonlat_to_tile(lon, lat, z):
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_covering(bbox, min_zoom, max_zoom):
+    xmin, ymin, xmax, ymax = bbox
+    for z in range(min_zoom, max_zoom + 1):
+        x0, y0 = _lonlat_to_tile(xmin, ymax, z)
+        x1, y1 = _lonlat_to_tile(xmax, ymin, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def _dataset_extent():
+    rows = conf.db_select('''SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e)
+                             FROM (SELECT ST_Extent(ST_Transform(geom, 4326)) AS e FROM "{}") AS extent'''
+                          .format(TABLE_NAME))
+    if not rows or rows[0][0] is None:
+        raise IOError('Could not find the extent of {}'.format(TABLE_NAME))
+    return tuple(rows[0])
+
+
+def seed_tiles(min_zoom=0, max_zoom=SEED_MAX_ZOOM, attrs=None, workers=4):
+    '''
+    Renders every tile over the dataset extent from min_zoom to max_zoom into the disk cache, in parallel
+    '''
+    tiles = list(tiles_covering(_dataset_extent(), min_zoom, max_zoom))
+    print('Seeding {} tiles, zoom {} to {}'.format(len(tiles), min_zoom, max_zoom))
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for tile in executor.map(lambda zxy: get_tile(zxy[0], zxy[1], zxy[2], attrs), tiles):
+            done += 1
+            if done % 500 == 0 or done == len(tiles):
+                print('{}/{} tiles'.format(done, len(tiles)))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Pre-renders SA1 vector tiles into the tile cache')
+    parser.add_argument('task', choices=['seed'])
+    parser.add_argument('--min-zoom', type=int, default=0)
+    parser.add_argument('--max-zoom', type=int, default=SEED_MAX_ZOOM)
+    parser.add_argument('--attrs', default=None, help='comma separated attribute columns, default {}'
+                        .format(','.join(DEFAULT_ATTRS)))
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    conf.DB_POOL_SETTINGS['max_size'] = max(conf.DB_POOL_SETTINGS['max_size'], args.workers)
+    seed_tiles(args.min_zoom, args.max_zoom, parse_attrs(args.attrs), args.workers)
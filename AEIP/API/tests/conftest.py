@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def db():
+    '''
+    Skips the test unless the database of conf/secrets.yml can be reached
+    '''
+    import conf
+    try:
+        rows = conf.db_select('SELECT 1')
+    except Exception as e:
+        rows = None
+        print(e)
+    if not rows:
+        pytest.skip('the database is not available')
+    return conf
+
+
+@pytest.fixture(scope='session')
+def client(db):
+    from app import app
+    return app.test_client()
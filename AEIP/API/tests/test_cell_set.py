@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import random
+
+import numpy as np
+import pytest
+
+from model.cell_set import CellSet, encode, decode, resolutions, ancestors, descendant_floor, children, \
+    encode_ranges, expand_ranges, MAX_RESOLUTION, FACES
+
+
+def _random_ids(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(FACES) + ''.join(rng.choice('012345678') for _ in range(rng.randint(0, MAX_RESOLUTION)))
+            for _ in range(count)]
+
+
+def test_encode_and_decode_round_trip():
+    ids = _random_ids(1000) + ['N', 'S' + '8' * MAX_RESOLUTION]
+    assert decode(encode(ids)) == ids
+    assert resolutions(encode(ids)).tolist() == [len(cell) - 1 for cell in ids]
+
+
+@pytest.mark.parametrize('cell', ['R1234567812345678', 'R' + '0' * (MAX_RESOLUTION + 1), '', 'X123', 'R129', 'R1a',
+                                  'R 12'])
+def test_invalid_ids_are_rejected(cell):
+    with pytest.raises(ValueError):
+        encode(['R78', cell])
+
+
+def test_codes_sort_like_ids_with_cells_after_their_descendants():
+    ids = sorted(set(_random_ids(1000, seed=1)))
+    by_code = decode(np.sort(encode(ids)))
+    assert sorted(by_code, key=lambda cell: cell + '9') == by_code
+    assert sorted(by_code) == ids
+
+
+def test_descendants_are_the_codes_from_the_floor_to_the_cell():
+    ids = _random_ids(2000, seed=2)
+    codes = np.sort(encode(ids))
+    cell = encode(['R78'])[0]
+    inside = (codes >= descendant_floor([cell])[0]) & (codes <= cell)
+    assert [ids_cell.startswith('R78') for ids_cell in decode(codes)] == inside.tolist()
+
+
+def test_ancestors_and_children():
+    code = encode(['R7852345'])
+    assert decode(ancestors(code, 3)) == ['R785']
+    assert decode(ancestors(code, 9)) == ['R7852345']
+    assert decode(children(encode(['R78']))) == ['R78{}'.format(digit) for digit in range(9)]
+    with pytest.raises(ValueError):
+        children(encode(['R' + '0' * MAX_RESOLUTION]))
+
+
+def test_ranges_round_trip():
+    ids = ['R785234501', 'R785234502', 'R785234503', 'R785234505', 'R78523451', 'N', 'S0', 'S1']
+    groups = encode_ranges(ids)
+    assert sorted(groups) == ['N', 'R78523450[1-35]', 'R78523451', 'S[01]']
+    assert sorted(expand_ranges(groups)) == sorted(ids)
+    random_ids = _random_ids(2000, seed=3)
+    assert sorted(expand_ranges(encode_ranges(random_ids))) == sorted(set(random_ids))
+
+
+@pytest.mark.parametrize('group', ['R78[9]', 'R78[]', 'X1', 'R1234567812345678[1]', 'R78[1-3'])
+def test_invalid_ranges_are_rejected(group):
+    with pytest.raises(ValueError):
+        expand_ranges([group])
+
+
+def test_cell_set_operations():
+    a = CellSet.from_ids(['R781', 'R782', 'R783'])
+    b = CellSet.from_ids(['R783', 'R784'])
+    assert (a | b).ids() == ['R781', 'R782', 'R783', 'R784']
+    assert (a & b).ids() == ['R783']
+    assert (a - b).ids() == ['R781', 'R782']
+    assert 'R782' in a and 'R784' not in a and 'R1234567812345678' not in a
+    assert CellSet.from_ranges(a.ranges()) == a
+
+
+def test_compact_and_expand():
+    cells = CellSet.from_ids(['R78{}'.format(digit) for digit in range(9)] + ['R7805', 'R771', 'R7712'])
+    assert cells.compact().ids() == ['R771', 'R78']
+    assert cells.compact().expand(3) == CellSet.from_ids(['R78{}'.format(digit) for digit in range(9)] + ['R771'])
+    assert cells.compact().expand(4) == CellSet.from_ids(['R78{}{}'.format(d, e) for d in range(9) for e in range(9)]
+                                                         + ['R771{}'.format(digit) for digit in range(9)])
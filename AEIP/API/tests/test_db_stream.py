@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import itertools
+
+import pytest
+
+from model.sa1_themes import TABLE_NAME
+
+
+@pytest.fixture
+def slots(db):
+    yield db
+    assert db.db_stream_stats()['running'] == 0
+
+
+def test_a_stream_does_not_use_a_connection_of_the_pool(db):
+    before = db.db_pool_stats().get('checkouts', 0)
+    rows = db.db_stream('SELECT "id" FROM "{}" ORDER BY "id"'.format(TABLE_NAME), itersize=10)
+    assert len(list(itertools.islice(rows, 25))) == 25
+    assert db.db_pool_stats().get('checkouts', 0) == before
+    rows.close()
+
+
+def test_downloads_past_max_streams_are_refused(slots, client):
+    db = slots
+    max_streams = db.DB_STREAM_SETTINGS['max_streams']
+    for _ in range(max_streams):
+        db.acquire_stream_slot()
+    try:
+        response = client.get('/export?themes=loc_info')
+        assert response.status_code == 503
+        assert db.db_stream_stats()['running'] == max_streams
+    finally:
+        for _ in range(max_streams):
+            db.release_stream_slot()
+
+    # and each download gives its slot back once it is over
+    for _ in range(max_streams + 1):
+        response = client.get('/export?themes=loc_info')
+        assert response.status_code == 200
+        assert response.get_data(as_text=True).startswith('id,')
+        response.close()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import psycopg2
+import pytest
+
+TABLE = 'test_swap'
+STAGING = TABLE + '_staging'
+
+
+@pytest.fixture
+def tables(db):
+    for table in [TABLE, STAGING]:
+        db.db_execute('DROP TABLE IF EXISTS "{}"'.format(table))
+    yield db
+    for table in [TABLE, STAGING]:
+        db.db_execute('DROP TABLE IF EXISTS "{}"'.format(table))
+
+
+def _build(db, rows):
+    db.db_execute('CREATE TABLE "{}" ("id" integer PRIMARY KEY, value integer NOT NULL)'.format(STAGING))
+    db.db_execute('CREATE INDEX "{table}_value_idx" ON "{table}" (value)'.format(table=STAGING))
+    db.db_execute('INSERT INTO "{}" SELECT i, i * %s FROM generate_series(1, 100) i'.format(STAGING), [rows])
+    db.db_swap_table(STAGING, TABLE)
+
+
+def _indexes(db):
+    return sorted(row[0] for row in db.db_select('SELECT indexname FROM pg_indexes WHERE tablename = %s', [TABLE]))
+
+
+def test_a_staging_table_is_swapped_in_with_its_indexes(tables):
+    db = tables
+    _build(db, 1)
+    assert _indexes(db) == [TABLE + '_pkey', TABLE + '_value_idx']
+    # and again, with the names of the first build's indexes taken by the live table
+    _build(db, 2)
+    assert db.db_select('SELECT sum(value) FROM "{}"'.format(TABLE))[0][0] == 2 * 5050
+    assert _indexes(db) == [TABLE + '_pkey', TABLE + '_value_idx']
+    assert db.db_select('SELECT to_regclass(%s)', [STAGING])[0][0] is None
+
+
+def test_readers_never_see_the_table_missing_or_partly_loaded(tables):
+    db = tables
+    _build(db, 1)
+    sums = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            rows = db.db_select('SELECT count(*), sum(value) / sum("id") FROM "{}"'.format(TABLE))
+            sums.append(tuple(rows[0]) if rows else None)
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for rows in range(2, 6):
+            _build(db, rows)
+    finally:
+        stop.set()
+        reader.join()
+    assert sums
+    assert set(sums) <= {(100, rows) for rows in range(1, 6)}
+
+
+def test_a_swap_gives_up_rather_than_hold_up_readers_behind_a_long_read(tables):
+    db = tables
+    _build(db, 1)
+    # a download still reading the old table
+    reader = psycopg2.connect(**db.DB_CON_DICT['db_con'])
+    reader.cursor().execute('SELECT count(*) FROM "{}"'.format(TABLE))
+    waits = []
+
+    def read():
+        started = time.monotonic()
+        db.db_select('SELECT count(*) FROM "{}"'.format(TABLE))
+        waits.append(time.monotonic() - started)
+    try:
+        db.db_execute('CREATE TABLE "{}" ("id" integer PRIMARY KEY, value integer NOT NULL)'.format(STAGING))
+        page = threading.Timer(0.1, read)
+        page.start()
+        with pytest.raises(IOError):
+            db.db_swap_table(STAGING, TABLE, lock_timeout=0.5, attempts=2, retry_wait=0.1)
+        page.join()
+        assert waits[0] < 1.0
+    finally:
+        reader.close()
+    # once the download is over it goes through
+    db.db_swap_table(STAGING, TABLE, lock_timeout=0.5, attempts=2, retry_wait=0.1)
+    assert db.db_select('SELECT count(*) FROM "{}"'.format(TABLE))[0][0] == 0
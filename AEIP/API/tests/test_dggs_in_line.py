@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from model.cell_set import encode
+from model.dggs_cover import cell_squares
+from model.dggs_in_line import rdggs, line_cells, find_gaps
+
+RESOLUTIONS = [7, 9, 11]
+LATITUDES = [-80, -60, -45, -35.3, -10, 0, 20, 45, 60, 80]
+
+
+def _lon_lat(x, y):
+    return list(rdggs.rhealpix(x, y, inverse=True))
+
+
+def _cell_square(lon, lat, resolution):
+    return cell_squares(encode(np.array([str(rdggs.cell_from_point(resolution, (lon, lat), plane=False))])))[0]
+
+
+def _assert_no_gaps(line, resolution):
+    codes = line_cells(np.array(line, dtype=np.float64), resolution)
+    assert len(codes) > 1
+    assert len(find_gaps(codes)) == 0
+
+
+@pytest.mark.parametrize('resolution', RESOLUTIONS)
+@pytest.mark.parametrize('lat', LATITUDES)
+def test_lines_do_not_skip_cells(lat, resolution):
+    lat = min(lat, 89.0) if lat > 0 else max(lat, -89.0)
+    step = 0.02 if resolution > 9 else 0.2
+    # along a parallel, along a meridian, diagonally and zigzagging
+    _assert_no_gaps([[140.0, lat], [140.0 + 5 * step, lat]], resolution)
+    _assert_no_gaps([[140.0, lat], [140.0, lat + step if lat < 0 else lat - step]], resolution)
+    _assert_no_gaps([[140.0, lat], [140.0 + 3 * step, lat + step if lat < 0 else lat - step]], resolution)
+    _assert_no_gaps([[140.0, lat], [140.0 + step, lat + step / 2], [140.0 + 2 * step, lat], [140.0 + 3 * step,
+                     lat + step / 3]], resolution)
+
+
+@pytest.mark.parametrize('resolution', RESOLUTIONS)
+@pytest.mark.parametrize('lat', [-35.3, -10, 0, 30])
+def test_lines_along_cell_edges_do_not_skip_cells(lat, resolution):
+    xmin, ymin, xmax, ymax = _cell_square(149.1, lat, resolution)
+    width = xmax - xmin
+    # along the top edge and the left edge of a row and a column of cells, and through their corners diagonally
+    _assert_no_gaps([_lon_lat(xmin, ymax), _lon_lat(xmin + 20 * width, ymax)], resolution)
+    _assert_no_gaps([_lon_lat(xmin, ymax), _lon_lat(xmin, ymax - 20 * width)], resolution)
+    _assert_no_gaps([_lon_lat(xmin, ymax), _lon_lat(xmin + 20 * width, ymax - 20 * width)], resolution)
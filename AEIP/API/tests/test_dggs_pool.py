@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from model.dggs_pool import DGGSPool, DGGSJobTimeout, DGGSPoolBusy
+
+WARM_UP_TIMEOUT = 60.0  # a new worker imports rhealpixdggs and converts a polygon before its first job
+
+
+@pytest.fixture
+def pool():
+    pool = DGGSPool(workers=1, max_pending=2, timeout=None)
+    yield pool
+    pool.close()
+
+
+def test_a_waiting_job_gets_a_new_worker_after_a_timeout(pool):
+    assert pool.run(abs, -1, timeout=WARM_UP_TIMEOUT) == 1
+
+    errors = []
+
+    def slow():
+        try:
+            pool.run(time.sleep, 30, timeout=0.5)
+        except DGGSJobTimeout as e:
+            errors.append(e)
+    slow_thread = threading.Thread(target=slow)
+    slow_thread.start()
+    time.sleep(0.1)  # the only worker is busy, so the next job has to wait for one
+    started = time.monotonic()
+    assert pool.run(abs, -2, timeout=WARM_UP_TIMEOUT) == 2
+    slow_thread.join()
+
+    assert len(errors) == 1
+    assert time.monotonic() - started < WARM_UP_TIMEOUT
+    stats = pool.stats()
+    assert stats['workers_started'] == 2
+    assert stats['workers_killed'] == 1
+    assert stats['workers'] == 1
+
+
+def test_jobs_past_max_pending_are_rejected(pool):
+    assert pool.run(abs, -1, timeout=WARM_UP_TIMEOUT) == 1
+
+    threads = [threading.Thread(target=pool.run, args=(time.sleep, 1)) for _ in range(pool.max_pending)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    with pytest.raises(DGGSPoolBusy):
+        pool.run(abs, -2)
+    for thread in threads:
+        thread.join()
+    assert pool.stats()['rejected'] == 1
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from model.dggs_pool import DGGSPoolBusy
+from model.dggs_provider import RemoteDGGSProvider, DGGSProviderChain, CircuitBreaker
+
+REMOTE_CELLS = ['R7852345']
+LOCAL_CELLS = ['R7852346']
+RESET_TIMEOUT = 0.5
+
+
+class _DGGSAPIHandler(BaseHTTPRequestHandler):
+    # answers like the DGGS web API, slowly or with an error while the server's mode says so
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.server.mode == 'slow':
+            time.sleep(1.0)
+        if self.server.mode == 'fail':
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({'dggs_cells': REMOTE_CELLS}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _LocalProvider(object):
+    name = 'local'
+
+    def __init__(self):
+        self.calls = 0
+
+    def find_cells(self, geo_json, resolution, as_polygon):
+        self.calls += 1
+        return LOCAL_CELLS
+
+
+class _BusyProvider(object):
+    name = 'busy'
+
+    def find_cells(self, geo_json, resolution, as_polygon):
+        raise DGGSPoolBusy('Too many DGGS jobs')
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _DGGSAPIHandler)
+    server.daemon_threads = True
+    server.mode = 'ok'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def chain(server):
+    remote = RemoteDGGSProvider('http://127.0.0.1:{}/api/search/'.format(server.server_address[1]),
+                                connect_timeout=0.5, read_timeout=0.2)
+    local = _LocalProvider()
+    return DGGSProviderChain([remote, local], failure_threshold=3, reset_timeout=RESET_TIMEOUT), local
+
+
+def test_a_slow_remote_opens_the_circuit_and_falls_back(server, chain):
+    chain, local = chain
+    server.mode = 'slow'
+    for _ in range(3):
+        started = time.monotonic()
+        assert chain.find_cells({}, 9, False) == LOCAL_CELLS
+        assert time.monotonic() - started < 0.9  # cut off by the read timeout, not the server
+    stats = chain.stats()
+    assert stats['remote']['circuit'] == CircuitBreaker.OPEN
+    assert stats['remote']['failures'] == 3
+
+    # while open the remote is not asked at all
+    started = time.monotonic()
+    assert chain.find_cells({}, 9, False) == LOCAL_CELLS
+    assert time.monotonic() - started < 0.1
+    assert chain.stats()['remote']['skipped'] == 1
+    assert local.calls == 4
+
+
+def test_the_circuit_closes_after_the_cooldown(server, chain):
+    chain, local = chain
+    server.mode = 'fail'
+    for _ in range(3):
+        assert chain.find_cells({}, 9, False) == LOCAL_CELLS
+    assert chain.stats()['remote']['circuit'] == CircuitBreaker.OPEN
+
+    # a failed trial after the cooldown opens it again
+    time.sleep(RESET_TIMEOUT)
+    assert chain.find_cells({}, 9, False) == LOCAL_CELLS
+    assert chain.stats()['remote']['circuit'] == CircuitBreaker.OPEN
+
+    server.mode = 'ok'
+    time.sleep(RESET_TIMEOUT)
+    assert chain.find_cells({}, 9, False) == REMOTE_CELLS
+    assert chain.stats()['remote']['circuit'] == CircuitBreaker.CLOSED
+    assert chain.find_cells({}, 9, False) == REMOTE_CELLS
+    assert local.calls == 4
+
+
+def test_a_busy_provider_falls_back_without_opening_its_circuit():
+    local = _LocalProvider()
+    chain = DGGSProviderChain([_BusyProvider(), local], failure_threshold=3, reset_timeout=RESET_TIMEOUT)
+    for _ in range(5):
+        assert chain.find_cells({}, 9, False) == LOCAL_CELLS
+    stats = chain.stats()
+    assert stats['busy']['circuit'] == CircuitBreaker.CLOSED
+    assert stats['busy']['busy'] == 5
+    assert stats['busy']['failures'] == 0
+    assert local.calls == 5
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from model import exposure_pyramid
+from model.cell_set import encode, resolutions
+from model.sa1_cells import cells_stamp
+
+COLUMN = exposure_pyramid.PYRAMID_COLUMNS[0]
+BOUNDARY = 'R785234'
+
+# SA1 1 has the boundary cell in its compact cover, whole, while SA1 2 has resolution 9 cells in it and around it.
+# SA1 3 has a cell coarser than the pyramid around them all.
+FRACTIONS = [
+    (1, BOUNDARY, 0.5),
+    (1, 'R785235', 0.5),
+    (2, BOUNDARY + '000', 0.1),
+    (2, BOUNDARY + '001', 0.2),
+    (2, BOUNDARY + '812', 0.3),
+    (2, 'R786000000', 0.4),
+    (3, 'R78', 1.0),
+]
+
+
+@pytest.fixture
+def pyramid(db, monkeypatch):
+    fractions = 'test_exposure_fractions'
+    monkeypatch.setattr(exposure_pyramid, 'FRACTIONS_TABLE', fractions)
+    monkeypatch.setattr(exposure_pyramid, 'PYRAMID_TABLE', 'test_exposure_pyramid')
+    db.db_execute('DROP TABLE IF EXISTS "{}"'.format(fractions))
+    db.db_execute('CREATE TABLE "{}" ("id" integer NOT NULL, code bigint NOT NULL, resolution smallint NOT NULL, '
+                  'fraction double precision NOT NULL)'.format(fractions))
+    codes = encode([cell for sa1_id, cell, fraction in FRACTIONS])
+    exposure_pyramid._store_fractions(fractions, [(sa1_id, [int(code)], [int(resolutions([code])[0])], [fraction])
+                                                  for (sa1_id, cell, fraction), code in zip(FRACTIONS, codes)])
+    db.db_execute('COMMENT ON TABLE "{}" IS %s'.format(fractions), [cells_stamp()])
+    exposure_pyramid.build_pyramid()
+    yield {row[0]: float(row[1])
+           for row in db.db_select('SELECT "id", "{}" FROM "{}" WHERE "id" IN (1, 2, 3)'
+                                   .format(COLUMN, exposure_pyramid.TABLE_NAME))}
+    for table in [fractions, 'test_exposure_pyramid']:
+        db.db_execute('DROP TABLE IF EXISTS "{}"'.format(table))
+    exposure_pyramid._pyramid_versions.clear()
+
+
+def _exposure(cell):
+    return exposure_pyramid.cell_exposure(cell)[COLUMN]
+
+
+def test_a_shared_boundary_cell_is_counted_once(pyramid):
+    values = pyramid
+    expected = 0.5 * values[1] + 0.6 * values[2] + values[3] / 9 ** 4
+    assert _exposure(BOUNDARY) == pytest.approx(expected)
+    assert _exposure('R785') == pytest.approx(values[1] + 0.6 * values[2] + values[3] / 9)
+
+
+@pytest.mark.parametrize('parent', ['R785', 'R7852', 'R78523', BOUNDARY, BOUNDARY + '0', BOUNDARY + '00',
+                                    BOUNDARY + '8', BOUNDARY + '81', BOUNDARY + '000'])
+def test_the_children_sum_to_their_parent(pyramid, parent):
+    children = sum(_exposure(parent + str(digit)) for digit in range(9))
+    assert children == pytest.approx(_exposure(parent))
+
+
+def test_the_pyramid_is_not_summed_from_fractions_of_another_dataset(pyramid, db):
+    before = _exposure(BOUNDARY)
+    db.db_execute('COMMENT ON TABLE "{}" IS %s'.format(exposure_pyramid.FRACTIONS_TABLE),
+                  ['aeip_sa1:20200101T000000Z#3'])
+    with pytest.raises(exposure_pyramid.ExposurePyramidError):
+        exposure_pyramid.build_pyramid()
+    assert _exposure(BOUNDARY) == before
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+from controller.routes import zoom_for_extent
+from model.geom_lod import LOD_TOLERANCES, tolerance_for_zoom
+
+
+def test_every_level_of_detail_is_used_by_some_map():
+    extents = [0.001 * 1.2 ** i for i in range(60)]  # 0.001 to about 50 degrees across
+    used = {tolerance_for_zoom(zoom_for_extent(extent, extent)) for extent in extents}
+    assert set(LOD_TOLERANCES) <= used
+
+
+def test_the_finest_level_is_not_used_when_it_would_show():
+    assert tolerance_for_zoom(15) is None
+    assert tolerance_for_zoom(8) == max(LOD_TOLERANCES)
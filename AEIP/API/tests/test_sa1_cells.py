@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from model import sa1_cells
+
+TABLE = 'test_sa1_cells'
+
+
+@pytest.fixture
+def sa1s(db, monkeypatch):
+    # three SA1s of the dataset, the last without a geometry
+    live_table = sa1_cells.TABLE_NAME
+    monkeypatch.setattr(sa1_cells, 'TABLE_NAME', TABLE)
+    db.db_execute('DROP TABLE IF EXISTS "{}"'.format(TABLE))
+    db.db_execute('CREATE TABLE "{}" AS SELECT "id", geom FROM "{}" ORDER BY "id" LIMIT 3'.format(TABLE, live_table))
+    db.db_execute('UPDATE "{table}" SET geom = NULL WHERE "id" = (SELECT max("id") FROM "{table}")'.format(table=TABLE))
+    yield db
+    for table in [TABLE, sa1_cells.cells_table(9), sa1_cells.cells_table(9) + '_staging']:
+        db.db_execute('DROP TABLE IF EXISTS "{}"'.format(table))
+    sa1_cells._cell_versions.clear()
+
+
+def test_an_sa1_without_a_geometry_is_stored_without_cells(sa1s, capsys):
+    db = sa1s
+    sa1_cells.build_cells(9, workers=1)
+    assert 'of 2 SA1s' in capsys.readouterr().out
+    table = sa1_cells.cells_table(9)
+    rows = db.db_select('SELECT t."id", c.cells FROM "{}" t LEFT JOIN "{}" c ON c."id" = t."id" ORDER BY t."id"'
+                        .format(TABLE, table))
+    assert [len(cells) > 0 for sa1_id, cells in rows] == [True, True, False]
+    assert sa1_cells.get_precomputed_cells(rows[-1][0], 9) == []
+
+    # so a build run again has nothing left to do
+    sa1_cells.build_cells(9, workers=1)
+    assert 'of 0 SA1s' in capsys.readouterr().out
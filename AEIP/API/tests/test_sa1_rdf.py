@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import ast
+
+import pytest
+
+import conf
+from model.cell_set import expand_ranges
+from model.sa1_cells import get_precomputed_cells
+from model.sa1_rdf import dggs_literal, DGGS_URI
+from model.sa1_themes import TABLE_NAME
+
+CELLS = ['R785234501', 'R785234502', 'R785234503', 'R785234505', 'R78523451']
+
+
+def test_the_dggs_literal_lists_every_cell_uri_by_default():
+    assert ast.literal_eval(dggs_literal(CELLS)) == [DGGS_URI + cell for cell in CELLS]
+
+
+def test_the_dggs_literal_groups_the_cells_when_asked():
+    literal = dggs_literal(CELLS, ranges=True)
+    assert sorted(literal.split()) == ['R78523450[1-35]', 'R78523451']
+    assert sorted(expand_ranges(literal.split())) == sorted(CELLS)
+
+
+def test_sa1_rdf_lists_every_cell_unless_ranges_are_asked_for(client):
+    sa1_id = conf.db_select('SELECT "id" FROM "{}" ORDER BY "id" LIMIT 1'.format(TABLE_NAME))[0][0]
+    cells = get_precomputed_cells(sa1_id)
+    if not cells:
+        pytest.skip('the DGGS cells are not precomputed (python -m model.sa1_cells build)')
+    turtle = client.get('/loc_info/{}?_format=text/turtle'.format(sa1_id)).get_data(as_text=True)
+    assert DGGS_URI + cells[0] in turtle
+    turtle = client.get('/loc_info/{}?_format=text/turtle&cells=ranges'.format(sa1_id)).get_data(as_text=True)
+    assert DGGS_URI + cells[0] not in turtle
+    assert cells[0][:-1] + '[' in turtle
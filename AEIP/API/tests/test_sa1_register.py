@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from model.sa1_search import search_filter, MAX_ID
+from model.sa1_themes import TABLE_NAME, NAME_FIELD
+
+
+def test_full_sa1_code_search_does_not_compare_the_integer_id():
+    where, params = search_filter('80100100001')
+    assert '"id"' not in where
+    assert all(not isinstance(param, int) or param <= MAX_ID for param in params)
+
+
+def test_short_code_search_also_matches_the_id():
+    where, params = search_filter('80101')
+    assert '"id" = %s' in where
+    assert params[-1] == 80101
+
+
+def test_register_search_for_a_full_sa1_code(db, client):
+    rows = db.db_select('SELECT "{}" FROM "{}" ORDER BY "id" LIMIT 1'.format(NAME_FIELD, TABLE_NAME))
+    if not rows:
+        return
+    code = rows[0][0]
+    response = client.get('/loc_info/?search={}&_format=text/html'.format(code))
+    assert response.status_code == 200
+    assert code in response.get_data(as_text=True)
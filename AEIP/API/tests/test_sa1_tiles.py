@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from model.sa1_tiles import parse_attrs, TileError, _tile_query
+
+ORDERINGS = ['aeip_POPULATION,aeip_DWELLINGS', 'aeip_DWELLINGS,aeip_POPULATION',
+             'aeip_DWELLINGS, aeip_POPULATION,aeip_DWELLINGS']
+
+
+def test_attribute_order_and_repeats_are_dropped():
+    assert all(parse_attrs(attrs) == ['aeip_POPULATION', 'aeip_DWELLINGS'] for attrs in ORDERINGS)
+
+
+def test_attribute_orderings_share_one_query(db):
+    assert len({_tile_query(parse_attrs(attrs)) for attrs in ORDERINGS}) == 1
+
+
+def test_unknown_attributes_are_rejected():
+    with pytest.raises(TileError):
+        parse_attrs('aeip_POPULATION,geom')